@@ -0,0 +1,74 @@
+"""add user search indexes
+
+Revision ID: 5d2f7a9c1e40
+Revises: 3c8a30b1187c
+Create Date: 2026-10-18 10:12:31.418205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2f7a9c1e40'
+down_revision: Union[str, Sequence[str], None] = '3c8a30b1187c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SQLITE_UPGRADE = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS user_search USING fts5(
+        email, full_name, content='user', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS user_search_ai AFTER INSERT ON user BEGIN
+        INSERT INTO user_search(rowid, email, full_name) VALUES (new.id, new.email, new.full_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_search_ad AFTER DELETE ON user BEGIN
+        INSERT INTO user_search(user_search, rowid, email, full_name)
+        VALUES ('delete', old.id, old.email, old.full_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_search_au AFTER UPDATE OF email, full_name ON user BEGIN
+        INSERT INTO user_search(user_search, rowid, email, full_name)
+        VALUES ('delete', old.id, old.email, old.full_name);
+        INSERT INTO user_search(rowid, email, full_name) VALUES (new.id, new.email, new.full_name);
+    END""",
+    "INSERT INTO user_search(user_search) VALUES ('rebuild')",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS user_search_au",
+    "DROP TRIGGER IF EXISTS user_search_ad",
+    "DROP TRIGGER IF EXISTS user_search_ai",
+    "DROP TABLE IF EXISTS user_search",
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.create_index(
+            'ix_user_email_trgm', 'user', ['email'],
+            postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'},
+        )
+        op.create_index(
+            'ix_user_full_name_trgm', 'user', ['full_name'],
+            postgresql_using='gin', postgresql_ops={'full_name': 'gin_trgm_ops'},
+        )
+    elif dialect == 'sqlite':
+        for statement in SQLITE_UPGRADE:
+            op.execute(sa.text(statement))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.drop_index('ix_user_full_name_trgm', table_name='user')
+        op.drop_index('ix_user_email_trgm', table_name='user')
+    elif dialect == 'sqlite':
+        for statement in SQLITE_DOWNGRADE:
+            op.execute(sa.text(statement))
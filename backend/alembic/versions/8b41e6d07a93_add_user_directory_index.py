@@ -0,0 +1,32 @@
+"""add user directory index
+
+Revision ID: 8b41e6d07a93
+Revises: 5d2f7a9c1e40
+Create Date: 2026-10-18 11:02:47.905316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b41e6d07a93'
+down_revision: Union[str, Sequence[str], None] = '5d2f7a9c1e40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_user_directory', 'user',
+        [sa.text("coalesce(full_name, '')"), 'email', 'id', 'full_name', 'is_active'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_user_directory', table_name='user')
@@ -0,0 +1,69 @@
+"""add conversation summary columns
+
+Revision ID: c7e19f3a5b82
+Revises: 8b41e6d07a93
+Create Date: 2026-10-18 12:20:05.631744
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e19f3a5b82'
+down_revision: Union[str, Sequence[str], None] = '8b41e6d07a93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('conversation', sa.Column('last_message_id', sa.Integer(), nullable=True))
+    op.add_column('conversation', sa.Column('last_message_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column(
+        'conversation_participants',
+        sa.Column('unread_count', sa.Integer(), nullable=False, server_default='0')
+    )
+    op.create_index(
+        'ix_conversation_participants_user_id', 'conversation_participants', ['user_id'], unique=False
+    )
+
+    # Backfill from existing messages
+    op.execute(
+        """
+        UPDATE conversation SET last_message_id = (
+            SELECT max(message.id) FROM message WHERE message.conversation_id = conversation.id
+        )
+        """
+    )
+    op.execute(
+        """
+        UPDATE conversation SET last_message_at = (
+            SELECT message.created_at FROM message WHERE message.id = conversation.last_message_id
+        )
+        WHERE last_message_id IS NOT NULL
+        """
+    )
+    op.execute(
+        """
+        UPDATE conversation_participants SET unread_count = (
+            SELECT count(message.id) FROM message
+            WHERE message.conversation_id = conversation_participants.conversation_id
+              AND message.sender_id != conversation_participants.user_id
+              AND (conversation_participants.last_read_at IS NULL
+                   OR message.created_at > conversation_participants.last_read_at)
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_conversation_participants_user_id', table_name='conversation_participants')
+    with op.batch_alter_table('conversation_participants') as batch_op:
+        batch_op.drop_column('unread_count')
+    with op.batch_alter_table('conversation') as batch_op:
+        batch_op.drop_column('last_message_at')
+        batch_op.drop_column('last_message_id')
@@ -0,0 +1,39 @@
+"""add composite message indexes
+
+Revision ID: e2a4c6b8d013
+Revises: c7e19f3a5b82
+Create Date: 2026-10-18 13:05:52.117390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a4c6b8d013'
+down_revision: Union[str, Sequence[str], None] = 'c7e19f3a5b82'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_message_conversation_id_id', 'message', ['conversation_id', sa.text('id DESC')], unique=False
+    )
+    op.create_index(
+        'ix_message_conversation_id_created_at', 'message', ['conversation_id', 'created_at'], unique=False
+    )
+    # Covered by the composite indexes above and by the primary key
+    op.drop_index(op.f('ix_message_conversation_id'), table_name='message')
+    op.drop_index(op.f('ix_message_id'), table_name='message')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_message_id'), 'message', ['id'], unique=False)
+    op.create_index(op.f('ix_message_conversation_id'), 'message', ['conversation_id'], unique=False)
+    op.drop_index('ix_message_conversation_id_created_at', table_name='message')
+    op.drop_index('ix_message_conversation_id_id', table_name='message')
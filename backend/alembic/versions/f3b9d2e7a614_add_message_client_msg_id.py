@@ -0,0 +1,35 @@
+"""add message client_msg_id
+
+Revision ID: f3b9d2e7a614
+Revises: e2a4c6b8d013
+Create Date: 2026-10-18 16:42:08.530117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b9d2e7a614'
+down_revision: Union[str, Sequence[str], None] = 'e2a4c6b8d013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('message', sa.Column('client_msg_id', sa.String(length=64), nullable=True))
+    op.create_index(
+        'ix_message_sender_id_client_msg_id', 'message', ['sender_id', 'client_msg_id'], unique=True
+    )
+    # Covered by the composite index above
+    op.drop_index(op.f('ix_message_sender_id'), table_name='message')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_message_sender_id'), 'message', ['sender_id'], unique=False)
+    op.drop_index('ix_message_sender_id_client_msg_id', table_name='message')
+    op.drop_column('message', 'client_msg_id')
@@ -1,14 +1,15 @@
 from typing import Generator
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
+from jose import JWTError
 from pydantic import ValidationError
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import async_sessionmaker
 
-from app import models, schemas
-from app.core import security
+from app import models
+from app.core import auth, metrics, rate_limit
 from app.core.config import settings
-from app.db.session import SessionLocal
+from app.db.session import SessionLocal, AsyncSessionLocal
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token"
@@ -21,20 +22,71 @@ def get_db() -> Generator:
     finally:
         db.close()
 
-def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)
-) -> models.User:
+def get_async_sessionmaker() -> async_sessionmaker:
+    """
+    Session factory for long-lived async handlers that open one session per unit of work.
+    """
+    return AsyncSessionLocal
+
+def _token_user_id(token: str) -> int:
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        token_data = schemas.TokenPayload(**payload)
-    except (JWTError, ValidationError):
+        user_id = auth.token_user_id(token)
+    except (JWTError, ValidationError, ValueError):
+        user_id = None
+    if user_id is None:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    user = db.query(models.User).filter(models.User.id == token_data.sub).first()
+    return user_id
+
+def get_current_principal(
+    db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)
+) -> auth.Principal:
+    """
+    Authenticated user id, is_active and email without loading the User row.
+    Served from cache after the first request, so endpoints that only need the
+    user id never touch the database for authentication.
+    """
+    user_id = _token_user_id(token)
+    principal = auth.get_principal(db, user_id)
+    if not principal:
+        raise HTTPException(status_code=404, detail="User not found")
+    return principal
+
+def get_current_user(
+    db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)
+) -> models.User:
+    user_id = _token_user_id(token)
+    user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    auth.principal_from_user(user)
     return user
+
+def _too_many_requests(retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many requests",
+        headers={"Retry-After": rate_limit.retry_after_header(retry_after)},
+    )
+
+async def limit_search(principal: auth.Principal = Depends(get_current_principal)) -> None:
+    """
+    Per-user token bucket for user search (SEARCH_RATE / SEARCH_BURST).
+    """
+    retry_after = await rate_limit.search_limiter.acquire(f"user:{principal.id}")
+    if retry_after:
+        metrics.rate_limited.labels("search").inc()
+        raise _too_many_requests(retry_after)
+
+async def limit_login(request: Request) -> None:
+    """
+    Per-address token bucket for logins (LOGIN_RATE / LOGIN_BURST), checked before the
+    password hash is verified.
+    """
+    address = request.client.host if request.client else "unknown"
+    retry_after = await rate_limit.login_limiter.acquire(f"address:{address}")
+    if retry_after:
+        metrics.rate_limited.labels("login").inc()
+        raise _too_many_requests(retry_after)
@@ -1,9 +1,10 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import auth, users, ws, conversations, messages
+from app.api.v1.endpoints import auth, users, ws, conversations, messages, sync
 
 api_router = APIRouter()
 api_router.include_router(auth.router, tags=["login"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(conversations.router, prefix="/conversations", tags=["conversations"])
 api_router.include_router(messages.router, prefix="/messages", tags=["messages"])
+api_router.include_router(sync.router, tags=["sync"])
 api_router.include_router(ws.router, tags=["websocket"])
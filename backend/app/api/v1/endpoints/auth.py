@@ -3,6 +3,7 @@ from typing import Any
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app import models, schemas
 from app.api import deps
@@ -11,22 +12,31 @@ from app.core.config import settings
 
 router = APIRouter()
 
-@router.post("/login/access-token", response_model=schemas.Token)
-def login_access_token(
+@router.post("/login/access-token", response_model=schemas.Token, dependencies=[Depends(deps.limit_login)])
+async def login_access_token(
     db: Session = Depends(deps.get_db), form_data: OAuth2PasswordRequestForm = Depends()
 ) -> Any:
     """
-    OAuth2 compatible token login, get an access token for future requests
+    OAuth2 compatible token login, get an access token for future requests.
+    Rate limited per client address; over the limit the response is 429 with Retry-After.
     """
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    if not user or not security.verify_password(form_data.password, user.hashed_password):
+    user = await run_in_threadpool(
+        lambda: db.query(models.User).filter(models.User.email == form_data.username).first()
+    )
+    if not user or not await security.password_hasher.verify(form_data.password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Incorrect email or password")
     elif not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
+    # Read before the commit below expires the instance, so nothing loads on the event loop
+    user_id = user.id
+    if security.needs_rehash(user.hashed_password):
+        # The configured cost changed since this hash was made; upgrade it transparently
+        user.hashed_password = await security.password_hasher.hash(form_data.password)
+        await run_in_threadpool(db.commit)
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     return {
         "access_token": security.create_access_token(
-            user.id, expires_delta=access_token_expires
+            user_id, expires_delta=access_token_expires
         ),
         "token_type": "bearer",
     }
@@ -1,29 +1,75 @@
-from typing import List
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.orm import Session, contains_eager, selectinload
+from sqlalchemy import and_, func, or_
 
 from app import models, schemas
 from app.api import deps
+from app.core import auth
+from app.core.serialization import ORJSONResponse
 from app.models.conversation import conversation_participants
+from app.services.read_receipts import naive_utc, read_markers
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 
-def serialize_conversation(conv: models.Conversation, db: Session, current_user_id: int) -> dict:
-    last_read_row = db.execute(
-        conversation_participants.select()
-        .where(conversation_participants.c.conversation_id == conv.id)
-        .where(conversation_participants.c.user_id == current_user_id)
-    ).fetchone()
-    last_read_at = last_read_row.last_read_at if last_read_row else None
-    unread_query = (
-        db.query(func.count(models.Message.id))
-        .filter(models.Message.conversation_id == conv.id)
+def _apply_pending_reads(
+    db: Session, states: Dict[int, Tuple[Optional[datetime], int]], current_user_id: int
+) -> Dict[int, Tuple[Optional[datetime], int]]:
+    """
+    Read markers still buffered in this process take precedence over the stored values.
+    Their unread counts are recomputed from message in one grouped query.
+    """
+    pending = {
+        cid: read_at
+        for cid, read_at in read_markers.pending_for_user(current_user_id).items()
+        if cid in states and (states[cid][0] is None or naive_utc(states[cid][0]) < read_at)
+    }
+    if not pending:
+        return states
+    counts = dict(
+        db.query(models.Message.conversation_id, func.count(models.Message.id))
         .filter(models.Message.sender_id != current_user_id)
+        .filter(
+            or_(*[
+                and_(models.Message.conversation_id == cid, models.Message.created_at > read_at)
+                for cid, read_at in pending.items()
+            ])
+        )
+        .group_by(models.Message.conversation_id)
+        .all()
     )
-    if last_read_at:
-        unread_query = unread_query.filter(models.Message.created_at > last_read_at)
-    unread_count = unread_query.scalar()
+    for cid, read_at in pending.items():
+        states[cid] = (read_at, counts.get(cid, 0))
+    return states
+
+def get_read_states(
+    db: Session, conversation_ids: List[int], current_user_id: int
+) -> Dict[int, Tuple[Optional[datetime], int]]:
+    """
+    Load last_read_at and the maintained unread count for many conversations at once.
+    """
+    if not conversation_ids:
+        return {}
+    cp = conversation_participants
+    rows = (
+        db.query(cp.c.conversation_id, cp.c.last_read_at, cp.c.unread_count)
+        .filter(cp.c.user_id == current_user_id)
+        .filter(cp.c.conversation_id.in_(conversation_ids))
+        .all()
+    )
+    states = {row.conversation_id: (row.last_read_at, row.unread_count) for row in rows}
+    return _apply_pending_reads(db, states, current_user_id)
+
+def serialize_conversation(
+    conv: models.Conversation,
+    db: Session,
+    current_user_id: int,
+    read_state: Optional[Tuple[Optional[datetime], int]] = None,
+) -> dict:
+    if read_state is None:
+        read_state = get_read_states(db, [conv.id], current_user_id).get(conv.id, (None, 0))
+    _, unread_count = read_state
     participants = [
         {
             "id": user.id,
@@ -32,37 +78,76 @@ def serialize_conversation(conv: models.Conversation, db: Session, current_user_
         }
         for user in conv.participants
     ]
+    last_message = conv.last_message
     return {
         "id": conv.id,
         "name": conv.name,
         "is_group": conv.is_group,
         "created_at": conv.created_at.isoformat() if conv.created_at else None,
+        "last_message_at": conv.last_message_at.isoformat() if conv.last_message_at else None,
+        "last_message": {
+            "id": last_message.id,
+            "sender_id": last_message.sender_id,
+            "content": last_message.content,
+            "created_at": last_message.created_at.isoformat() if last_message.created_at else None,
+        } if last_message is not None else None,
         "message_count": unread_count or 0,
         "participants": participants,
     }
 
+def serialize_conversations(
+    conversations: List[models.Conversation], db: Session, current_user_id: int
+) -> List[dict]:
+    """
+    Serialize a conversation list with a fixed number of queries, independent of its length.
+    Participants and last_message should already be eager loaded.
+    """
+    read_states = get_read_states(db, [conv.id for conv in conversations], current_user_id)
+    return [
+        serialize_conversation(
+            conv, db, current_user_id, read_states.get(conv.id, (None, 0))
+        )
+        for conv in conversations
+    ]
+
 @router.get("/")
 def get_conversations(
     db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_user),
-) -> List[dict]:
+    current_user: auth.Principal = Depends(deps.get_current_principal),
+) -> ORJSONResponse:
     """
-    Get all conversations for the current user.
+    Get all conversations for the current user, most recently active first.
     """
-    conversations = db.query(models.Conversation).join(
-        models.Conversation.participants
-    ).filter(
-        models.User.id == current_user.id
-    ).all()
-    
-    return [serialize_conversation(conv, db, current_user.id) for conv in conversations]
+    cp = conversation_participants
+    rows = (
+        db.query(models.Conversation, cp.c.last_read_at, cp.c.unread_count)
+        .join(cp, cp.c.conversation_id == models.Conversation.id)
+        .outerjoin(models.Conversation.last_message)
+        .filter(cp.c.user_id == current_user.id)
+        .options(
+            contains_eager(models.Conversation.last_message),
+            selectinload(models.Conversation.participants),
+        )
+        .order_by(
+            func.coalesce(models.Conversation.last_message_at, models.Conversation.created_at).desc(),
+            models.Conversation.id.desc(),
+        )
+        .all()
+    )
+    read_states = _apply_pending_reads(
+        db, {conv.id: (last_read_at, unread_count) for conv, last_read_at, unread_count in rows}, current_user.id
+    )
+    return ORJSONResponse([
+        serialize_conversation(conv, db, current_user.id, read_states[conv.id])
+        for conv, _, _ in rows
+    ])
 
 @router.get("/{conversation_id}")
 def get_conversation(
     conversation_id: int,
     db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_user),
-) -> dict:
+    current_user: auth.Principal = Depends(deps.get_current_principal),
+) -> ORJSONResponse:
     """
     Get a single conversation for the current user.
     """
@@ -75,14 +160,14 @@ def get_conversation(
     )
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found.")
-    return serialize_conversation(conversation, db, current_user.id)
+    return ORJSONResponse(serialize_conversation(conversation, db, current_user.id))
 
 @router.post("/direct")
 def create_direct_conversation(
     payload: schemas.DirectConversationCreate,
     db: Session = Depends(deps.get_db),
     current_user: models.User = Depends(deps.get_current_user),
-) -> dict:
+) -> ORJSONResponse:
     """
     Create or retrieve a direct conversation with another user.
     """
@@ -102,7 +187,7 @@ def create_direct_conversation(
     )
     
     if existing:
-        return serialize_conversation(existing, db, current_user.id)
+        return ORJSONResponse(serialize_conversation(existing, db, current_user.id))
     
     conversation_name = target_user.full_name or target_user.email
     conversation = models.Conversation(
@@ -114,4 +199,4 @@ def create_direct_conversation(
     db.commit()
     db.refresh(conversation)
     
-    return serialize_conversation(conversation, db, current_user.id)
+    return ORJSONResponse(serialize_conversation(conversation, db, current_user.id))
@@ -1,53 +1,79 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, Query, BackgroundTasks
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import async_sessionmaker
 
 from app import models
 from app.api import deps
+from app.core import auth
+from app.core.serialization import ORJSONResponse
 from app.models.conversation import conversation_participants
-from app.websockets.manager import manager
+from app.services import export, membership
+from app.services.read_receipts import ReadWatermarks, naive_utc, read_markers
 from datetime import datetime
-import json
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 
-async def notify_read_receipt(user_ids: List[int], event: dict):
-    """Background task to notify users about read receipt."""
-    await manager.broadcast_to_users(user_ids, json.dumps(event))
+@router.get("/export")
+def export_messages(
+    db: Session = Depends(deps.get_db),
+    current_user: auth.Principal = Depends(deps.get_current_principal),
+    conversation_id: Optional[int] = Query(None, description="Export one conversation; omit for all of yours"),
+    since: Optional[datetime] = Query(None, description="Only messages created at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only messages created before this time"),
+    after_id: Optional[int] = Query(None, description="Resume after this message id"),
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+) -> StreamingResponse:
+    """
+    Stream message history, oldest first, as NDJSON or CSV.
+    """
+    if conversation_id is not None and current_user.id not in membership.get_member_ids(db, conversation_id):
+        raise HTTPException(status_code=404, detail="Conversation not found.")
+
+    stmt = export.export_statement(
+        current_user.id,
+        conversation_id=conversation_id,
+        since=naive_utc(since),
+        until=naive_utc(until),
+        after_id=after_id,
+    )
+    filename = f"conversation-{conversation_id}" if conversation_id is not None else "messages"
+    return StreamingResponse(
+        export.stream_export(db.get_bind(), stmt, fmt),
+        media_type=export.MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
 
 @router.get("/{conversation_id}/messages")
 def get_messages(
     conversation_id: int,
     background_tasks: BackgroundTasks,
     db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_user),
+    session_factory: async_sessionmaker = Depends(deps.get_async_sessionmaker),
+    current_user: auth.Principal = Depends(deps.get_current_principal),
     limit: int = Query(20, le=50),
     before_id: Optional[int] = Query(None, description="Fetch messages older than this id"),
-) -> List[dict]:
+) -> ORJSONResponse:
     """
     Get paginated messages for a conversation (newest first, optional cursor).
-    Also marks the conversation as read for the current user.
+    Fetching the latest page also marks the conversation as read for the current user.
     """
-    conversation = db.query(models.Conversation).filter(
-        models.Conversation.id == conversation_id
-    ).first()
-    
-    if not conversation:
-        return []
-    
-    is_participant = any(p.id == current_user.id for p in conversation.participants)
-    if not is_participant:
-        return []
+    member_ids = membership.get_member_ids(db, conversation_id)
+    if current_user.id not in member_ids:
+        return ORJSONResponse([])
 
     # Load last_read_at for participants
     last_reads = {
-        row.user_id: row.last_read_at
+        row.user_id: naive_utc(row.last_read_at)
         for row in db.query(
             conversation_participants.c.user_id,
             conversation_participants.c.last_read_at
         ).filter(conversation_participants.c.conversation_id == conversation_id)
     }
+    for uid, read_at in read_markers.pending_for_conversation(conversation_id).items():
+        if last_reads.get(uid) is None or last_reads[uid] < read_at:
+            last_reads[uid] = read_at
 
     query = db.query(models.Message).filter(
         models.Message.conversation_id == conversation_id
@@ -61,49 +87,22 @@ def get_messages(
         .all()
     )
 
-    # Mark as read now
-    now = datetime.utcnow()
-    db.execute(
-        conversation_participants.update()
-        .where(conversation_participants.c.conversation_id == conversation_id)
-        .where(conversation_participants.c.user_id == current_user.id)
-        .values(last_read_at=now)
-    )
-    db.commit()
+    # Mark as read; history pages fetched with a cursor leave the marker alone.
+    # The marker is buffered and flushed (with the conversation.read broadcast) in batches.
+    if before_id is None:
+        if read_markers.mark(conversation_id, current_user.id, datetime.utcnow()):
+            background_tasks.add_task(read_markers.flush_soon, session_factory)
 
-    # Notify other participants about read status
-    other_user_ids = [p.id for p in conversation.participants if p.id != current_user.id]
-    if other_user_ids:
-        event = {
-            "type": "conversation.read",
-            "payload": {
-                "conversation_id": conversation_id,
-                "user_id": current_user.id,
-                "last_read_at": now.isoformat(),
-            },
-        }
-        background_tasks.add_task(notify_read_receipt, other_user_ids, event)
-    
-    def message_seen(msg: models.Message) -> bool:
-        other_participants = [p.id for p in conversation.participants if p.id != msg.sender_id]
-        if not other_participants:
-            return False
-        for uid in other_participants:
-            lr = last_reads.get(uid)
-            if not lr:
-                return False
-            if msg.created_at and lr < msg.created_at:
-                return False
-        return True
+    watermarks = ReadWatermarks(member_ids, last_reads)
 
-    return [
+    return ORJSONResponse([
         {
             "id": msg.id,
             "conversation_id": msg.conversation_id,
             "sender_id": msg.sender_id,
             "content": msg.content,
             "created_at": msg.created_at.isoformat(),
-            "seen": message_seen(msg),
+            "seen": watermarks.seen(msg.sender_id, naive_utc(msg.created_at)),
         }
         for msg in reversed(messages)
-    ]
+    ])
@@ -0,0 +1,125 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, selectinload
+
+from app import models
+from app.api import deps
+from app.api.v1.endpoints.conversations import serialize_conversations
+from app.core import auth
+from app.core.serialization import ORJSONResponse
+from app.models.conversation import conversation_participants
+from app.services.read_receipts import naive_utc, read_markers
+
+router = APIRouter(default_response_class=ORJSONResponse)
+
+def parse_since(db: Session, since: str) -> Tuple[Optional[int], datetime]:
+    """
+    Resolve a sync watermark to (message id, timestamp). A message id is the cheap, exact
+    form; a timestamp is accepted for clients that have no id yet. For an id, the
+    timestamp is that message's created_at, used for read markers and new conversations.
+    """
+    if since.isdigit():
+        message_id = int(since)
+        created_at = db.execute(
+            select(models.Message.created_at)
+            .where(models.Message.id <= message_id)
+            .order_by(models.Message.id.desc())
+            .limit(1)
+        ).scalar()
+        return message_id, naive_utc(created_at) or datetime.min
+    try:
+        return None, naive_utc(datetime.fromisoformat(since))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="since must be a message id or an ISO timestamp.")
+
+@router.get("/sync")
+def sync(
+    since: str = Query(..., description="Last message id seen, or an ISO timestamp"),
+    limit: int = Query(200, ge=1, le=1000),
+    continued: bool = Query(False, description="Set when fetching the next page of the same sync"),
+    db: Session = Depends(deps.get_db),
+    current_user: auth.Principal = Depends(deps.get_current_principal),
+) -> ORJSONResponse:
+    """
+    Catch up after a reconnect: messages, read markers and conversations that changed
+    in the current user's conversations since the watermark.
+    Messages are paged by id; while has_more is true, call again with since=next_since and
+    continued=true. Read markers and new conversations are current state rather than a
+    stream, so they come with the first page only and continued pages leave them empty.
+    """
+    since_id, since_at = parse_since(db, since)
+    cp = conversation_participants
+    my_conversations = select(cp.c.conversation_id).where(cp.c.user_id == current_user.id)
+
+    Message = models.Message
+    query = (
+        select(Message.id, Message.conversation_id, Message.sender_id, Message.content, Message.created_at)
+        .where(Message.conversation_id.in_(my_conversations))
+        .order_by(Message.id)
+        .limit(limit + 1)
+    )
+    if since_id is not None:
+        query = query.where(Message.id > since_id)
+    else:
+        query = query.where(Message.created_at > since_at)
+    rows = db.execute(query).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if rows:
+        next_since = rows[-1].id
+    elif since_id is not None:
+        next_since = since_id
+    else:
+        # Nothing new since the timestamp: hand back an id watermark for the next call
+        next_since = db.execute(
+            select(func.max(Message.id)).where(Message.conversation_id.in_(my_conversations))
+        ).scalar() or 0
+
+    reads: Dict[Tuple[int, int], datetime] = {}
+    conversations: List[models.Conversation] = []
+    if not continued:
+        read_rows = db.execute(
+            select(cp.c.conversation_id, cp.c.user_id, cp.c.last_read_at)
+            .where(cp.c.conversation_id.in_(my_conversations))
+            .where(cp.c.last_read_at > since_at)
+        ).all()
+        reads = {(row.conversation_id, row.user_id): naive_utc(row.last_read_at) for row in read_rows}
+        for cid, read_at in read_markers.pending_for_user(current_user.id).items():
+            key = (cid, current_user.id)
+            if read_at > since_at and (key not in reads or reads[key] < read_at):
+                reads[key] = read_at
+
+        conversations = (
+            db.query(models.Conversation)
+            .join(cp, cp.c.conversation_id == models.Conversation.id)
+            .filter(cp.c.user_id == current_user.id, cp.c.joined_at > since_at)
+            .options(
+                selectinload(models.Conversation.participants),
+                selectinload(models.Conversation.last_message),
+            )
+            .all()
+        )
+
+    return ORJSONResponse({
+        "messages": [
+            {
+                "id": row.id,
+                "conversation_id": row.conversation_id,
+                "sender_id": row.sender_id,
+                "content": row.content,
+                "created_at": row.created_at.isoformat(),
+            }
+            for row in rows
+        ],
+        "read_markers": [
+            {"conversation_id": cid, "user_id": uid, "last_read_at": read_at.isoformat()}
+            for (cid, uid), read_at in reads.items()
+        ],
+        "conversations": serialize_conversations(conversations, db, current_user.id),
+        "next_since": str(next_since),
+        "has_more": has_more,
+    })
@@ -1,57 +1,60 @@
-from typing import Any
-from fastapi import APIRouter, Depends, HTTPException, Query
+import hashlib
+from typing import Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from starlette.concurrency import run_in_threadpool
 
 from app import models, schemas
 from app.api import deps
-from app.core.security import get_password_hash
+from app.core import auth, serialization
+from app.core.security import password_hasher
+from app.services import user_directory, user_search
 
 router = APIRouter()
 
-@router.get("/search", response_model=list[schemas.User])
+@router.get("/search", response_model=list[schemas.User], dependencies=[Depends(deps.limit_search)])
 def search_users(
     query: str = Query(..., min_length=1, description="Email or name to search for"),
     limit: int = Query(10, ge=1, le=50),
     db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_user),
+    current_user: auth.Principal = Depends(deps.get_current_principal),
 ) -> Any:
     """
     Search for users by email or full name. Excludes the current user.
+    Prefix matches rank ahead of other substring matches.
+    Rate limited per user; over the limit the response is 429 with Retry-After.
     """
-    search_term = f"%{query}%"
-    users = (
-        db.query(models.User)
-        .filter(models.User.id != current_user.id)
-        .filter(
-            or_(
-                models.User.email.ilike(search_term),
-                models.User.full_name.ilike(search_term),
-            )
-        )
-        .limit(limit)
-        .all()
-    )
-    return users
+    return user_search.search_users(db, query, exclude_user_id=current_user.id, limit=limit)
 
 @router.get("/all", response_model=list[schemas.User])
 def list_users(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; omit for every user"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
     db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_user),
+    current_user: auth.Principal = Depends(deps.get_current_principal),
 ) -> Any:
     """
-    List all users except the current user.
+    List users except the current user, ordered by name and email.
+    When paginating, the cursor for the next page is returned in X-Next-Cursor.
+    Pages carry an ETag; a matching If-None-Match gets 304 Not Modified.
     """
-    users = (
-        db.query(models.User)
-        .filter(models.User.id != current_user.id)
-        .order_by(models.User.full_name, models.User.email)
-        .all()
-    )
-    return users
+    try:
+        after = user_directory.decode_cursor(cursor) if cursor else None
+    except user_directory.InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    items, next_key = user_directory.list_page(db, current_user.id, limit=limit, after=after)
+    body = serialization.dumps(items)
+    headers = {"ETag": f'W/"{hashlib.sha1(body).hexdigest()}"'}
+    if next_key is not None:
+        headers["X-Next-Cursor"] = user_directory.encode_cursor(next_key)
+    if headers["ETag"] in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @router.post("/", response_model=schemas.User)
-def create_user(
+async def create_user(
     *,
     db: Session = Depends(deps.get_db),
     user_in: schemas.UserCreate,
@@ -59,7 +62,9 @@ def create_user(
     """
     Create new user.
     """
-    user = db.query(models.User).filter(models.User.email == user_in.email).first()
+    user = await run_in_threadpool(
+        lambda: db.query(models.User).filter(models.User.email == user_in.email).first()
+    )
     if user:
         raise HTTPException(
             status_code=400,
@@ -67,12 +72,16 @@ def create_user(
         )
     user = models.User(
         email=user_in.email,
-        hashed_password=get_password_hash(user_in.password),
+        hashed_password=await password_hasher.hash(user_in.password),
         full_name=user_in.full_name,
     )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+
+    def save():
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+
+    await run_in_threadpool(save)
     return user
 
 @router.get("/me", response_model=schemas.User)
@@ -85,7 +94,7 @@ def read_user_me(
     return current_user
 
 @router.put("/me", response_model=schemas.User)
-def update_user_me(
+async def update_user_me(
     *,
     db: Session = Depends(deps.get_db),
     user_in: schemas.UserUpdate,
@@ -97,7 +106,9 @@ def update_user_me(
     data = user_in.model_dump(exclude_unset=True)
 
     if "email" in data and data["email"] and data["email"] != current_user.email:
-        existing = db.query(models.User).filter(models.User.email == data["email"]).first()
+        existing = await run_in_threadpool(
+            lambda: db.query(models.User).filter(models.User.email == data["email"]).first()
+        )
         if existing:
             raise HTTPException(status_code=400, detail="Email already in use.")
         current_user.email = data["email"]
@@ -106,9 +117,13 @@ def update_user_me(
         current_user.full_name = data["full_name"]
 
     if "password" in data and data["password"]:
-        current_user.hashed_password = get_password_hash(data["password"])
+        current_user.hashed_password = await password_hasher.hash(data["password"])
+
+    def save():
+        db.add(current_user)
+        db.commit()
+        db.refresh(current_user)
 
-    db.add(current_user)
-    db.commit()
-    db.refresh(current_user)
+    await run_in_threadpool(save)
+    auth.invalidate_user(current_user.id)
     return current_user
@@ -1,86 +1,171 @@
+import logging
 from typing import Optional
-import json
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, Depends, status
-from jose import jwt, JWTError
-from sqlalchemy.orm import Session
+from jose import JWTError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from pydantic import ValidationError
 
 from app.core.config import settings
 from app.websockets.manager import manager
-from app.schemas.token import TokenPayload
-from app import schemas, models
-from app.db.session import SessionLocal
+from app.core import auth, metrics, rate_limit, serialization
+from app.websockets import protocol
+from app import schemas
+from app.api import deps
+from app.services import membership, message_batch
+from app.services.ingestion import MessageNotSaved, ingestor, persist_messages
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 async def get_token_user(token: str = Query(...)) -> Optional[int]:
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        token_data = TokenPayload(**payload)
-        if token_data.sub is None:
-            return None
-        return int(token_data.sub)
-    except (JWTError, ValueError):
+        return auth.token_user_id(token)
+    except (JWTError, ValidationError, ValueError):
         return None
 
+async def handle_batch(
+    websocket: WebSocket, user_id: int, session_factory: async_sessionmaker, items: list
+):
+    """Persist a batch in one transaction, fan it out, then ack every item to the sender."""
+    acks, frames = await message_batch.ingest_batch(session_factory, user_id, items)
+    for recipient_ids, frame in frames:
+        await manager.broadcast_to_users(recipient_ids, frame)
+    await manager.send_personal_message(protocol.Frame.event("message.batch.ack", {"items": acks}), websocket)
+
+async def within_rate_limit(
+    websocket: WebSocket,
+    user_id: int,
+    bucket: Optional[rate_limit.TokenBucket],
+    cost: int,
+    event_type: str,
+    client_msg_id: Optional[str] = None,
+) -> bool:
+    """
+    Charge cost messages to the connection's bucket and the user's. Over either limit,
+    reply error.rate_limited and return False; nothing has been read or written yet.
+    """
+    if bucket is None:
+        return True
+    scope, retry_after = "connection", bucket.take(cost)
+    if not retry_after:
+        scope, retry_after = "user", await rate_limit.ws_user_limiter.acquire(f"user:{user_id}", cost)
+        if not retry_after:
+            return True
+        # Rejected by the user's limit: the send costs this connection nothing
+        bucket.refund(cost)
+    metrics.rate_limited.labels(f"ws_{scope}").inc()
+    error = protocol.Frame.event("error.rate_limited", {
+        "event": event_type,
+        "scope": scope,
+        "retry_after": round(retry_after, 3),
+        "client_msg_id": client_msg_id,
+    })
+    await manager.send_personal_message(error, websocket)
+    return False
+
+async def reply_not_saved(websocket: WebSocket, event_type: str, client_msg_id: Optional[str] = None):
+    """
+    The message could not be stored (database error or timeout). Nothing was broadcast and
+    the socket stays open, so the client can retry it, ideally with its client_msg_id.
+    """
+    error = protocol.Frame.event("error.not_saved", {"event": event_type, "client_msg_id": client_msg_id})
+    await manager.send_personal_message(error, websocket)
+
 @router.websocket("/ws")
 async def websocket_endpoint(
     websocket: WebSocket,
-    user_id: Optional[int] = Depends(get_token_user)
+    user_id: Optional[int] = Depends(get_token_user),
+    session_factory: async_sessionmaker = Depends(deps.get_async_sessionmaker),
 ):
     if user_id is None:
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
 
-    await manager.connect(websocket, user_id)
+    subprotocol = protocol.negotiate(websocket.scope.get("subprotocols", []))
+    await manager.connect(websocket, user_id, subprotocol, protocol.protocol_for(subprotocol))
+    # Messages this socket may send (WS_CONNECTION_RATE / WS_CONNECTION_BURST)
+    bucket = (
+        rate_limit.TokenBucket(settings.WS_CONNECTION_RATE, settings.WS_CONNECTION_BURST)
+        if settings.RATE_LIMIT_ENABLED else None
+    )
     try:
         while True:
-            data = await websocket.receive_text()
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", status.WS_1000_NORMAL_CLOSURE))
             try:
-                # 1. Parse Event
-                event_dict = json.loads(data)
-                event = schemas.SocketEvent(**event_dict)
-                
-                if event.type == "message.new":
-                    # 2. Parse Payload
-                    payload = schemas.IncomingMessage(**event.payload)
+                # 1. Parse Event (JSON text or MessagePack binary frame)
+                event = protocol.decode(message)
+                if isinstance(event, list):
+                    # Several message.new events in one frame
+                    items = message_batch.items_from_events(event)
+                    if await within_rate_limit(websocket, user_id, bucket, len(items), "message.batch"):
+                        await handle_batch(websocket, user_id, session_factory, items)
+                    continue
+                if not isinstance(event, dict) or not isinstance(event.get("type"), str):
+                    raise protocol.InvalidFrame("Not an event")
+
+                if event["type"] == "message.new":
+                    # 2. Rate limit, then parse Payload
+                    raw = event.get("payload")
+                    client_msg_id = raw.get("client_msg_id") if isinstance(raw, dict) else None
+                    if not await within_rate_limit(websocket, user_id, bucket, 1, "message.new", client_msg_id):
+                        continue
+                    payload = schemas.IncomingMessage.model_validate(raw)
                     
-                    # 3. Persist Message
-                    # We need a fresh session here since we are in an async loop and not in a standard request
-                    db = SessionLocal()
+                    # 3. Verify user is participant; the member set doubles as the recipient list
+                    try:
+                        member_ids = await membership.aget_member_ids(session_factory, payload.conversation_id)
+                    except SQLAlchemyError:
+                        logger.exception("Failed to load members of conversation %s", payload.conversation_id)
+                        await reply_not_saved(websocket, "message.new", payload.client_msg_id)
+                        continue
+                    if user_id not in member_ids:
+                        await manager.send_personal_message("Error: Not a participant", websocket)
+                        continue
+
+                    # 4. Persist Message
+                    # Uses the async session so a slow insert does not stall other sockets, and
+                    # a failed one only fails this message, not the connection
                     try:
-                        # Verify user is participant
-                        # For simplicity, assuming direct message or user in conversation
-                        # In production, check existing membership properly
-                        
-                        msg = models.Message(
-                            content=payload.content,
-                            sender_id=user_id,
-                            conversation_id=payload.conversation_id
-                        )
-                        db.add(msg)
-                        db.commit()
-                        db.refresh(msg)
-                        
-                        # 4. Get recipients
-                        conversation = db.query(models.Conversation).get(payload.conversation_id)
-                        recipient_ids = [p.id for p in conversation.participants]
-                        
-                        # 5. Broadcast
-                        out_msg = schemas.OutgoingMessage.model_validate(msg)
-                        response_event = schemas.SocketEvent(
-                            type="message.new",
-                            payload=out_msg.model_dump(mode="json")
-                        )
-                        await manager.broadcast_to_users(recipient_ids, response_event.model_dump_json())
-                        
-                    finally:
-                        db.close()
-            
-            except (ValidationError, json.JSONDecodeError) as e:
+                        if settings.INGEST_BATCHING:
+                            msg = await ingestor.submit(user_id, payload)
+                        else:
+                            msg, = await persist_messages(session_factory, [(user_id, payload)])
+                    except MessageNotSaved:
+                        # Already logged by the ingestor
+                        await reply_not_saved(websocket, "message.new", payload.client_msg_id)
+                        continue
+                    except SQLAlchemyError:
+                        logger.exception("Failed to persist message from user %s", user_id)
+                        await reply_not_saved(websocket, "message.new", payload.client_msg_id)
+                        continue
+                    recipient_ids = list(member_ids)
+
+                    # 5. Broadcast, encoded once per protocol for every recipient; a resend
+                    # was already delivered when it was first stored
+                    if not msg.duplicate:
+                        frame = protocol.Frame.event("message.new", serialization.message_payload(msg))
+                        await manager.broadcast_to_users(recipient_ids, frame)
+
+                    # 6. Ack messages the client can retry
+                    if payload.client_msg_id is not None:
+                        ack = protocol.Frame.event("message.ack", serialization.ack_payload(msg))
+                        await manager.send_personal_message(ack, websocket)
+
+                elif event["type"] == "message.batch":
+                    items = message_batch.items_from_payload(event.get("payload"))
+                    if await within_rate_limit(websocket, user_id, bucket, len(items), "message.batch"):
+                        await handle_batch(websocket, user_id, session_factory, items)
+
+            except message_batch.BatchTooLarge:
+                await manager.send_personal_message("Error: Batch too large", websocket)
+            except (ValidationError, protocol.InvalidFrame) as e:
                 await manager.send_personal_message(f"Error: Invalid format", websocket)
                 
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket, user_id)
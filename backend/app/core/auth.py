@@ -0,0 +1,71 @@
+"""
+Cached token validation and a lightweight user principal.
+
+Validated tokens are cached by SHA-256 digest until their own expiry, so a token is only
+decoded and verified once. The principal (id, is_active, email) is cached per user id and
+must be invalidated whenever those fields change (see invalidate_user).
+"""
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from jose import jwt
+from sqlalchemy.orm import Session
+
+from app import models, schemas
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    is_active: bool
+    email: str
+
+token_cache: TTLCache[int] = TTLCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+principal_cache: TTLCache[Principal] = TTLCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.PRINCIPAL_CACHE_TTL)
+
+def token_user_id(token: str) -> Optional[int]:
+    """
+    Return the user id for a valid token, or None if the token has no subject.
+    Raises JWTError / ValidationError for invalid or expired tokens.
+    """
+    digest = hashlib.sha256(token.encode("utf-8")).digest()
+    user_id = token_cache.get(digest)
+    if user_id is not None:
+        return user_id
+
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    token_data = schemas.TokenPayload(**payload)
+    if token_data.sub is None:
+        return None
+    user_id = int(token_data.sub)
+    exp = payload.get("exp")
+    ttl = exp - time.time() if exp is not None else None
+    if ttl is None or ttl > 0:
+        token_cache.set(digest, user_id, ttl=ttl)
+    return user_id
+
+def principal_from_user(user: models.User) -> Principal:
+    principal = Principal(id=user.id, is_active=bool(user.is_active), email=user.email)
+    principal_cache.set(user.id, principal)
+    return principal
+
+def get_principal(db: Session, user_id: int) -> Optional[Principal]:
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+    row = (
+        db.query(models.User.id, models.User.is_active, models.User.email)
+        .filter(models.User.id == user_id)
+        .first()
+    )
+    if row is None:
+        return None
+    principal = Principal(id=row.id, is_active=bool(row.is_active), email=row.email)
+    principal_cache.set(user_id, principal)
+    return principal
+
+def invalidate_user(user_id: int) -> None:
+    principal_cache.invalidate(user_id)
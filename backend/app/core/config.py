@@ -1,5 +1,18 @@
 from pydantic_settings import BaseSettings
 
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def to_async_database_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    if not sep or scheme not in ASYNC_DRIVERS:
+        return url
+    return f"{ASYNC_DRIVERS[scheme]}://{rest}"
+
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Chat Application"
     API_V1_STR: str = "/api/v1"
@@ -11,11 +24,72 @@ class Settings(BaseSettings):
     POSTGRES_PORT: str = "5433"
     POSTGRES_DB: str = "chat_app"
     DATABASE_URL: str = ""
+    # Derived from DATABASE_URL when empty (asyncpg for Postgres, aiosqlite for SQLite)
+    ASYNC_DATABASE_URL: str = ""
+    # Connection pool (Postgres only, see app/db/pool.py); sized per engine and per worker
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Connect through PgBouncer in transaction mode: no app-side pool, no prepared statement caches
+    DB_PGBOUNCER: bool = False
 
     # Security
     SECRET_KEY: str = "change_this_to_a_secure_random_string"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # bcrypt cost; existing hashes are upgraded on the next successful login
+    PASSWORD_HASH_ROUNDS: int = 12
+    # thread | process
+    PASSWORD_HASH_EXECUTOR: str = "thread"
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+
+    # WebSockets
+    WS_SEND_QUEUE_SIZE: int = 256
+    WS_SEND_TIMEOUT: float = 10.0
+    # disconnect | drop_oldest | drop_newest
+    WS_SLOW_CONSUMER_POLICY: str = "disconnect"
+    # Empty for in-process fan-out, redis://host:port/db to fan out across workers
+    BACKPLANE_URL: str = ""
+    # Most messages accepted in one message.batch event or array frame
+    WS_MAX_BATCH_SIZE: int = 500
+
+    # Write-behind batching of socket messages (see app/services/ingestion.py)
+    INGEST_BATCHING: bool = False
+    INGEST_MAX_BATCH_SIZE: int = 100
+    INGEST_MAX_DELAY: float = 0.005
+    # Recently stored (sender_id, client_msg_id) pairs answered without touching the database;
+    # older resends are still caught by the unique index
+    MESSAGE_DEDUP_WINDOW_SIZE: int = 100000
+    MESSAGE_DEDUP_WINDOW_TTL: float = 600.0
+
+    # Debounce window for buffered read markers and conversation.read broadcasts
+    READ_RECEIPT_FLUSH_INTERVAL: float = 1.0
+
+    # Rate limiting (see app/core/rate_limit.py): rates in tokens per second, bursts in tokens
+    RATE_LIMIT_ENABLED: bool = True
+    # Empty for per-worker buckets, redis://host:port/db to share per-user buckets across workers
+    RATE_LIMIT_URL: str = ""
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    # Messages sent on one socket, and by one user over all of their sockets
+    WS_CONNECTION_RATE: float = 10.0
+    WS_CONNECTION_BURST: int = 50
+    WS_USER_RATE: float = 20.0
+    WS_USER_BURST: int = 100
+    # User searches per user
+    SEARCH_RATE: float = 2.0
+    SEARCH_BURST: int = 20
+    # Login attempts per client address
+    LOGIN_RATE: float = 0.5
+    LOGIN_BURST: int = 20
+
+    # Caches
+    MEMBERSHIP_CACHE_SIZE: int = 10000
+    MEMBERSHIP_CACHE_TTL: float = 60.0
+    AUTH_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL: float = 300.0
 
     class Config:
         env_file = ".env"
@@ -24,5 +98,7 @@ class Settings(BaseSettings):
         super().__init__(**kwargs)
         if not self.DATABASE_URL:
              self.DATABASE_URL = f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
+        if not self.ASYNC_DATABASE_URL:
+            self.ASYNC_DATABASE_URL = to_async_database_url(self.DATABASE_URL)
 
 settings = Settings()
@@ -0,0 +1,204 @@
+"""
+Prometheus metrics, served at /metrics.
+
+Everything here is cheap enough to leave on: counters and histograms are updated in
+O(1) on the hot paths, and gauges that mirror in-process state (connections, queue
+depths, pools) are read only when Prometheus scrapes, through StateCollector.
+
+Per-request database work is tracked with a context variable set by MetricsMiddleware
+and updated from SQLAlchemy cursor events. Starlette copies the context into the
+threadpool, so sync endpoints are counted too.
+"""
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional
+
+from prometheus_client import CollectorRegistry, Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+registry = CollectorRegistry()
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+    registry=registry,
+)
+http_request_db_queries = Histogram(
+    "http_request_db_queries",
+    "Database queries issued per HTTP request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100),
+    registry=registry,
+)
+http_request_db_seconds = Histogram(
+    "http_request_db_seconds",
+    "Time spent in database queries per HTTP request",
+    ["route"],
+    buckets=LATENCY_BUCKETS,
+    registry=registry,
+)
+db_query_duration = Histogram(
+    "db_query_duration_seconds",
+    "Duration of individual database queries",
+    buckets=LATENCY_BUCKETS,
+    registry=registry,
+)
+messages_ingested = Counter(
+    "ws_messages_ingested_total",
+    "Socket messages persisted",
+    registry=registry,
+)
+messages_deduplicated = Counter(
+    "ws_messages_deduplicated_total",
+    "Resent socket messages answered with the already stored copy",
+    ["source"],  # window | database
+    registry=registry,
+)
+rate_limited = Counter(
+    "rate_limited_total",
+    "Requests and socket sends rejected by a rate limit",
+    ["limit"],  # ws_connection | ws_user | search | login
+    registry=registry,
+)
+broadcast_fanout = Histogram(
+    "ws_broadcast_recipients",
+    "Users a broadcast was addressed to",
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250, 1000),
+    registry=registry,
+)
+ws_send_duration = Histogram(
+    "ws_send_seconds",
+    "Time to write one frame to a socket",
+    buckets=LATENCY_BUCKETS,
+    registry=registry,
+)
+
+@dataclass
+class RequestDBStats:
+    queries: int = 0
+    seconds: float = 0.0
+
+_request_db_stats: ContextVar[Optional[RequestDBStats]] = ContextVar("request_db_stats", default=None)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    elapsed = time.perf_counter() - started
+    db_query_duration.observe(elapsed)
+    stats = _request_db_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.seconds += elapsed
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    # after_cursor_execute does not run for failed statements
+    if context.connection is not None:
+        started = context.connection.info.get("query_started")
+        if started:
+            started.pop()
+
+def route_template(scope) -> str:
+    """
+    The matched route as a template (/api/v1/messages/{conversation_id}/messages), rebuilt
+    from the request path and its path parameters so included routers' prefixes are kept.
+    """
+    if scope.get("route") is None:
+        return "unmatched"
+    params = {str(value): name for name, value in scope.get("path_params", {}).items()}
+    if not params:
+        return scope["path"]
+    return "/".join(
+        "{%s}" % params[segment] if segment in params else segment
+        for segment in scope["path"].split("/")
+    )
+
+class MetricsMiddleware:
+    """
+    Records latency and database work per route template. Plain ASGI, so streaming
+    responses pass through untouched; unmatched paths share one label. A request is
+    measured up to its last response body, so background tasks (such as the read-marker
+    flush) count against neither its latency nor its queries.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestDBStats()
+        token = _request_db_stats.set(stats)
+        status_code = 500
+        started = time.perf_counter()
+        recorded = False
+
+        def record():
+            nonlocal recorded
+            if recorded:
+                return
+            recorded = True
+            route = route_template(scope)
+            http_request_duration.labels(scope["method"], route, str(status_code)).observe(
+                time.perf_counter() - started
+            )
+            http_request_db_queries.labels(route).observe(stats.queries)
+            http_request_db_seconds.labels(route).observe(stats.seconds)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                record()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_db_stats.reset(token)
+            # No complete response was sent (the app raised, or the client went away)
+            record()
+
+class StateCollector:
+    """
+    Gauges sampled at scrape time. A sampler returns a bare number, or {label value: number}
+    for gauges registered with a label.
+    """
+    def __init__(self):
+        self.gauges: Dict[str, tuple] = {}
+
+    def add(
+        self, name: str, documentation: str, sampler: Callable[[], object], label: Optional[str] = None
+    ) -> None:
+        self.gauges[name] = (documentation, sampler, label)
+
+    def collect(self) -> Iterable[GaugeMetricFamily]:
+        for name, (documentation, sampler, label) in self.gauges.items():
+            value = sampler()
+            if label is not None:
+                family = GaugeMetricFamily(name, documentation, labels=[label])
+                for label_value, sample in value.items():
+                    family.add_metric([str(label_value)], sample)
+            else:
+                family = GaugeMetricFamily(name, documentation, value=value)
+            yield family
+
+    def describe(self) -> Iterable[GaugeMetricFamily]:
+        # Without this the registry would call collect() once at registration
+        return []
+
+state = StateCollector()
+registry.register(state)
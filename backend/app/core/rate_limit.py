@@ -0,0 +1,193 @@
+"""
+Token-bucket rate limiting for the socket and for expensive REST endpoints.
+
+A bucket holds up to `burst` tokens and refills at `rate` tokens per second; an action
+costs one token per unit of work (one per message for socket sends). Over the limit,
+callers get the number of seconds until the cost would fit (retry_after) and reject the
+action: error.rate_limited on the socket, 429 with Retry-After over HTTP. A cost larger
+than the bucket is charged as a full bucket, so a maximum-size message.batch is still
+accepted once the bucket is full.
+
+- TokenBucket: a single bucket, for state owned by one task (each socket's own bucket).
+- InMemoryRateLimiter: keyed buckets in this process, LRU-bounded by RATE_LIMIT_MAX_KEYS.
+  An evicted key starts again with a full bucket.
+- RedisRateLimiter: keyed buckets shared by all workers, updated atomically by a Lua
+  script using the Redis clock (Redis 5+). If Redis is unreachable it falls back to
+  in-process buckets rather than rejecting traffic.
+
+create_rate_limiter builds the one configured by RATE_LIMIT_URL, or an unlimited one when
+RATE_LIMIT_ENABLED is off.
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """
+    A single token bucket. Not thread-safe; meant for state owned by one task.
+    """
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic() if now is None else now
+
+    def take(self, cost: float = 1, now: Optional[float] = None) -> float:
+        """
+        Take cost tokens. Returns 0 when allowed, otherwise seconds until cost would fit
+        (nothing is taken).
+        """
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        cost = min(cost, self.burst)
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def refund(self, cost: float = 1) -> None:
+        """Give back tokens taken for an action that was rejected elsewhere."""
+        self.tokens = min(self.burst, self.tokens + min(cost, self.burst))
+
+class RateLimiter:
+    """
+    Interface for keyed token buckets.
+    """
+    async def acquire(self, key: str, cost: float = 1) -> float:
+        """Take cost tokens from key's bucket; 0 when allowed, else retry_after seconds."""
+        raise NotImplementedError
+
+class UnlimitedRateLimiter(RateLimiter):
+    async def acquire(self, key: str, cost: float = 1) -> float:
+        return 0.0
+
+class InMemoryRateLimiter(RateLimiter):
+    """
+    Keyed buckets in this process. Safe to share between the event loop and threadpool-run
+    sync endpoints.
+    """
+    def __init__(self, rate: float, burst: float, maxsize: int = settings.RATE_LIMIT_MAX_KEYS):
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, cost: float = 1) -> float:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+                while len(self._buckets) > self.maxsize:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket.take(cost)
+
+    async def acquire(self, key: str, cost: float = 1) -> float:
+        return self.take(key, cost)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+# KEYS[1] = bucket; ARGV = rate, burst, cost. Returns retry_after as a string (Lua numbers
+# are truncated to integers in replies).
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = math.min(tonumber(ARGV[3]), burst)
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(retry_after)
+"""
+
+class RedisRateLimiter(RateLimiter):
+    """
+    Keyed buckets shared by every worker through Redis.
+    """
+    def __init__(
+        self,
+        url: str = "",
+        rate: float = 1,
+        burst: float = 1,
+        client: Any = None,
+        key_prefix: str = "ratelimit:",
+    ):
+        self.url = url
+        self.rate = rate
+        self.burst = burst
+        self.client = client
+        self.key_prefix = key_prefix
+        self.script = None
+        # Used while Redis is unreachable
+        self.fallback = InMemoryRateLimiter(rate, burst)
+
+    def _script(self):
+        if self.script is None:
+            if self.client is None:
+                try:
+                    import redis.asyncio as redis
+                except ImportError as e:
+                    raise RuntimeError("RedisRateLimiter requires the 'redis' package") from e
+                self.client = redis.from_url(self.url, decode_responses=True)
+            self.script = self.client.register_script(_TAKE_SCRIPT)
+        return self.script
+
+    async def acquire(self, key: str, cost: float = 1) -> float:
+        try:
+            script = self._script()
+            retry_after = await script(keys=[self.key_prefix + key], args=[self.rate, self.burst, cost])
+            return float(retry_after)
+        except RuntimeError:
+            raise
+        except Exception as e:
+            logger.warning("Rate limit backend unavailable, using local buckets: %r", e)
+            return self.fallback.take(key, cost)
+
+def create_rate_limiter(rate: float, burst: float, name: str, url: Optional[str] = None) -> RateLimiter:
+    """
+    The limiter for one kind of action, configured by RATE_LIMIT_ENABLED and RATE_LIMIT_URL
+    (empty for in-process buckets, redis:// to share them between workers).
+    """
+    url = settings.RATE_LIMIT_URL if url is None else url
+    if not settings.RATE_LIMIT_ENABLED:
+        return UnlimitedRateLimiter()
+    if not url:
+        return InMemoryRateLimiter(rate, burst)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisRateLimiter(url, rate, burst, key_prefix=f"ratelimit:{name}:")
+    raise ValueError(f"Unsupported rate limit URL: {url}")
+
+def retry_after_header(retry_after: float) -> str:
+    """Retry-After takes whole seconds."""
+    return str(max(1, math.ceil(retry_after)))
+
+# Socket sends per user, across all of the user's connections
+ws_user_limiter = create_rate_limiter(settings.WS_USER_RATE, settings.WS_USER_BURST, "ws")
+# GET /users/search per user
+search_limiter = create_rate_limiter(settings.SEARCH_RATE, settings.SEARCH_BURST, "search")
+# POST /login/access-token per client address
+login_limiter = create_rate_limiter(settings.LOGIN_RATE, settings.LOGIN_BURST, "login")
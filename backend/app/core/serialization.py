@@ -0,0 +1,47 @@
+"""
+orjson-backed JSON encoding for REST responses and socket events.
+
+Endpoints that build their own dicts (messages, conversations, sync) return ORJSONResponse
+directly. Returning a Response skips FastAPI's response-model validation and
+jsonable_encoder, and orjson encodes the body in one pass.
+
+Socket events are encoded once per broadcast by encode_event; the same frame is then
+queued for every recipient. Datetimes are written as pydantic's JSON mode writes them
+(ISO 8601, "Z" for UTC), so the wire format of events is unchanged.
+"""
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def encode_event(event_type: str, payload: Any) -> str:
+    """A socket event frame, {"type": ..., "payload": ...}, as text."""
+    return orjson.dumps({"type": event_type, "payload": payload}, option=orjson.OPT_UTC_Z).decode()
+
+def message_payload(msg, seen: bool = False) -> dict:
+    """The message.new payload (schemas.OutgoingMessage's fields) for a stored message."""
+    return {
+        "id": msg.id,
+        "conversation_id": msg.conversation_id,
+        "content": msg.content,
+        "sender_id": msg.sender_id,
+        "created_at": msg.created_at,
+        "seen": seen,
+    }
+
+def ack_payload(msg) -> dict:
+    """The message.ack payload: where the sender's message is stored, and whether it was a resend."""
+    return {
+        "client_msg_id": msg.client_msg_id,
+        "id": msg.id,
+        "conversation_id": msg.conversation_id,
+        "created_at": msg.created_at,
+        "duplicate": msg.duplicate,
+    }
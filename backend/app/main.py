@@ -1,14 +1,36 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from fastapi.middleware.cors import CORSMiddleware
+from app.core import metrics
 from app.core.config import settings
+from app.core.security import HasherBusy, password_hasher
 from app.api.v1.api import api_router
-from app.db.session import engine
+from app.db.pool import pool_status
+from app.db.session import async_engine, engine
 from app.db.base import Base
+from app.websockets.manager import manager
+from app.services.ingestion import ingestor
+from app.services.read_receipts import read_markers
 
 # Create tables
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title=settings.PROJECT_NAME)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await manager.start()
+    if settings.INGEST_BATCHING:
+        await ingestor.start()
+    yield
+    await ingestor.stop()
+    await read_markers.flush()
+    password_hasher.shutdown()
+    await manager.stop()
+
+app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
+
+app.add_middleware(metrics.MetricsMiddleware)
 
 # Configure CORS
 app.add_middleware(
@@ -17,10 +39,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+@app.exception_handler(HasherBusy)
+async def hasher_busy_handler(request: Request, exc: HasherBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, try again shortly."},
+        headers={"Retry-After": "1"},
+    )
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Chat Application API"}
@@ -28,3 +59,49 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
+
+def _pool_gauge(key: str):
+    def sample():
+        pools = {"sync": engine.pool, "async": async_engine.sync_engine.pool}
+        return {name: pool_status(pool).get(key, 0) for name, pool in pools.items()}
+    return sample
+
+metrics.state.add(
+    "ws_active_connections", "Open WebSocket connections on this worker",
+    lambda: len(manager.connections),
+)
+metrics.state.add(
+    "ws_connected_users", "Users with at least one open WebSocket on this worker",
+    lambda: len(manager.active_connections),
+)
+metrics.state.add(
+    "background_queue_depth", "Items waiting in in-process background queues",
+    lambda: {
+        "ingest": ingestor.queue.qsize() if ingestor.queue is not None else 0,
+        "read_markers": read_markers.pending_count(),
+        "password_hash": password_hasher.stats()["queued"],
+        "ws_send": manager.queued_messages(),
+    },
+    label="queue",
+)
+metrics.state.add("db_pool_checked_out", "Connections checked out of the pool", _pool_gauge("checked_out"), label="engine")
+metrics.state.add("db_pool_overflow", "Overflow connections beyond pool_size", _pool_gauge("overflow"), label="engine")
+metrics.state.add("db_pool_checkout_timeouts", "Checkouts that hit pool_timeout", _pool_gauge("timeouts"), label="engine")
+metrics.state.add(
+    "db_pool_wait_seconds_total", "Total time spent waiting for a pooled connection",
+    _pool_gauge("wait_seconds_total"), label="engine",
+)
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return Response(generate_latest(metrics.registry), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/metrics/db")
+async def db_pool_metrics():
+    """
+    Connection pool gauges: checked out / overflow connections and checkout wait times.
+    """
+    return {
+        "sync": pool_status(engine.pool),
+        "async": pool_status(async_engine.sync_engine.pool),
+    }
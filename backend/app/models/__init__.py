@@ -1,3 +1,6 @@
 from .user import User
 from .conversation import Conversation, conversation_participants
 from .message import Message
+
+# Registers the after_flush hook that keeps conversation summaries in step with ORM inserts
+from app.services import conversation_summary  # noqa: E402,F401
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index, Table
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base_class import Base
@@ -10,7 +10,10 @@ conversation_participants = Table(
     Column('conversation_id', Integer, ForeignKey('conversation.id'), primary_key=True),
     Column('user_id', Integer, ForeignKey('user.id'), primary_key=True),
     Column('joined_at', DateTime(timezone=True), server_default=func.now()),
-    Column('last_read_at', DateTime(timezone=True), nullable=True)
+    Column('last_read_at', DateTime(timezone=True), nullable=True),
+    # Messages from others since last_read_at; maintained by persist_messages and the read flush
+    Column('unread_count', Integer, nullable=False, default=0, server_default='0'),
+    Index('ix_conversation_participants_user_id', 'user_id'),
 )
 
 class Conversation(Base):
@@ -18,6 +21,15 @@ class Conversation(Base):
     name = Column(String, nullable=True) # Optional for 1-on-1
     is_group = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    
+    # Latest message, maintained by persist_messages so listings need no aggregate over message
+    last_message_id = Column(Integer, nullable=True)
+    last_message_at = Column(DateTime(timezone=True), nullable=True)
+
     participants = relationship("User", secondary=conversation_participants, backref="conversations")
     messages = relationship("Message", back_populates="conversation")
+    last_message = relationship(
+        "Message",
+        primaryjoin="foreign(Conversation.last_message_id) == Message.id",
+        viewonly=True,
+        uselist=False,
+    )
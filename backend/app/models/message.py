@@ -1,14 +1,29 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base_class import Base
 
 class Message(Base):
-    id = Column(Integer, primary_key=True, index=True)
-    conversation_id = Column(Integer, ForeignKey("conversation.id"), nullable=False, index=True)
-    sender_id = Column(Integer, ForeignKey("user.id"), nullable=False, index=True)
+    id = Column(Integer, primary_key=True)
+    conversation_id = Column(Integer, ForeignKey("conversation.id"), nullable=False)
+    sender_id = Column(Integer, ForeignKey("user.id"), nullable=False)
     content = Column(String, nullable=False)
+    # Optional id chosen by the sending client, see app/services/ingestion.py
+    client_msg_id = Column(String(64), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
 
     conversation = relationship("Conversation", back_populates="messages")
     sender = relationship("User") # No backref needed on User for now
+
+    __table_args__ = (
+        # History pages: conversation_id = ? AND id < ? ORDER BY id DESC (also export and sync)
+        Index("ix_message_conversation_id_id", conversation_id, id.desc()),
+        # Unread counts: conversation_id = ? AND created_at > last_read_at
+        Index("ix_message_conversation_id_created_at", conversation_id, created_at),
+        # Idempotent sends; rows without a client_msg_id (NULL) never conflict. Also serves
+        # sender_id lookups.
+        Index("ix_message_sender_id_client_msg_id", sender_id, client_msg_id, unique=True),
+    )
+
+    # Fetch created_at as part of the INSERT so async callers never lazy-load it
+    __mapper_args__ = {"eager_defaults": True}
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String
+from sqlalchemy import Boolean, Column, DDL, Index, Integer, String, event, func, literal_column
 from app.db.base_class import Base
 
 class User(Base):
@@ -7,3 +7,52 @@ class User(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean(), default=True)
+
+    __table_args__ = (
+        # Keyset order of the user directory (see app/services/user_directory.py); the
+        # trailing columns make it covering so pages are served from the index alone
+        Index(
+            "ix_user_directory",
+            func.coalesce(full_name, literal_column("''")), email, id, full_name, is_active,
+        ),
+        # Substring search (see app/services/user_search.py); Postgres only, needs pg_trgm
+        Index(
+            "ix_user_email_trgm", "email",
+            postgresql_using="gin", postgresql_ops={"email": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_user_full_name_trgm", "full_name",
+            postgresql_using="gin", postgresql_ops={"full_name": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
+# On SQLite, search goes through an FTS5 trigram table kept in sync with "user" by triggers.
+# These mirror the add_user_search_indexes migration for databases built with create_all.
+USER_SEARCH_SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS user_search USING fts5(
+        email, full_name, content='user', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS user_search_ai AFTER INSERT ON user BEGIN
+        INSERT INTO user_search(rowid, email, full_name) VALUES (new.id, new.email, new.full_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_search_ad AFTER DELETE ON user BEGIN
+        INSERT INTO user_search(user_search, rowid, email, full_name)
+        VALUES ('delete', old.id, old.email, old.full_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_search_au AFTER UPDATE OF email, full_name ON user BEGIN
+        INSERT INTO user_search(user_search, rowid, email, full_name)
+        VALUES ('delete', old.id, old.email, old.full_name);
+        INSERT INTO user_search(rowid, email, full_name) VALUES (new.id, new.email, new.full_name);
+    END""",
+]
+
+event.listen(
+    User.__table__, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+for statement in USER_SEARCH_SQLITE_DDL:
+    event.listen(User.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(
+    User.__table__, "before_drop",
+    DDL("DROP TABLE IF EXISTS user_search").execute_if(dialect="sqlite"),
+)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Any, Optional
 from datetime import datetime
 
@@ -9,6 +9,8 @@ class SocketEvent(BaseModel):
 class IncomingMessage(BaseModel):
     conversation_id: int
     content: str
+    # Client-chosen id, unique per sender: a resend with the same id is acked, not stored again
+    client_msg_id: Optional[str] = Field(None, min_length=1, max_length=64)
 
 class OutgoingMessage(BaseModel):
     id: int
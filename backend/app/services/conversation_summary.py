@@ -0,0 +1,94 @@
+"""
+Denormalized conversation summary.
+
+conversation.last_message_id / last_message_at and conversation_participants.unread_count
+are maintained on write so conversation listings never aggregate over message:
+
+- persist_messages (the socket path, direct or batched) calls record_messages in the
+  transaction that inserts the messages.
+- Messages added through the ORM (seeding, admin scripts, tests) are picked up by an
+  after_flush hook, in the same transaction. app.models imports this module, so the hook
+  is registered wherever the models are loaded.
+- The read flush resets unread_count to the messages newer than the new last_read_at
+  (see read_receipts._mark_read).
+
+Both statements run as one executemany each per batch, and last_message_id only moves
+forward, so concurrent writers to one conversation cannot move it backwards.
+"""
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import and_, bindparam, event, or_
+from sqlalchemy.orm import Session
+
+from app.models.conversation import Conversation, conversation_participants
+from app.models.message import Message
+
+_conversation = Conversation.__table__
+
+_set_last_message = (
+    _conversation.update()
+    .where(
+        and_(
+            _conversation.c.id == bindparam("b_conversation_id"),
+            or_(
+                _conversation.c.last_message_id.is_(None),
+                _conversation.c.last_message_id < bindparam("b_message_id"),
+            ),
+        )
+    )
+    .values(last_message_id=bindparam("b_message_id"), last_message_at=bindparam("b_created_at"))
+)
+
+_bump_unread = (
+    conversation_participants.update()
+    .where(
+        and_(
+            conversation_participants.c.conversation_id == bindparam("b_conversation_id"),
+            conversation_participants.c.user_id != bindparam("b_sender_id"),
+        )
+    )
+    .values(unread_count=conversation_participants.c.unread_count + bindparam("b_count"))
+)
+
+def summary_updates(messages: Iterable) -> Tuple[List[dict], List[dict]]:
+    """
+    Parameters for _set_last_message (newest message per conversation) and _bump_unread
+    (message count per conversation and sender). Messages need id, conversation_id,
+    sender_id and created_at.
+    """
+    latest: Dict[int, object] = {}
+    counts: Counter = Counter()
+    for msg in messages:
+        current = latest.get(msg.conversation_id)
+        if current is None or current.id < msg.id:
+            latest[msg.conversation_id] = msg
+        counts[(msg.conversation_id, msg.sender_id)] += 1
+    last = [
+        {"b_conversation_id": cid, "b_message_id": msg.id, "b_created_at": msg.created_at}
+        for cid, msg in latest.items()
+    ]
+    unread = [
+        {"b_conversation_id": cid, "b_sender_id": sender_id, "b_count": count}
+        for (cid, sender_id), count in counts.items()
+    ]
+    return last, unread
+
+async def record_messages(db, messages: Iterable) -> None:
+    """
+    Update summaries for freshly inserted messages using an AsyncSession.
+    """
+    last, unread = summary_updates(messages)
+    if last:
+        await db.execute(_set_last_message, last)
+        await db.execute(_bump_unread, unread)
+
+@event.listens_for(Session, "after_flush")
+def _record_orm_messages(session: Session, flush_context) -> None:
+    new_messages = [obj for obj in session.new if isinstance(obj, Message)]
+    if not new_messages:
+        return
+    last, unread = summary_updates(new_messages)
+    connection = session.connection()
+    connection.execute(_set_last_message, last)
+    connection.execute(_bump_unread, unread)
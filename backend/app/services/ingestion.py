@@ -0,0 +1,289 @@
+"""
+Socket message persistence, with an optional write-behind pipeline.
+
+persist_messages writes any number of messages with one multi-row
+INSERT ... RETURNING id, created_at and a single commit.
+
+MessageIngestor (enabled with INGEST_BATCHING) collects messages from all sockets of
+a worker into micro-batches bounded by INGEST_MAX_BATCH_SIZE and INGEST_MAX_DELAY,
+and resolves each sender's future once its batch is committed.
+
+Ordering: batches are written one at a time by a single task, and rows inside a batch are
+inserted in submission order, so message ids follow the order in which messages reached
+this worker's ingestor. Each socket awaits its own message before reading its next frame,
+so messages from one connection keep their order, and within a conversation the id order
+matches arrival order at the worker. Messages for the same conversation arriving on
+different workers are ordered by their commits, exactly as in the unbatched path.
+
+Idempotency: a message may carry a client_msg_id, unique per sender (enforced by
+ix_message_sender_id_client_msg_id). A resend of a stored id is not inserted again; the
+caller gets the stored message with duplicate=True, acks it and skips the broadcast.
+Resends are usually quick retries after a reconnect, so recently stored ids are kept in
+recent_messages and answered without a query. Older ones, or ones stored by another
+worker, show up as a unique violation on the INSERT; only then are the stored rows looked
+up and the remaining messages inserted, so the common path is still a single statement.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app import models, schemas
+from app.core import metrics
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.services import conversation_summary
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class StoredMessage:
+    id: int
+    conversation_id: int
+    sender_id: int
+    content: str
+    created_at: datetime
+    client_msg_id: Optional[str] = None
+    # Stored by an earlier send with the same client_msg_id
+    duplicate: bool = False
+
+Key = Tuple[int, str]  # (sender_id, client_msg_id)
+
+class MessageNotSaved(RuntimeError):
+    """Set on a submitter's future when its message could not be written."""
+
+# Messages with a client_msg_id stored by this worker recently
+recent_messages: TTLCache[StoredMessage] = TTLCache(
+    settings.MESSAGE_DEDUP_WINDOW_SIZE, settings.MESSAGE_DEDUP_WINDOW_TTL
+)
+
+async def persist_messages(
+    session_factory: async_sessionmaker,
+    items: Sequence[Tuple[int, schemas.IncomingMessage]],
+) -> List[StoredMessage]:
+    """
+    Insert (sender_id, message) pairs in one statement and transaction, preserving order.
+    Conversation summaries are updated in the same transaction.
+
+    Resends of a stored client_msg_id, including repeats within items, are not inserted;
+    their entry is the stored message with duplicate=True.
+    """
+    results: List[Optional[StoredMessage]] = [None] * len(items)
+    pending: List[int] = []
+    first_index: Dict[Key, int] = {}
+    repeats: List[Tuple[int, int]] = []
+    for i, (sender_id, payload) in enumerate(items):
+        if payload.client_msg_id is not None:
+            key = (sender_id, payload.client_msg_id)
+            recent = recent_messages.get(key)
+            if recent is not None:
+                results[i] = replace(recent, duplicate=True)
+                metrics.messages_deduplicated.labels("window").inc()
+                continue
+            if key in first_index:
+                repeats.append((i, first_index[key]))
+                continue
+            first_index[key] = i
+        pending.append(i)
+
+    if pending:
+        stored = await _store(session_factory, [items[i] for i in pending])
+        for i, msg in zip(pending, stored):
+            results[i] = msg
+            if msg.client_msg_id is not None:
+                recent_messages.set((msg.sender_id, msg.client_msg_id), replace(msg, duplicate=False))
+    for i, first in repeats:
+        results[i] = replace(results[first], duplicate=True)
+        metrics.messages_deduplicated.labels("window").inc()
+    return results
+
+async def _store(
+    session_factory: async_sessionmaker, items: Sequence[Tuple[int, schemas.IncomingMessage]]
+) -> List[StoredMessage]:
+    try:
+        return await _insert(session_factory, items, {})
+    except IntegrityError:
+        # Some client_msg_id is already stored: outside the window, or by another worker
+        existing = await _find_stored(session_factory, items)
+        if not existing:
+            raise
+        metrics.messages_deduplicated.labels("database").inc(len(existing))
+        return await _insert(session_factory, items, existing)
+
+async def _insert(
+    session_factory: async_sessionmaker,
+    items: Sequence[Tuple[int, schemas.IncomingMessage]],
+    existing: Dict[Key, StoredMessage],
+) -> List[StoredMessage]:
+    rows = [
+        {
+            "conversation_id": payload.conversation_id,
+            "sender_id": sender_id,
+            "content": payload.content,
+            "client_msg_id": payload.client_msg_id,
+        }
+        for sender_id, payload in items
+        if (sender_id, payload.client_msg_id) not in existing
+    ]
+    inserted: List[StoredMessage] = []
+    if rows:
+        async with session_factory() as db:
+            result = await db.execute(
+                insert(models.Message).returning(
+                    models.Message.id,
+                    models.Message.created_at,
+                    sort_by_parameter_order=True,
+                ),
+                rows,
+            )
+            inserted = [
+                StoredMessage(
+                    id=row.id,
+                    conversation_id=values["conversation_id"],
+                    sender_id=values["sender_id"],
+                    content=values["content"],
+                    created_at=row.created_at,
+                    client_msg_id=values["client_msg_id"],
+                )
+                for values, row in zip(rows, result.all())
+            ]
+            await conversation_summary.record_messages(db, inserted)
+            await db.commit()
+        metrics.messages_ingested.inc(len(inserted))
+    new = iter(inserted)
+    return [
+        existing.get((sender_id, payload.client_msg_id)) or next(new)
+        for sender_id, payload in items
+    ]
+
+async def _find_stored(
+    session_factory: async_sessionmaker, items: Sequence[Tuple[int, schemas.IncomingMessage]]
+) -> Dict[Key, StoredMessage]:
+    """Stored messages matching the items' client_msg_ids, marked as duplicates."""
+    ids_by_sender: Dict[int, List[str]] = defaultdict(list)
+    for sender_id, payload in items:
+        if payload.client_msg_id is not None:
+            ids_by_sender[sender_id].append(payload.client_msg_id)
+    if not ids_by_sender:
+        return {}
+    Message = models.Message
+    query = select(
+        Message.id, Message.conversation_id, Message.sender_id, Message.content,
+        Message.created_at, Message.client_msg_id,
+    ).where(
+        or_(*(
+            and_(Message.sender_id == sender_id, Message.client_msg_id.in_(client_msg_ids))
+            for sender_id, client_msg_ids in ids_by_sender.items()
+        ))
+    )
+    async with session_factory() as db:
+        rows = (await db.execute(query)).all()
+    return {
+        (row.sender_id, row.client_msg_id): StoredMessage(
+            id=row.id,
+            conversation_id=row.conversation_id,
+            sender_id=row.sender_id,
+            content=row.content,
+            created_at=row.created_at,
+            client_msg_id=row.client_msg_id,
+            duplicate=True,
+        )
+        for row in rows
+    }
+
+class MessageIngestor:
+    def __init__(
+        self,
+        session_factory: async_sessionmaker = AsyncSessionLocal,
+        max_batch_size: int = settings.INGEST_MAX_BATCH_SIZE,
+        max_delay: float = settings.INGEST_MAX_DELAY,
+    ):
+        self.session_factory = session_factory
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        self.batches_written = 0
+
+    def _ensure_running(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self.task is None or self.task.done() or self.task.get_loop() is not loop:
+            self.queue = asyncio.Queue()
+            self.task = loop.create_task(self._run())
+
+    async def start(self) -> None:
+        self._ensure_running()
+
+    async def stop(self) -> None:
+        if self.task is None:
+            return
+        # Let queued messages land before shutting down
+        await self.queue.join()
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+
+    async def submit(self, sender_id: int, payload: schemas.IncomingMessage) -> StoredMessage:
+        self._ensure_running()
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((sender_id, payload, future))
+        return await future
+
+    async def _collect(self) -> list:
+        batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_delay
+        while len(batch) < self.max_batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def _write(self, batch: list) -> None:
+        try:
+            stored = await persist_messages(
+                self.session_factory, [(sender_id, payload) for sender_id, payload, _ in batch]
+            )
+        except Exception:
+            if len(batch) == 1:
+                logger.exception("Failed to persist message")
+                _, _, future = batch[0]
+                if not future.done():
+                    future.set_exception(MessageNotSaved("Message could not be saved"))
+                return
+            # Retry one by one so a single bad message does not fail the whole batch
+            for item in batch:
+                await self._write([item])
+            return
+
+        self.batches_written += 1
+        for (_, _, future), message in zip(batch, stored):
+            if not future.done():
+                future.set_result(message)
+
+ingestor = MessageIngestor()
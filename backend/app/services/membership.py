@@ -0,0 +1,68 @@
+"""
+Process-local cache of conversation membership (conversation_id -> frozenset of user ids).
+
+Used for message routing and participant checks so they don't load Conversation and User
+rows on every message. Entries expire after MEMBERSHIP_CACHE_TTL, and are invalidated on
+commit whenever Conversation.participants changes through the ORM. Code that writes
+conversation_participants directly must call invalidate_conversation itself.
+"""
+from typing import FrozenSet, Set
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.conversation import conversation_participants
+
+membership_cache: TTLCache[FrozenSet[int]] = TTLCache(
+    maxsize=settings.MEMBERSHIP_CACHE_SIZE, ttl=settings.MEMBERSHIP_CACHE_TTL
+)
+
+def _member_ids_query(conversation_id: int):
+    return select(conversation_participants.c.user_id).where(
+        conversation_participants.c.conversation_id == conversation_id
+    )
+
+def get_member_ids(db: Session, conversation_id: int) -> FrozenSet[int]:
+    member_ids = membership_cache.get(conversation_id)
+    if member_ids is None:
+        member_ids = frozenset(db.execute(_member_ids_query(conversation_id)).scalars())
+        membership_cache.set(conversation_id, member_ids)
+    return member_ids
+
+async def aget_member_ids(session_factory: async_sessionmaker, conversation_id: int) -> FrozenSet[int]:
+    """
+    Async variant for the socket path; only opens a session on a cache miss.
+    """
+    member_ids = membership_cache.get(conversation_id)
+    if member_ids is None:
+        async with session_factory() as db:
+            result = await db.execute(_member_ids_query(conversation_id))
+            member_ids = frozenset(result.scalars())
+        membership_cache.set(conversation_id, member_ids)
+    return member_ids
+
+def invalidate_conversation(conversation_id: int) -> None:
+    membership_cache.invalidate(conversation_id)
+
+@event.listens_for(Session, "after_flush")
+def _collect_membership_changes(session: Session, flush_context) -> None:
+    changed: Set[int] = session.info.setdefault("membership_changed", set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, models.Conversation):
+            continue
+        history = inspect(obj).attrs.participants.history
+        if history.has_changes() or obj in session.deleted:
+            changed.add(obj.id)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_membership_changes(session: Session) -> None:
+    for conversation_id in session.info.pop("membership_changed", ()):
+        invalidate_conversation(conversation_id)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_membership_changes(session: Session) -> None:
+    session.info.pop("membership_changed", None)
@@ -0,0 +1,140 @@
+"""
+Batched sends from a socket: a message.batch event, or an array of message.new events in
+one frame.
+
+    {"type": "message.batch", "payload": {"messages": [{"conversation_id": 1, "content": "hi", "client_msg_id": "a1"}, ...]}}
+    [{"type": "message.new", "payload": {...}}, {"type": "message.new", "payload": {...}}]
+
+Items are validated one by one. Every item the sender may post is written by a single
+persist_messages call (one INSERT, one transaction), bypassing the ingestor: the batch is
+already a batch.
+
+Fan-out sends each recipient one frame with the messages from its conversations: a
+message.batch event, or a plain message.new when that is a single message. Recipients
+that would get the same messages share one Frame, so it is still encoded once per protocol.
+
+The sender gets a message.batch.ack with one entry per item, in order: the item's index
+and client_msg_id, then either the message.ack fields or an error. Resent client_msg_ids
+are acked with duplicate=True and not fanned out again. If the write fails, every item
+that was going to be stored is acked with "Not saved" and nothing is fanned out; so is
+every item for a conversation whose members could not be loaded.
+"""
+import logging
+from collections import defaultdict
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app import schemas
+from app.core import serialization
+from app.core.config import settings
+from app.services import membership
+from app.services.ingestion import StoredMessage, persist_messages
+from app.websockets.protocol import Frame, InvalidFrame
+
+logger = logging.getLogger(__name__)
+
+class BatchTooLarge(ValueError):
+    """More items than WS_MAX_BATCH_SIZE in one frame."""
+
+def items_from_payload(payload: Any) -> List[Any]:
+    """The raw items of a message.batch payload. Raises InvalidFrame."""
+    messages = payload.get("messages") if isinstance(payload, dict) else None
+    if not isinstance(messages, list):
+        raise InvalidFrame("message.batch needs a messages list")
+    return messages
+
+def items_from_events(events: List[Any]) -> List[Any]:
+    """
+    The raw items of an array frame, one per event so ack indexes match positions in the
+    array. Anything but message.new becomes None and is acked as unsupported.
+    """
+    return [
+        event.get("payload") if isinstance(event, dict) and event.get("type") == "message.new" else None
+        for event in events
+    ]
+
+def _error(index: int, raw: Any, error: str) -> dict:
+    client_msg_id = raw.get("client_msg_id") if isinstance(raw, dict) else None
+    return {"index": index, "client_msg_id": client_msg_id, "error": error}
+
+def fanout(
+    stored: Sequence[StoredMessage], members: Dict[int, FrozenSet[int]]
+) -> List[Tuple[List[int], Frame]]:
+    """
+    (user_ids, frame) pairs covering every recipient once. members maps each conversation
+    in the batch to its member ids.
+    """
+    visible: Dict[int, List[int]] = defaultdict(list)  # user_id -> indexes into stored
+    for i, msg in enumerate(stored):
+        for user_id in members[msg.conversation_id]:
+            visible[user_id].append(i)
+    recipients: Dict[Tuple[int, ...], List[int]] = defaultdict(list)
+    for user_id, indexes in visible.items():
+        recipients[tuple(indexes)].append(user_id)
+
+    payloads = [serialization.message_payload(msg) for msg in stored]
+    frames = []
+    for indexes, user_ids in recipients.items():
+        if len(indexes) == 1:
+            frame = Frame.event("message.new", payloads[indexes[0]])
+        else:
+            frame = Frame.event("message.batch", {"messages": [payloads[i] for i in indexes]})
+        frames.append((user_ids, frame))
+    return frames
+
+async def ingest_batch(
+    session_factory: async_sessionmaker, sender_id: int, raw_items: List[Any]
+) -> Tuple[List[dict], List[Tuple[List[int], Frame]]]:
+    """
+    Validate, authorize and persist a batch from sender_id. Returns the ack items and the
+    frames to broadcast. Raises BatchTooLarge.
+    """
+    if len(raw_items) > settings.WS_MAX_BATCH_SIZE:
+        raise BatchTooLarge(f"At most {settings.WS_MAX_BATCH_SIZE} messages per batch")
+
+    acks: List[Optional[dict]] = [None] * len(raw_items)
+    accepted: List[Tuple[int, schemas.IncomingMessage]] = []
+    members: Dict[int, FrozenSet[int]] = {}
+    unavailable: Set[int] = set()  # conversations whose members could not be loaded
+    for index, raw in enumerate(raw_items):
+        if raw is None:
+            acks[index] = _error(index, raw, "Unsupported event")
+            continue
+        try:
+            item = schemas.IncomingMessage.model_validate(raw)
+        except ValidationError:
+            acks[index] = _error(index, raw, "Invalid format")
+            continue
+        if item.conversation_id in unavailable:
+            acks[index] = _error(index, raw, "Not saved")
+            continue
+        member_ids = members.get(item.conversation_id)
+        if member_ids is None:
+            try:
+                member_ids = await membership.aget_member_ids(session_factory, item.conversation_id)
+            except SQLAlchemyError:
+                logger.exception("Failed to load members of conversation %s", item.conversation_id)
+                unavailable.add(item.conversation_id)
+                acks[index] = _error(index, raw, "Not saved")
+                continue
+            members[item.conversation_id] = member_ids
+        if sender_id not in member_ids:
+            acks[index] = _error(index, raw, "Not a participant")
+            continue
+        accepted.append((index, item))
+
+    if not accepted:
+        return acks, []
+    try:
+        stored = await persist_messages(session_factory, [(sender_id, item) for _, item in accepted])
+    except SQLAlchemyError:
+        logger.exception("Failed to persist a batch of %d messages from user %s", len(accepted), sender_id)
+        for index, item in accepted:
+            acks[index] = {"index": index, "client_msg_id": item.client_msg_id, "error": "Not saved"}
+        return acks, []
+    for (index, _), msg in zip(accepted, stored):
+        acks[index] = {"index": index, **serialization.ack_payload(msg)}
+    return acks, fanout([msg for msg in stored if not msg.duplicate], members)
@@ -0,0 +1,195 @@
+"""
+Coalesced read markers.
+
+get_messages records "user read conversation at T" in memory instead of writing
+conversation_participants.last_read_at on every page fetch. Pending markers are kept per
+(conversation, user) with max-wins semantics and written in one batched UPDATE, which also
+only ever moves last_read_at forward. The conversation.read broadcast is sent once per
+(conversation, user) per flush, so a burst of fetches results in one write and one event.
+
+Readers in this process merge pending markers over the stored values (see pending_for_*),
+so a user's own reads are visible before the flush lands.
+"""
+import asyncio
+import heapq
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, func, or_, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.conversation import conversation_participants
+from app.models.message import Message
+from app.services import membership
+from app.websockets.manager import manager
+from app.websockets.protocol import Frame
+
+logger = logging.getLogger(__name__)
+
+Key = Tuple[int, int]  # (conversation_id, user_id)
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    Markers are naive UTC (like the values SQLite returns); Postgres returns aware datetimes.
+    Normalize so the two can be compared.
+    """
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+class ReadWatermarks:
+    """
+    Answers "has every participant except the sender read up to T?" for a page of messages.
+
+    Only the two lowest last_read_at values matter: the lowest one, or the second lowest if
+    the sender holds the lowest. They are found once per page, so each message costs a
+    single comparison instead of a pass over all participants. Participants who never read
+    rank lowest and make the answer False.
+    """
+    def __init__(self, member_ids: Iterable[int], last_reads: Dict[int, Optional[datetime]]):
+        lowest = heapq.nsmallest(
+            2,
+            member_ids,
+            key=lambda uid: (last_reads.get(uid) is not None, last_reads.get(uid) or datetime.min),
+        )
+        self._lowest = [(uid, last_reads.get(uid)) for uid in lowest]
+
+    def seen(self, sender_id: int, created_at: Optional[datetime]) -> bool:
+        for uid, last_read_at in self._lowest:
+            if uid == sender_id:
+                continue
+            if last_read_at is None:
+                return False
+            return created_at is None or last_read_at >= created_at
+        # Nobody but the sender is in the conversation
+        return False
+
+_mark_read = (
+    conversation_participants.update()
+    .where(
+        and_(
+            conversation_participants.c.conversation_id == bindparam("b_conversation_id"),
+            conversation_participants.c.user_id == bindparam("b_user_id"),
+            or_(
+                conversation_participants.c.last_read_at.is_(None),
+                conversation_participants.c.last_read_at < bindparam("b_read_at"),
+            ),
+        )
+    )
+    .values(
+        last_read_at=bindparam("b_read_at"),
+        # Messages that arrived after the read was recorded stay unread
+        unread_count=(
+            select(func.count(Message.id))
+            .where(
+                Message.conversation_id == conversation_participants.c.conversation_id,
+                Message.sender_id != conversation_participants.c.user_id,
+                Message.created_at > bindparam("b_read_at"),
+            )
+            .scalar_subquery()
+        ),
+    )
+)
+
+class ReadMarkerBuffer:
+    def __init__(self, flush_interval: float = settings.READ_RECEIPT_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._pending: Dict[Key, datetime] = {}
+        self._flush_scheduled = False
+        self._retry: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+
+    def mark(self, conversation_id: int, user_id: int, read_at: datetime) -> bool:
+        """
+        Record a read marker. Returns True if the caller should schedule a flush.
+        """
+        with self._lock:
+            key = (conversation_id, user_id)
+            current = self._pending.get(key)
+            if current is None or current < read_at:
+                self._pending[key] = read_at
+            if self._flush_scheduled:
+                return False
+            self._flush_scheduled = True
+            return True
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def pending_for_conversation(self, conversation_id: int) -> Dict[int, datetime]:
+        with self._lock:
+            return {uid: ts for (cid, uid), ts in self._pending.items() if cid == conversation_id}
+
+    def pending_for_user(self, user_id: int) -> Dict[int, datetime]:
+        with self._lock:
+            return {cid: ts for (cid, uid), ts in self._pending.items() if uid == user_id}
+
+    def _take(self) -> Dict[Key, datetime]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flush_scheduled = False
+            return pending
+
+    def _restore(self, pending: Dict[Key, datetime]) -> bool:
+        """
+        Put markers from a failed flush back. Returns True if the caller should schedule the
+        retry (no mark has scheduled a flush since).
+        """
+        with self._lock:
+            for key, read_at in pending.items():
+                current = self._pending.get(key)
+                if current is None or current < read_at:
+                    self._pending[key] = read_at
+            if self._flush_scheduled:
+                return False
+            self._flush_scheduled = True
+            return True
+
+    async def flush_soon(self, session_factory: async_sessionmaker = AsyncSessionLocal) -> None:
+        """
+        Wait for the debounce window, then flush everything marked in the meantime.
+        """
+        await asyncio.sleep(self.flush_interval)
+        await self.flush(session_factory)
+
+    async def flush(self, session_factory: async_sessionmaker = AsyncSessionLocal) -> None:
+        pending = self._take()
+        if not pending:
+            return
+        try:
+            async with session_factory() as db:
+                await db.execute(
+                    _mark_read,
+                    [
+                        {"b_conversation_id": cid, "b_user_id": uid, "b_read_at": read_at}
+                        for (cid, uid), read_at in pending.items()
+                    ],
+                )
+                await db.commit()
+        except Exception:
+            logger.exception("Failed to flush read markers")
+            if self._restore(pending):
+                self._retry = asyncio.create_task(self.flush_soon(session_factory))
+            return
+
+        for (conversation_id, user_id), read_at in pending.items():
+            member_ids = await membership.aget_member_ids(session_factory, conversation_id)
+            other_user_ids = [uid for uid in member_ids if uid != user_id]
+            if not other_user_ids:
+                continue
+            frame = Frame.event(
+                "conversation.read",
+                {
+                    "conversation_id": conversation_id,
+                    "user_id": user_id,
+                    "last_read_at": read_at.isoformat(),
+                },
+            )
+            await manager.broadcast_to_users(other_user_ids, frame)
+
+read_markers = ReadMarkerBuffer()
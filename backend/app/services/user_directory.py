@@ -0,0 +1,77 @@
+"""
+Keyset-paginated user directory.
+
+Pages are ordered by (coalesce(full_name, ''), email, id) and continue from an opaque
+cursor holding the last key seen, so every page is a range scan on ix_user_directory
+rather than a sort of the whole table. Only the columns in schemas.User are selected,
+and that index covers them, so rows are read straight from the index and never hydrated
+into ORM objects.
+"""
+import base64
+import binascii
+import json
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, literal_column, select, tuple_
+from sqlalchemy.orm import Session
+
+from app import models
+
+DirectoryKey = Tuple[str, str, int]
+
+class InvalidCursor(ValueError):
+    pass
+
+def sort_name():
+    # Inlined rather than bound so the expression matches ix_user_directory
+    return func.coalesce(models.User.full_name, literal_column("''"))
+
+def encode_cursor(key: DirectoryKey) -> str:
+    raw = json.dumps(list(key), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> DirectoryKey:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        name, email, user_id = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    if not (isinstance(name, str) and isinstance(email, str) and isinstance(user_id, int)):
+        raise InvalidCursor(cursor)
+    return name, email, user_id
+
+def page_statement(exclude_user_id: int, limit: Optional[int] = None, after: Optional[DirectoryKey] = None):
+    User = models.User
+    name = sort_name()
+    stmt = (
+        select(User.id, User.email, User.full_name, User.is_active, name.label("sort_name"))
+        .where(User.id != exclude_user_id)
+        .order_by(name, User.email, User.id)
+    )
+    if after is not None:
+        # The redundant leading bound lets SQLite seek; it can't range-scan a row value
+        # that starts with an expression
+        stmt = stmt.where(name >= after[0], tuple_(name, User.email, User.id) > tuple_(*after))
+    if limit is not None:
+        # One extra row tells us whether there is a next page
+        stmt = stmt.limit(limit + 1)
+    return stmt
+
+def list_page(
+    db: Session, exclude_user_id: int, limit: Optional[int] = None, after: Optional[DirectoryKey] = None
+) -> Tuple[List[dict], Optional[DirectoryKey]]:
+    """
+    Return up to `limit` users after `after`, and the key to continue from
+    (None on the last page). With no limit the whole directory is returned.
+    """
+    rows = db.execute(page_statement(exclude_user_id, limit, after)).all()
+    next_key = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_key = (last.sort_name, last.email, last.id)
+    items = [
+        {"email": row.email, "is_active": row.is_active, "full_name": row.full_name, "id": row.id}
+        for row in rows
+    ]
+    return items, next_key
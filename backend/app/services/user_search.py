@@ -0,0 +1,92 @@
+"""
+Indexed user search by email or full name.
+
+Postgres serves the substring ILIKE from pg_trgm GIN indexes. SQLite narrows candidates
+with the user_search FTS5 trigram table. Trigram indexes need at least three characters,
+so shorter terms fall back to a plain ILIKE scan.
+
+Results are ranked: a match at the start of the email or name first, then a match at the
+start of any word in the name, then any other substring match. Prefix matches are fetched
+by their own probe and ranked first; the remaining slots are filled from other substring
+matches. Each step only looks at the first SEARCH_CANDIDATES rows it matches, so a very
+unselective term (e.g. "example.com") costs a bounded amount of work instead of sorting
+the whole table, and prefix matches can never be crowded out by other substring matches.
+"""
+from typing import List
+from weakref import WeakKeyDictionary
+
+from sqlalchemy import case, inspect, or_, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app import models
+
+MIN_INDEXED_TERM = 3
+SEARCH_CANDIDATES = 1000
+
+_fts_available: "WeakKeyDictionary[Engine, bool]" = WeakKeyDictionary()
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _sqlite_fts_available(db: Session) -> bool:
+    engine = db.get_bind()
+    if engine not in _fts_available:
+        _fts_available[engine] = inspect(engine).has_table("user_search")
+    return _fts_available[engine]
+
+def search_users(db: Session, term: str, exclude_user_id: int, limit: int) -> List[models.User]:
+    User = models.User
+    escaped = _escape_like(term)
+    contains = f"%{escaped}%"
+    prefix = f"{escaped}%"
+    word_prefix = f"% {escaped}%"
+
+    if len(term) >= MIN_INDEXED_TERM and db.get_bind().dialect.name == "sqlite" and _sqlite_fts_available(db):
+        # FTS5 phrase query; with the trigram tokenizer it matches any substring
+        phrase = '"' + term.replace('"', '""') + '"'
+        candidates = (
+            select(text("rowid"))
+            .select_from(text("user_search"))
+            .where(text("user_search MATCH :phrase").bindparams(phrase=phrase))
+        )
+    else:
+        candidates = select(User.id).where(
+            or_(
+                User.email.ilike(contains, escape="\\"),
+                User.full_name.ilike(contains, escape="\\"),
+            )
+        )
+    candidates = candidates.correlate(None)
+
+    rank = case(
+        (or_(User.email.ilike(prefix, escape="\\"), User.full_name.ilike(prefix, escape="\\")), 0),
+        (User.full_name.ilike(word_prefix, escape="\\"), 1),
+        else_=2,
+    )
+
+    def matching(condition):
+        return (
+            select(User.id)
+            .where(User.id.in_(candidates), User.id != exclude_user_id, condition)
+            .limit(SEARCH_CANDIDATES)
+            .correlate(None)
+        )
+
+    # Ranks 0 and 1 first, so an unselective substring cannot push them out
+    results = (
+        db.query(User)
+        .filter(User.id.in_(matching(rank < 2)))
+        .order_by(rank, User.full_name, User.email)
+        .limit(limit)
+        .all()
+    )
+    if len(results) < limit:
+        results += (
+            db.query(User)
+            .filter(User.id.in_(matching(rank == 2)))
+            .order_by(User.full_name, User.email)
+            .limit(limit - len(results))
+            .all()
+        )
+    return results
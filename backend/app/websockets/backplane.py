@@ -0,0 +1,227 @@
+"""
+Pub/sub backplane used by ConnectionManager to reach sockets held by other workers.
+
+Every broadcast is published once per recipient user. Each worker subscribes only to the
+users it currently holds sockets for and delivers what it receives to those local sockets.
+"""
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Union
+
+from app.websockets.protocol import JSON, Frame
+
+logger = logging.getLogger(__name__)
+
+# Called by the backplane with (user_id, message) for users subscribed on this worker.
+# user_id is None for messages sent to everyone. Events travel as Frames; plain strings
+# are sent to sockets as they are.
+Message = Union[str, Frame]
+Deliver = Callable[[Optional[int], Message], None]
+
+class Backplane:
+    """
+    Interface for fan-out between workers.
+    """
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    def subscribe(self, user_id: int, deliver: Deliver) -> None:
+        raise NotImplementedError
+
+    def unsubscribe(self, user_id: int, deliver: Deliver) -> None:
+        raise NotImplementedError
+
+    def subscribe_all(self, deliver: Deliver) -> None:
+        raise NotImplementedError
+
+    async def publish(self, user_ids: Iterable[int], message: Message) -> None:
+        raise NotImplementedError
+
+    async def publish_all(self, message: Message) -> None:
+        raise NotImplementedError
+
+class InMemoryBackplane(Backplane):
+    """
+    In-process backplane. Delivery is synchronous; several managers can share one instance
+    to simulate workers in tests.
+    """
+    def __init__(self):
+        self.subscribers: Dict[int, Set[Deliver]] = {}
+        self.all_subscribers: Set[Deliver] = set()
+
+    def subscribe(self, user_id: int, deliver: Deliver) -> None:
+        self.subscribers.setdefault(user_id, set()).add(deliver)
+
+    def unsubscribe(self, user_id: int, deliver: Deliver) -> None:
+        delivers = self.subscribers.get(user_id)
+        if delivers is not None:
+            delivers.discard(deliver)
+            if not delivers:
+                del self.subscribers[user_id]
+
+    def subscribe_all(self, deliver: Deliver) -> None:
+        self.all_subscribers.add(deliver)
+
+    async def publish(self, user_ids: Iterable[int], message: Message) -> None:
+        for user_id in user_ids:
+            for deliver in list(self.subscribers.get(user_id, ())):
+                deliver(user_id, message)
+
+    async def publish_all(self, message: Message) -> None:
+        for deliver in list(self.all_subscribers):
+            deliver(None, message)
+
+# Redis payloads are tagged so a plain string is not mistaken for an encoded frame
+_FRAME_TAG = "f"
+_TEXT_TAG = "t"
+
+def _pack(message: Message) -> str:
+    if isinstance(message, Frame):
+        return _FRAME_TAG + message.encode(JSON)
+    return _TEXT_TAG + message
+
+def _unpack(data: str) -> Message:
+    tag, body = data[:1], data[1:]
+    if tag == _FRAME_TAG:
+        # Events cross workers as JSON; a Frame lets local sockets get their own protocol
+        return Frame.from_json(body)
+    return body
+
+class RedisBackplane(Backplane):
+    """
+    Redis pub/sub backplane with one channel per user plus a channel for global broadcasts.
+
+    Subscriptions are reconciled by a background task, so subscribe/unsubscribe can be
+    called from synchronous code (connect/disconnect) without racing each other.
+    """
+    def __init__(self, url: str = "", client: Any = None, channel_prefix: str = "chat:"):
+        self.url = url
+        self.client = client
+        self.channel_prefix = channel_prefix
+        self.pubsub = None
+        self.delivers: Dict[int, Deliver] = {}
+        self.all_deliver: Optional[Deliver] = None
+        self.subscribed: Set[str] = set()
+        self.changed = asyncio.Event()
+        self.tasks: list = []
+
+    def user_channel(self, user_id: int) -> str:
+        return f"{self.channel_prefix}user:{user_id}"
+
+    @property
+    def all_channel(self) -> str:
+        return f"{self.channel_prefix}all"
+
+    async def start(self) -> None:
+        if self.client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError as e:
+                raise RuntimeError("RedisBackplane requires the 'redis' package") from e
+            self.client = redis.from_url(self.url, decode_responses=True)
+        self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        await self._reconcile()
+        self.tasks = [
+            asyncio.create_task(self._listen()),
+            asyncio.create_task(self._reconcile_forever()),
+        ]
+
+    async def stop(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        for task in self.tasks:
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self.tasks = []
+        if self.pubsub is not None:
+            await self.pubsub.aclose()
+            self.pubsub = None
+        self.subscribed = set()
+
+    def subscribe(self, user_id: int, deliver: Deliver) -> None:
+        self.delivers[user_id] = deliver
+        self.changed.set()
+
+    def unsubscribe(self, user_id: int, deliver: Deliver) -> None:
+        self.delivers.pop(user_id, None)
+        self.changed.set()
+
+    def subscribe_all(self, deliver: Deliver) -> None:
+        self.all_deliver = deliver
+        self.changed.set()
+
+    async def publish(self, user_ids: Iterable[int], message: Message) -> None:
+        message = _pack(message)
+        async with self.client.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.publish(self.user_channel(user_id), message)
+            await pipe.execute()
+
+    async def publish_all(self, message: Message) -> None:
+        await self.client.publish(self.all_channel, _pack(message))
+
+    async def _reconcile(self) -> None:
+        wanted = {self.user_channel(user_id) for user_id in self.delivers}
+        if self.all_deliver is not None:
+            wanted.add(self.all_channel)
+        to_subscribe = wanted - self.subscribed
+        to_unsubscribe = self.subscribed - wanted
+        if to_subscribe:
+            await self.pubsub.subscribe(*to_subscribe)
+        if to_unsubscribe:
+            await self.pubsub.unsubscribe(*to_unsubscribe)
+        self.subscribed = wanted
+
+    async def _reconcile_forever(self) -> None:
+        while True:
+            await self.changed.wait()
+            self.changed.clear()
+            try:
+                await self._reconcile()
+            except Exception:
+                logger.exception("Failed to update backplane subscriptions")
+                await asyncio.sleep(1)
+                self.changed.set()
+
+    async def _listen(self) -> None:
+        user_prefix = f"{self.channel_prefix}user:"
+        while True:
+            try:
+                msg = await self.pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Backplane receive failed")
+                await asyncio.sleep(1)
+                continue
+            if msg is None or msg.get("type") != "message":
+                continue
+            channel, data = msg["channel"], msg["data"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            if isinstance(data, bytes):
+                data = data.decode()
+            data = _unpack(data)
+            if channel == self.all_channel:
+                if self.all_deliver is not None:
+                    self.all_deliver(None, data)
+            elif channel.startswith(user_prefix):
+                user_id = int(channel[len(user_prefix):])
+                deliver = self.delivers.get(user_id)
+                if deliver is not None:
+                    deliver(user_id, data)
+
+def create_backplane(url: str) -> Backplane:
+    """
+    Build the backplane configured by BACKPLANE_URL: empty for in-process, redis:// for Redis.
+    """
+    if not url:
+        return InMemoryBackplane()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackplane(url)
+    raise ValueError(f"Unsupported backplane URL: {url}")
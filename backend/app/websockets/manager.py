@@ -1,36 +1,172 @@
-from typing import List, Dict
-from fastapi import WebSocket
+import asyncio
+import logging
+import time
+from typing import List, Dict, Optional, Union
+from fastapi import WebSocket, status
+
+from app.core import metrics
+from app.core.config import settings
+from app.websockets.backplane import Backplane, InMemoryBackplane, create_backplane
+from app.websockets.protocol import JSON, Frame
+
+logger = logging.getLogger(__name__)
+
+# What to do when a connection's outbound queue is full
+SLOW_CONSUMER_POLICIES = ("disconnect", "drop_oldest", "drop_newest")
+
+class Connection:
+    """
+    A connected socket with its own bounded outbound queue, drained by a dedicated writer task.
+    protocol is the wire protocol negotiated for it (see app/websockets/protocol.py).
+    """
+    def __init__(self, websocket: WebSocket, user_id: int, max_queue: int, protocol: str = JSON):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.protocol = protocol
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.writer: Optional[asyncio.Task] = None
+        self.closed = False
+        self.dropped = 0
 
 class ConnectionManager:
-    def __init__(self):
-        # Map user_id to a list of active WebSockets
-        self.active_connections: Dict[int, List[WebSocket]] = {}
+    def __init__(
+        self,
+        send_queue_size: int = settings.WS_SEND_QUEUE_SIZE,
+        send_timeout: float = settings.WS_SEND_TIMEOUT,
+        slow_consumer_policy: str = settings.WS_SLOW_CONSUMER_POLICY,
+        backplane: Optional[Backplane] = None,
+    ):
+        if slow_consumer_policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow consumer policy: {slow_consumer_policy}")
+        self.send_queue_size = send_queue_size
+        self.send_timeout = send_timeout
+        self.slow_consumer_policy = slow_consumer_policy
+        # Map user_id to a list of active connections
+        self.active_connections: Dict[int, List[Connection]] = {}
+        self.connections: Dict[WebSocket, Connection] = {}
+        # Broadcasts go through the backplane so sockets on other workers receive them too
+        self.backplane = backplane if backplane is not None else InMemoryBackplane()
+        self.backplane.subscribe_all(self._deliver_local)
+
+    async def start(self):
+        await self.backplane.start()
 
-    async def connect(self, websocket: WebSocket, user_id: int):
-        await websocket.accept()
+    async def stop(self):
+        await self.backplane.stop()
+
+    async def connect(
+        self, websocket: WebSocket, user_id: int, subprotocol: Optional[str] = None, protocol: str = JSON
+    ):
+        # Registered before accepting so nothing broadcast once the client sees the handshake
+        # is missed; it waits in the queue until the writer starts
+        conn = Connection(websocket, user_id, self.send_queue_size, protocol)
+        self.connections[websocket] = conn
         if user_id not in self.active_connections:
             self.active_connections[user_id] = []
-        self.active_connections[user_id].append(websocket)
+            self.backplane.subscribe(user_id, self._deliver_local)
+        self.active_connections[user_id].append(conn)
+        try:
+            if subprotocol is None:
+                await websocket.accept()
+            else:
+                await websocket.accept(subprotocol=subprotocol)
+        except Exception:
+            self._remove(conn)
+            raise
+        conn.writer = asyncio.create_task(self._writer(conn))
 
     def disconnect(self, websocket: WebSocket, user_id: int):
-        if user_id in self.active_connections:
-            if websocket in self.active_connections[user_id]:
-                self.active_connections[user_id].remove(websocket)
-            if not self.active_connections[user_id]:
-                del self.active_connections[user_id]
-
-    async def send_personal_message(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
-
-    async def broadcast(self, message: str):
-        for user_connections in self.active_connections.values():
-            for connection in user_connections:
-                await connection.send_text(message)
-
-    async def broadcast_to_users(self, user_ids: List[int], message: str):
-        for user_id in user_ids:
-            if user_id in self.active_connections:
-                for connection in self.active_connections[user_id]:
-                    await connection.send_text(message)
-
-manager = ConnectionManager()
+        conn = self.connections.get(websocket)
+        if conn is not None:
+            self._remove(conn)
+
+    def _remove(self, conn: Connection):
+        conn.closed = True
+        self.connections.pop(conn.websocket, None)
+        user_connections = self.active_connections.get(conn.user_id)
+        if user_connections is not None:
+            if conn in user_connections:
+                user_connections.remove(conn)
+            if not user_connections:
+                del self.active_connections[conn.user_id]
+                self.backplane.unsubscribe(conn.user_id, self._deliver_local)
+        if conn.writer is not None and conn.writer is not asyncio.current_task():
+            conn.writer.cancel()
+
+    async def _writer(self, conn: Connection):
+        try:
+            while True:
+                message = await conn.queue.get()
+                if isinstance(message, Frame):
+                    # Encoded by the first recipient using this protocol, reused by the rest
+                    message = message.encode(conn.protocol)
+                started = time.perf_counter()
+                if isinstance(message, bytes):
+                    await asyncio.wait_for(conn.websocket.send_bytes(message), self.send_timeout)
+                else:
+                    await asyncio.wait_for(conn.websocket.send_text(message), self.send_timeout)
+                metrics.ws_send_duration.observe(time.perf_counter() - started)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Dead or stuck socket: stop delivering to it and let the receive loop wind down
+            logger.info("Dropping connection for user %s: %r", conn.user_id, e)
+            self._remove(conn)
+            await self._close(conn, status.WS_1011_INTERNAL_ERROR)
+
+    async def _close(self, conn: Connection, code: int):
+        try:
+            await conn.websocket.close(code=code)
+        except Exception:
+            pass
+
+    def _enqueue(self, conn: Connection, message: Union[str, Frame]) -> bool:
+        if conn.closed:
+            return False
+        try:
+            conn.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        conn.dropped += 1
+        if self.slow_consumer_policy == "drop_newest":
+            return False
+        if self.slow_consumer_policy == "drop_oldest":
+            conn.queue.get_nowait()
+            conn.queue.put_nowait(message)
+            return True
+
+        # "disconnect": the client is too far behind, it will resync on reconnect
+        logger.info("Disconnecting slow consumer for user %s", conn.user_id)
+        self._remove(conn)
+        asyncio.create_task(self._close(conn, status.WS_1013_TRY_AGAIN_LATER))
+        return False
+
+    async def send_personal_message(self, message: Union[str, Frame], websocket: WebSocket):
+        conn = self.connections.get(websocket)
+        if conn is None:
+            await websocket.send_text(message.encode(JSON) if isinstance(message, Frame) else message)
+        else:
+            self._enqueue(conn, message)
+
+    def _deliver_local(self, user_id: Optional[int], message: Union[str, Frame]):
+        if user_id is None:
+            targets = [c for user_connections in self.active_connections.values() for c in user_connections]
+        else:
+            targets = list(self.active_connections.get(user_id, ()))
+        for connection in targets:
+            self._enqueue(connection, message)
+
+    def queued_messages(self) -> int:
+        return sum(conn.queue.qsize() for conn in list(self.connections.values()))
+
+    async def broadcast(self, message: Union[str, Frame]):
+        metrics.broadcast_fanout.observe(len(self.active_connections))
+        await self.backplane.publish_all(message)
+
+    async def broadcast_to_users(self, user_ids: List[int], message: Union[str, Frame]):
+        metrics.broadcast_fanout.observe(len(user_ids))
+        await self.backplane.publish(user_ids, message)
+
+manager = ConnectionManager(backplane=create_backplane(settings.BACKPLANE_URL))
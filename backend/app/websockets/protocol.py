@@ -0,0 +1,109 @@
+"""
+Wire protocols for /ws.
+
+Clients pick one through the WebSocket subprotocol header:
+
+- chat.json (also the default when no subprotocol is offered): JSON text frames.
+- chat.msgpack: the same events as MessagePack binary frames, for clients on slow links
+  or with high volume. Offered only when the msgpack package is installed.
+
+Either way events have the same shape, {"type": ..., "payload": ...}, with timestamps as
+ISO 8601 strings. Incoming frames are decoded by frame type (text is JSON, binary is
+MessagePack) whatever was negotiated.
+
+Outgoing events are wrapped in a Frame, which encodes lazily and at most once per
+protocol; every recipient using that protocol is sent the same buffer. permessage-deflate
+is negotiated by the ASGI server (uvicorn's --ws-per-message-deflate, on by default),
+separately from the subprotocol.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Union
+
+import orjson
+
+from app.core import serialization
+
+try:
+    import msgpack
+except ImportError:  # optional: only needed for the chat.msgpack subprotocol
+    msgpack = None
+
+JSON = "json"
+MSGPACK = "msgpack"
+
+SUBPROTOCOLS = {"chat.json": JSON, "chat.msgpack": MSGPACK}
+
+class InvalidFrame(ValueError):
+    """An incoming frame that could not be decoded into an event."""
+
+def available_protocols() -> List[str]:
+    return [JSON, MSGPACK] if msgpack is not None else [JSON]
+
+def negotiate(offered: List[str]) -> Optional[str]:
+    """
+    The subprotocol to accept from the client's offer, in the client's order of
+    preference; None when nothing supported was offered (plain JSON).
+    """
+    available = available_protocols()
+    for name in offered:
+        if SUBPROTOCOLS.get(name) in available:
+            return name
+    return None
+
+def protocol_for(subprotocol: Optional[str]) -> str:
+    return SUBPROTOCOLS.get(subprotocol, JSON)
+
+def _msgpack_default(obj: Any) -> Any:
+    if isinstance(obj, datetime):
+        # Exactly the string the JSON encoding writes
+        return orjson.dumps(obj, option=orjson.OPT_UTC_Z)[1:-1].decode()
+    raise TypeError(f"Cannot serialize {type(obj).__name__}")
+
+def decode(message: dict) -> Any:
+    """
+    Decode an ASGI websocket.receive message: text frames as JSON, binary frames as
+    MessagePack. Raises InvalidFrame.
+    """
+    text = message.get("text")
+    try:
+        if text is not None:
+            return orjson.loads(text)
+        data = message.get("bytes")
+        if data is None or msgpack is None:
+            raise InvalidFrame("Unsupported frame")
+        return msgpack.unpackb(data)
+    except InvalidFrame:
+        raise
+    except Exception as e:
+        raise InvalidFrame(str(e)) from e
+
+class Frame:
+    """
+    An outgoing event shared by all of its recipients, encoded at most once per protocol.
+    """
+    __slots__ = ("_event", "_encoded")
+
+    def __init__(self, event: Optional[dict] = None, encoded: Optional[Dict[str, Union[str, bytes]]] = None):
+        self._event = event
+        self._encoded = encoded or {}
+
+    @classmethod
+    def event(cls, event_type: str, payload: Any) -> "Frame":
+        return cls({"type": event_type, "payload": payload})
+
+    @classmethod
+    def from_json(cls, text: str) -> "Frame":
+        """A frame that arrived already encoded, e.g. from the backplane."""
+        return cls(encoded={JSON: text})
+
+    def encode(self, protocol: str = JSON) -> Union[str, bytes]:
+        encoded = self._encoded.get(protocol)
+        if encoded is None:
+            if self._event is None:
+                self._event = orjson.loads(self._encoded[JSON])
+            if protocol == MSGPACK:
+                encoded = msgpack.packb(self._event, default=_msgpack_default)
+            else:
+                encoded = serialization.encode_event(self._event["type"], self._event["payload"])
+            self._encoded[protocol] = encoded
+        return encoded
@@ -0,0 +1,75 @@
+"""
+Micro-benchmark for the per-message "seen" flag in get_messages.
+
+Compares the previous implementation (a pass over every other participant for each
+message) with ReadWatermarks (two lowest read markers found once per page).
+
+    python -m benchmarks.bench_seen [--members 500] [--page 50] [--rounds 200]
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from app.services.read_receipts import ReadWatermarks
+
+def legacy_seen(member_ids, last_reads, sender_id, created_at):
+    other_participants = [uid for uid in member_ids if uid != sender_id]
+    if not other_participants:
+        return False
+    for uid in other_participants:
+        lr = last_reads.get(uid)
+        if not lr:
+            return False
+        if created_at and lr < created_at:
+            return False
+    return True
+
+def build_page(members: int, page: int, rng: random.Random):
+    start = datetime(2026, 1, 1)
+    member_ids = frozenset(range(1, members + 1))
+    # Most members are caught up, as in a busy group; the page straddles the slowest reader
+    last_reads = {
+        uid: start + timedelta(minutes=rng.randint(page // 2, page * 2))
+        for uid in member_ids
+    }
+    messages = [
+        (rng.choice(tuple(member_ids)), start + timedelta(minutes=i))
+        for i in range(page)
+    ]
+    return member_ids, last_reads, messages
+
+def run_legacy(member_ids, last_reads, messages):
+    return [legacy_seen(member_ids, last_reads, sender, created) for sender, created in messages]
+
+def run_watermarks(member_ids, last_reads, messages):
+    watermarks = ReadWatermarks(member_ids, last_reads)
+    return [watermarks.seen(sender, created) for sender, created in messages]
+
+def timeit(fn, args, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn(*args)
+    return (time.perf_counter() - started) / rounds
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--members", type=int, default=500)
+    parser.add_argument("--page", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    page = build_page(args.members, args.page, rng)
+    assert run_legacy(*page) == run_watermarks(*page), "implementations disagree"
+
+    legacy = timeit(run_legacy, page, args.rounds)
+    watermarks = timeit(run_watermarks, page, args.rounds)
+    print(f"members={args.members} page={args.page} rounds={args.rounds}")
+    print(f"legacy      {legacy * 1e3:8.3f} ms/page")
+    print(f"watermarks  {watermarks * 1e3:8.3f} ms/page")
+    print(f"speedup     {legacy / watermarks:8.1f}x")
+
+if __name__ == "__main__":
+    main()
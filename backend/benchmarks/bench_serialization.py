@@ -0,0 +1,119 @@
+"""
+Micro-benchmark for REST and socket payload serialization.
+
+REST bodies: a page of messages and a conversation list, encoded the way FastAPI does for
+a handler annotated -> List[dict] (validate, then pydantic-core dump_json), through
+jsonable_encoder + json.dumps (handlers without a response model), and with orjson
+(ORJSONResponse returned directly).
+
+Socket events: a message.new frame built through OutgoingMessage / SocketEvent as
+websocket_endpoint used to, against serialization.encode_event.
+
+    python -m benchmarks.bench_serialization [--page 50] [--conversations 50] [--rounds 2000]
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app import schemas
+from app.core import serialization
+from app.services.ingestion import StoredMessage
+
+WORDS = ("hello", "there", "meeting", "tomorrow", "report", "deploy", "lunch", "café", "👍")
+
+def message_page(size: int, rng: random.Random) -> List[dict]:
+    start = datetime(2026, 1, 1)
+    return [
+        {
+            "id": i,
+            "conversation_id": 7,
+            "sender_id": rng.randint(1, 5),
+            "content": " ".join(rng.choices(WORDS, k=rng.randint(3, 20))),
+            "created_at": (start + timedelta(seconds=i, microseconds=rng.randrange(10**6))).isoformat(),
+            "seen": rng.random() < 0.5,
+        }
+        for i in range(size)
+    ]
+
+def conversation_list(size: int, rng: random.Random) -> List[dict]:
+    start = datetime(2026, 1, 1)
+    return [
+        {
+            "id": i,
+            "name": f"Conversation {i}",
+            "is_group": True,
+            "created_at": start.isoformat(),
+            "last_message_at": (start + timedelta(minutes=i)).isoformat(),
+            "last_message": {
+                "id": i * 10,
+                "sender_id": 1,
+                "content": " ".join(rng.choices(WORDS, k=8)),
+                "created_at": (start + timedelta(minutes=i)).isoformat(),
+            },
+            "message_count": rng.randint(0, 20),
+            "participants": [
+                {"id": uid, "email": f"user{uid}@example.com", "full_name": f"User {uid}"}
+                for uid in range(1, rng.randint(2, 8))
+            ],
+        }
+        for i in range(size)
+    ]
+
+def legacy_event(msg: StoredMessage) -> str:
+    out_msg = schemas.OutgoingMessage.model_validate(msg)
+    event = schemas.SocketEvent(type="message.new", payload=out_msg.model_dump(mode="json"))
+    return event.model_dump_json()
+
+def orjson_event(msg: StoredMessage) -> str:
+    return serialization.encode_event("message.new", serialization.message_payload(msg))
+
+def timeit(fn, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--page", type=int, default=50)
+    parser.add_argument("--conversations", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    adapter = TypeAdapter(List[dict])
+    bodies = {
+        f"messages page ({args.page})": message_page(args.page, rng),
+        f"conversation list ({args.conversations})": conversation_list(args.conversations, rng),
+    }
+    print(f"rounds={args.rounds}")
+    print(f"{'payload':28} {'inferred model':>15} {'jsonable+json':>15} {'orjson':>10} {'speedup':>8}")
+    for name, body in bodies.items():
+        assert json.loads(serialization.dumps(body)) == json.loads(adapter.dump_json(body))
+        inferred = timeit(lambda: adapter.dump_json(adapter.validate_python(body)), args.rounds)
+        encoder = timeit(lambda: json.dumps(jsonable_encoder(body)).encode("utf-8"), max(args.rounds // 10, 1))
+        fast = timeit(lambda: serialization.dumps(body), args.rounds)
+        print(
+            f"{name:28} {inferred * 1e6:12.1f} us {encoder * 1e6:12.1f} us "
+            f"{fast * 1e6:7.1f} us {inferred / fast:7.1f}x"
+        )
+
+    msg = StoredMessage(
+        id=123456, conversation_id=42, sender_id=7,
+        content=" ".join(rng.choices(WORDS, k=12)), created_at=datetime(2026, 1, 1, 12, 0, 0, 123456),
+    )
+    assert legacy_event(msg) == orjson_event(msg), "encoders disagree"
+    legacy = timeit(lambda: legacy_event(msg), args.rounds * 10)
+    fast = timeit(lambda: orjson_event(msg), args.rounds * 10)
+    print(f"\n{'message.new event':28} {'pydantic':>15} {'encode_event':>15} {'speedup':>8}")
+    print(f"{'per broadcast':28} {legacy * 1e6:12.2f} us {fast * 1e6:12.2f} us {legacy / fast:7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark for user search against a seeded user table.
+
+Compares the previous unindexed ILIKE '%term%' query with app.services.user_search on a
+throwaway SQLite database (FTS5 trigram index). Point --url at a scratch Postgres database
+to measure the pg_trgm indexes instead.
+
+    python -m benchmarks.bench_user_search [--users 1000000] [--rounds 20] [--url sqlite:///./bench_users.db]
+"""
+import argparse
+import random
+import string
+import time
+
+from sqlalchemy import create_engine, insert, or_
+from sqlalchemy.orm import Session
+
+from app.db.base import Base
+from app.models.user import User
+from app.services import user_search
+
+TERMS = ["ann", "smith", "li", "rodrig", "example.com", "zzq"]
+
+def seed(engine, users: int, rng: random.Random, batch: int = 10000) -> None:
+    first = ["Ann", "Anna", "Bob", "Carlos", "Dana", "Li", "Maria", "Noah", "Priya", "Zoe"]
+    last = ["Smith", "Rodriguez", "Nguyen", "Okafor", "Li", "Schmidt", "Kowalski", "Tanaka"]
+    with engine.begin() as conn:
+        for start in range(0, users, batch):
+            rows = []
+            for i in range(start, min(start + batch, users)):
+                name = f"{rng.choice(first)} {rng.choice(last)}"
+                tag = "".join(rng.choices(string.ascii_lowercase, k=6))
+                rows.append({
+                    "email": f"{name.split()[0].lower()}.{tag}{i}@example.com",
+                    "full_name": name,
+                    "hashed_password": "x",
+                    "is_active": True,
+                })
+            conn.execute(insert(User), rows)
+
+def legacy_search(db: Session, term: str, exclude_user_id: int, limit: int):
+    search_term = f"%{term}%"
+    return (
+        db.query(User)
+        .filter(User.id != exclude_user_id)
+        .filter(or_(User.email.ilike(search_term), User.full_name.ilike(search_term)))
+        .limit(limit)
+        .all()
+    )
+
+def timeit(fn, engine, term: str, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        with Session(engine) as db:
+            fn(db, term, exclude_user_id=1, limit=10)
+    return (time.perf_counter() - started) / rounds
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--url", default="sqlite:///./bench_users.db")
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    started = time.perf_counter()
+    seed(engine, args.users, random.Random(args.seed))
+    print(f"seeded {args.users} users in {time.perf_counter() - started:.1f}s")
+
+    print(f"{'term':<14}{'legacy ms':>12}{'indexed ms':>12}{'speedup':>10}")
+    for term in TERMS:
+        legacy = timeit(legacy_search, engine, term, args.rounds)
+        indexed = timeit(user_search.search_users, engine, term, args.rounds)
+        print(f"{term:<14}{legacy * 1e3:12.2f}{indexed * 1e3:12.2f}{legacy / indexed:9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,463 @@
+"""
+Load test for the REST and WebSocket paths.
+
+Seeds users, conversations and history with seed_bulk, opens one socket per simulated
+user on /api/v1/ws and drives message.new traffic at a fixed rate while HTTP workers
+hit the main read endpoints. Reports:
+
+- end-to-end delivery latency, from the sender's frame to each recipient's frame
+- messages sent and frames delivered per second, and the share of frames that arrived
+- p50/p99 latency per HTTP endpoint
+
+The target is a running server (--url) or, with --spawn, a uvicorn started on a fresh
+SQLite database. A running server's database (--database-url) is seeded only if it has
+no users, and the server must share this process's SECRET_KEY. --save-baseline writes the results as JSON; --compare checks a
+run against such a file and exits with status 1 on a regression beyond --tolerance.
+
+    python -m benchmarks.loadtest --spawn [--users 2000] [--conversations 1000]
+        [--messages 50000] [--clients 1000] [--rate 200] [--duration 20] [--protocol json|msgpack]
+        [--compression deflate|none] [--server-env INGEST_BATCHING=true]
+        [--save-baseline FILE] [--compare FILE]
+
+Thousands of sockets need a matching open file limit (ulimit -n) for this process and
+the server.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import websockets
+from sqlalchemy import create_engine, func, select
+
+from app import models
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.db.base_class import Base
+from app.db.pool import engine_options
+from app.models.conversation import conversation_participants
+
+import seed_bulk
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+CONTENT_PREFIX = "lt "
+
+# (name, method, path template, weight); templates are filled per request
+HTTP_ENDPOINTS = (
+    ("conversations", "GET", "/api/v1/conversations/", 4),
+    ("messages", "GET", "/api/v1/messages/{conversation_id}/messages", 4),
+    ("sync", "GET", "/api/v1/sync?since=0", 2),
+    ("users.search", "GET", "/api/v1/users/search?query={query}", 2),
+    ("users.me", "GET", "/api/v1/users/me", 1),
+    ("login", "POST", "/api/v1/login/access-token", 0.1),
+)
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty sample."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+def summarize(samples_ms: List[float]) -> dict:
+    return {
+        "count": len(samples_ms),
+        "p50": percentile(samples_ms, 50),
+        "p99": percentile(samples_ms, 99),
+    }
+
+# Seeding
+
+def seed(database_url: str, args) -> None:
+    """Seed with seed_bulk unless the database already has users."""
+    engine = create_engine(database_url, **engine_options(database_url))
+    Base.metadata.create_all(engine)
+    with engine.connect() as conn:
+        existing = conn.execute(select(func.count()).select_from(models.User)).scalar()
+    if existing:
+        print(f"reusing {existing} existing users")
+    else:
+        seed_bulk.print_report(seed_bulk.seed_bulk(
+            engine, args.users, args.conversations, args.messages, seed=args.seed
+        ))
+    engine.dispose()
+
+def load_dataset(database_url: str, clients: int) -> Tuple[Dict[int, List[int]], Dict[int, List[int]]]:
+    """
+    The first `clients` users mapped to their conversation ids, and those
+    conversations mapped to all of their members.
+    """
+    engine = create_engine(database_url, **engine_options(database_url))
+    with engine.connect() as conn:
+        user_ids = conn.execute(
+            select(models.User.id)
+            .order_by(models.User.id)
+            .limit(clients)
+        ).scalars().all()
+        memberships: Dict[int, List[int]] = {uid: [] for uid in user_ids}
+        rows = conn.execute(
+            select(conversation_participants.c.user_id, conversation_participants.c.conversation_id)
+            .where(conversation_participants.c.user_id.in_(user_ids))
+        )
+        for uid, cid in rows:
+            memberships[uid].append(cid)
+        members_by_conversation: Dict[int, List[int]] = defaultdict(list)
+        rows = conn.execute(
+            select(conversation_participants.c.conversation_id, conversation_participants.c.user_id)
+            .where(conversation_participants.c.conversation_id.in_(
+                {cid for cids in memberships.values() for cid in cids}
+            ))
+        )
+        for cid, uid in rows:
+            members_by_conversation[cid].append(uid)
+    engine.dispose()
+    return memberships, members_by_conversation
+
+# Server
+
+def spawn_server(database_url: str, port: int, server_env: List[str]) -> subprocess.Popen:
+    # Every simulated user connects from this one address; --server-env RATE_LIMIT_ENABLED=true
+    # measures the server with its limits on
+    env = dict(os.environ, DATABASE_URL=database_url, ASYNC_DATABASE_URL="", RATE_LIMIT_ENABLED="false")
+    env.update(item.split("=", 1) for item in server_env)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+
+async def wait_for_server(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=url) as client:
+        while True:
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"server at {url} did not become healthy")
+            await asyncio.sleep(0.2)
+
+# Sockets
+
+@dataclass
+class Client:
+    user_id: int
+    conversations: List[int]
+    token: str = ""
+    websocket: Optional[object] = None
+    outbox: asyncio.Queue = field(default_factory=asyncio.Queue)
+
+@dataclass
+class SocketStats:
+    sent: int = 0
+    delivered: int = 0
+    expected: int = 0
+    errors: int = 0
+    latencies_ms: List[float] = field(default_factory=list)
+
+def codec(protocol: str):
+    """(dumps, loads) for the wire protocol the clients speak."""
+    if protocol == "msgpack":
+        import msgpack
+        return msgpack.packb, msgpack.unpackb
+    return json.dumps, json.loads
+
+async def connect(client: Client, ws_url: str, handshakes: asyncio.Semaphore, args) -> None:
+    async with handshakes:
+        client.websocket = await websockets.connect(
+            f"{ws_url}?token={client.token}",
+            subprotocols=[f"chat.{args.protocol}"],
+            compression="deflate" if args.compression == "deflate" else None,
+            max_size=None,
+            open_timeout=60,
+            ping_interval=None,
+        )
+
+async def receive(client: Client, stats: SocketStats, loads) -> None:
+    try:
+        async for frame in client.websocket:
+            received = time.perf_counter_ns()
+            try:
+                event = loads(frame)
+            except (ValueError, TypeError):
+                stats.errors += 1
+                continue
+            content = (event.get("payload") or {}).get("content", "")
+            if event.get("type") == "message.new" and content.startswith(CONTENT_PREFIX):
+                stats.delivered += 1
+                stats.latencies_ms.append((received - int(content[len(CONTENT_PREFIX):])) / 1e6)
+    except websockets.ConnectionClosed:
+        pass
+
+async def send(client: Client) -> None:
+    while True:
+        frame = await client.outbox.get()
+        await client.websocket.send(frame)
+
+async def drive_messages(
+    senders: List[Client],
+    members_by_conversation: Dict[int, List[int]],
+    connected: set,
+    rate: float,
+    duration: float,
+    stats: SocketStats,
+    rng: random.Random,
+    dumps,
+) -> None:
+    """Queue message.new frames at a fixed total rate on randomly chosen sockets."""
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    total = int(rate * duration)
+    for i in range(total):
+        delay = started + i / rate - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        client = rng.choice(senders)
+        conversation_id = rng.choice(client.conversations)
+        frame = dumps({
+            "type": "message.new",
+            "payload": {
+                "conversation_id": conversation_id,
+                "content": f"{CONTENT_PREFIX}{time.perf_counter_ns()}",
+            },
+        })
+        client.outbox.put_nowait(frame)
+        stats.sent += 1
+        stats.expected += sum(1 for uid in members_by_conversation[conversation_id] if uid in connected)
+
+# HTTP
+
+async def http_worker(
+    client: httpx.AsyncClient,
+    clients: List[Client],
+    stop: asyncio.Event,
+    samples: Dict[str, List[float]],
+    errors: Dict[str, int],
+    rng: random.Random,
+) -> None:
+    names = [endpoint[0] for endpoint in HTTP_ENDPOINTS]
+    weights = [endpoint[3] for endpoint in HTTP_ENDPOINTS]
+    endpoints = {endpoint[0]: endpoint for endpoint in HTTP_ENDPOINTS}
+    while not stop.is_set():
+        name = rng.choices(names, weights)[0]
+        _, method, template, _ = endpoints[name]
+        user = rng.choice(clients)
+        path = template.format(
+            conversation_id=rng.choice(user.conversations) if user.conversations else 0,
+            query=rng.choice(seed_bulk.LAST_NAMES)[:3],
+        )
+        if name == "login":
+            kwargs = {"data": {"username": f"user{user.user_id}@example.com", "password": seed_bulk.PASSWORD}}
+        else:
+            kwargs = {"headers": {"Authorization": f"Bearer {user.token}"}}
+        key = f"{method} {template.split('?')[0]}"
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, **kwargs)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        elapsed_ms = (time.perf_counter() - started) * 1e3
+        if ok:
+            samples[key].append(elapsed_ms)
+        else:
+            errors[key] += 1
+
+# Run
+
+async def run(args, memberships: Dict[int, List[int]], members_by_conversation: Dict[int, List[int]]) -> dict:
+    rng = random.Random(args.seed)
+    ws_url = args.url.replace("http", "ws", 1) + "/api/v1/ws"
+    clients = [Client(uid, cids, create_access_token(uid)) for uid, cids in memberships.items()]
+
+    handshakes = asyncio.Semaphore(args.connect_concurrency)
+    started = time.perf_counter()
+    await asyncio.gather(*(connect(client, ws_url, handshakes, args) for client in clients))
+    connect_seconds = time.perf_counter() - started
+    print(f"connected {len(clients)} sockets in {connect_seconds:.1f}s")
+
+    socket_stats = SocketStats()
+    connected = {client.user_id for client in clients}
+    dumps, loads = codec(args.protocol)
+    tasks = [asyncio.create_task(receive(client, socket_stats, loads)) for client in clients]
+    tasks += [asyncio.create_task(send(client)) for client in clients]
+
+    http_samples: Dict[str, List[float]] = defaultdict(list)
+    http_errors: Dict[str, int] = defaultdict(int)
+    stop = asyncio.Event()
+    http_client = httpx.AsyncClient(
+        base_url=args.url,
+        timeout=60,
+        limits=httpx.Limits(max_connections=args.http_concurrency),
+    )
+    http_tasks = [
+        asyncio.create_task(http_worker(http_client, clients, stop, http_samples, http_errors, random.Random(args.seed + i)))
+        for i in range(args.http_concurrency)
+    ]
+
+    senders = [client for client in clients if client.conversations]
+    started = time.perf_counter()
+    await drive_messages(senders, members_by_conversation, connected, args.rate, args.duration, socket_stats, rng, dumps)
+    send_seconds = time.perf_counter() - started
+    stop.set()
+
+    # Let in-flight frames arrive
+    deadline = time.monotonic() + args.drain
+    while socket_stats.delivered < socket_stats.expected and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+    elapsed = time.perf_counter() - started
+
+    await asyncio.gather(*http_tasks)
+    await http_client.aclose()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*(client.websocket.close() for client in clients), return_exceptions=True)
+
+    endpoints = sorted(set(http_samples) | set(http_errors))
+    return {
+        "config": {
+            "clients": len(clients),
+            "rate": args.rate,
+            "duration": args.duration,
+            "http_concurrency": args.http_concurrency,
+            "server_env": sorted(args.server_env),
+            "protocol": args.protocol,
+            "compression": args.compression,
+        },
+        "connect_seconds": connect_seconds,
+        "messages_per_sec": socket_stats.sent / send_seconds,
+        "deliveries_per_sec": socket_stats.delivered / elapsed,
+        "delivery_ratio": socket_stats.delivered / socket_stats.expected if socket_stats.expected else 1.0,
+        "socket_errors": socket_stats.errors,
+        "delivery_ms": summarize(socket_stats.latencies_ms),
+        "http_ms": {
+            key: dict(summarize(http_samples[key]), errors=http_errors[key])
+            for key in endpoints
+        },
+    }
+
+def print_report(results: dict) -> None:
+    config = results["config"]
+    print(
+        f"\nclients={config['clients']} rate={config['rate']}/s duration={config['duration']}s "
+        f"http_concurrency={config['http_concurrency']} protocol={config['protocol']} "
+        f"compression={config['compression']} {' '.join(config['server_env'])}"
+    )
+    delivery = results["delivery_ms"]
+    print(f"messages/s      {results['messages_per_sec']:10.1f}")
+    print(f"deliveries/s    {results['deliveries_per_sec']:10.1f}")
+    print(f"delivered       {results['delivery_ratio'] * 100:9.1f}%")
+    print(f"delivery p50    {delivery['p50']:10.2f} ms")
+    print(f"delivery p99    {delivery['p99']:10.2f} ms")
+    print(f"\n{'endpoint':48} {'count':>7} {'errors':>7} {'p50 ms':>9} {'p99 ms':>9}")
+    for key, row in results["http_ms"].items():
+        print(f"{key:48} {row['count']:7d} {row['errors']:7d} {row['p50']:9.2f} {row['p99']:9.2f}")
+
+def compare(baseline: dict, current: dict, tolerance: float, min_delta_ms: float) -> List[str]:
+    """
+    Regressions of `current` against `baseline`: latencies more than `tolerance` (a
+    fraction) and min_delta_ms slower, throughput more than `tolerance` lower.
+    """
+    regressions = []
+
+    def latency(name: str, before: float, after: float) -> None:
+        if after > before * (1 + tolerance) and after - before > min_delta_ms:
+            regressions.append(f"{name}: {before:.2f} ms -> {after:.2f} ms")
+
+    def throughput(name: str, before: float, after: float) -> None:
+        if after < before * (1 - tolerance):
+            regressions.append(f"{name}: {before:.1f} -> {after:.1f}")
+
+    for q in ("p50", "p99"):
+        latency(f"delivery {q}", baseline["delivery_ms"][q], current["delivery_ms"][q])
+        for key, row in baseline["http_ms"].items():
+            if key in current["http_ms"]:
+                latency(f"{key} {q}", row[q], current["http_ms"][key][q])
+    throughput("messages/s", baseline["messages_per_sec"], current["messages_per_sec"])
+    throughput("deliveries/s", baseline["deliveries_per_sec"], current["deliveries_per_sec"])
+    throughput("delivered ratio", baseline["delivery_ratio"], current["delivery_ratio"])
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://127.0.0.1:8001", help="Server to test (ignored with --spawn)")
+    parser.add_argument("--database-url", default=None, help="Database to seed (defaults to DATABASE_URL)")
+    parser.add_argument("--spawn", action="store_true", help="Start uvicorn on a fresh SQLite database")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--server-env", action="append", default=[], metavar="KEY=VALUE",
+        help="Setting for the spawned server, e.g. INGEST_BATCHING=true (repeatable)",
+    )
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--conversations", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=50_000, help="Message history to seed")
+    parser.add_argument("--clients", type=int, default=1000, help="Concurrent sockets, one per user")
+    parser.add_argument("--rate", type=float, default=200, help="message.new frames per second, all sockets")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--drain", type=float, default=10, help="Seconds to wait for in-flight frames")
+    parser.add_argument("--http-concurrency", type=int, default=8)
+    parser.add_argument("--protocol", choices=("json", "msgpack"), default="json", help="Socket subprotocol")
+    parser.add_argument("--compression", choices=("deflate", "none"), default="deflate")
+    parser.add_argument("--connect-concurrency", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save-baseline", metavar="FILE")
+    parser.add_argument("--compare", metavar="FILE")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--min-delta-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    server = None
+    workdir = None
+    database_url = args.database_url or settings.DATABASE_URL
+    if args.spawn:
+        if args.database_url is None:
+            workdir = tempfile.TemporaryDirectory(prefix="loadtest-")
+            database_url = f"sqlite:///{workdir.name}/loadtest.db"
+        args.url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        seed(database_url, args)
+        memberships, members_by_conversation = load_dataset(database_url, args.clients)
+        if args.spawn:
+            server = spawn_server(database_url, args.port, args.server_env)
+        asyncio.run(wait_for_server(args.url))
+        results = asyncio.run(run(args, memberships, members_by_conversation))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        if workdir is not None:
+            workdir.cleanup()
+
+    print_report(results)
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(results, indent=2) + "\n")
+        print(f"\nbaseline written to {args.save_baseline}")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        if baseline["config"] != results["config"]:
+            print(f"\nwarning: baseline config differs: {baseline['config']}")
+        regressions = compare(baseline, results, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nno regressions against {args.compare}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+Bulk seeding for performance work
+Generates large synthetic datasets: users, conversations with a realistic spread of
+group sizes, and messages, with conversation summaries and unread counts filled in.
+
+Rows are written in batches: multi-row executemany inserts, or COPY on Postgres
+(psycopg2). Every user shares one password hash, computed once. Ids are assigned here,
+after the largest existing id, so the same seed always produces the same data and runs
+can be appended to an existing database.
+
+    python seed_bulk.py [--users 100000] [--conversations 50000] [--messages 1000000]
+        [--seed 1] [--batch-size 10000] [--database-url URL] [--reset]
+"""
+import argparse
+import csv
+import io
+import random
+import time
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Dict, List, Sequence
+
+from sqlalchemy import Table, create_engine, delete, event, func, insert, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from app import models
+from app.core.config import settings
+from app.core.security import get_password_hash
+from app.db.base_class import Base
+from app.db.pool import engine_options
+from app.models.conversation import conversation_participants
+
+PASSWORD = "password123"
+
+FIRST_NAMES = (
+    "Ada", "Alan", "Alice", "Barbara", "Bob", "Charlie", "Diana", "Donald", "Edsger", "Frances",
+    "Grace", "Hedy", "Ivan", "John", "Ken", "Leslie", "Linus", "Margaret", "Niklaus", "Radia",
+)
+LAST_NAMES = (
+    "Allen", "Backus", "Brown", "Dijkstra", "Hamilton", "Hopper", "Johnson", "Knuth", "Lamport",
+    "Lamarr", "Liskov", "Lovelace", "McCarthy", "Perlman", "Prince", "Ritchie", "Smith", "Sutherland",
+    "Thompson", "Turing", "Wirth",
+)
+WORDS = (
+    "the", "a", "we", "it", "is", "to", "and", "on", "for", "ok", "yes", "no", "thanks", "meeting",
+    "tomorrow", "today", "report", "deploy", "review", "lunch", "call", "later", "sounds", "good",
+    "can", "you", "check", "send", "the", "link", "done", "soon", "great", "idea", "bug", "fixed",
+)
+
+# (member count range, share of conversations): mostly direct chats, a long tail of groups
+GROUP_SIZES = (
+    ((2, 2), 0.70),
+    ((3, 5), 0.15),
+    ((6, 15), 0.10),
+    ((16, 50), 0.04),
+    ((51, 250), 0.01),
+)
+
+# Share of members that have read everything; the others stop at a random message
+CAUGHT_UP_SHARE = 0.6
+
+START = datetime(2025, 1, 1)
+
+@dataclass
+class TableStats:
+    rows: int = 0
+    seconds: float = 0.0
+
+@dataclass
+class SeedReport:
+    tables: Dict[str, TableStats] = field(default_factory=dict)
+    seconds: float = 0.0
+
+    def add(self, table: str, rows: int, seconds: float) -> None:
+        stats = self.tables.setdefault(table, TableStats())
+        stats.rows += rows
+        stats.seconds += seconds
+
+class BulkWriter:
+    """
+    Writes row dicts to a table: COPY ... FROM STDIN on Postgres, executemany elsewhere.
+    """
+    def __init__(self, conn: Connection, report: SeedReport):
+        self.conn = conn
+        self.report = report
+        self.use_copy = conn.dialect.name == "postgresql" and conn.dialect.driver == "psycopg2"
+
+    def write(self, table: Table, rows: Sequence[dict]) -> None:
+        if not rows:
+            return
+        started = time.perf_counter()
+        if self.use_copy:
+            self._copy(table, rows)
+        else:
+            self.conn.execute(insert(table), rows)
+        self.report.add(table.name, len(rows), time.perf_counter() - started)
+
+    def _copy(self, table: Table, rows: Sequence[dict]) -> None:
+        columns = list(rows[0])
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            # An unquoted empty field is NULL in COPY's csv format
+            writer.writerow(["" if row[c] is None else row[c] for c in columns])
+        buffer.seek(0)
+        quoted = ", ".join(f'"{c}"' for c in columns)
+        cursor = self.conn.connection.driver_connection.cursor()
+        try:
+            cursor.copy_expert(f'COPY "{table.name}" ({quoted}) FROM STDIN WITH (FORMAT csv)', buffer)
+        finally:
+            cursor.close()
+
+def next_id(conn: Connection, table: Table) -> int:
+    return (conn.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+
+def reset_sequences(conn: Connection) -> None:
+    """Move Postgres id sequences past the explicitly assigned ids."""
+    if conn.dialect.name != "postgresql":
+        return
+    for table in ("user", "conversation", "message"):
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), "
+            f"(SELECT coalesce(max(id), 1) FROM \"{table}\"))"
+        ))
+
+def group_size(rng: random.Random, cumulative: List[float]) -> int:
+    low, high = GROUP_SIZES[bisect_right(cumulative, rng.random() * cumulative[-1])][0]
+    return rng.randint(low, high)
+
+def message_counts(rng: random.Random, conversations: int, messages: int) -> List[int]:
+    """
+    Split `messages` over conversations with a heavy tail: a few conversations hold
+    most of the history, many hold a handful of messages.
+    """
+    weights = [rng.paretovariate(1.2) for _ in range(conversations)]
+    total = sum(weights)
+    counts = [int(messages * w / total) for w in weights]
+    # Hand the rounding remainder to the busiest conversations
+    remainder = messages - sum(counts)
+    for index in sorted(range(conversations), key=weights.__getitem__, reverse=True)[:remainder]:
+        counts[index] += 1
+    return counts
+
+def seed_users(writer: BulkWriter, rng: random.Random, count: int, batch_size: int) -> range:
+    first = next_id(writer.conn, models.User.__table__)
+    hashed = get_password_hash(PASSWORD)
+    for start in range(first, first + count, batch_size):
+        writer.write(models.User.__table__, [
+            {
+                "id": uid,
+                "email": f"user{uid}@example.com",
+                "full_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                "hashed_password": hashed,
+                "is_active": True,
+            }
+            for uid in range(start, min(start + batch_size, first + count))
+        ])
+    return range(first, first + count)
+
+def seed_conversations(
+    writer: BulkWriter,
+    rng: random.Random,
+    user_ids: range,
+    count: int,
+    messages: int,
+    batch_size: int,
+) -> None:
+    """
+    Write conversations in chunks of up to batch_size messages, each chunk with its
+    participants and messages, so memory stays bounded.
+    """
+    conn = writer.conn
+    conversation_id = next_id(conn, models.Conversation.__table__)
+    message_id = next_id(conn, models.Message.__table__)
+    cumulative = list(accumulate(share for _, share in GROUP_SIZES))
+    counts = message_counts(rng, count, messages)
+
+    conversations: List[dict] = []
+    participants: List[dict] = []
+    rows: List[dict] = []
+
+    def flush() -> None:
+        writer.write(models.Conversation.__table__, conversations)
+        writer.write(conversation_participants, participants)
+        writer.write(models.Message.__table__, rows)
+        conversations.clear()
+        participants.clear()
+        rows.clear()
+
+    for message_count in counts:
+        size = min(group_size(rng, cumulative), len(user_ids))
+        members = rng.sample(user_ids, size)
+        created_at = START + timedelta(minutes=rng.randrange(365 * 24 * 60))
+
+        senders = [rng.choice(members) for _ in range(message_count)]
+        timestamps = []
+        sent_at = created_at
+        for sender in senders:
+            sent_at += timedelta(seconds=int(rng.expovariate(1 / 600)) + 1)
+            timestamps.append(sent_at)
+            rows.append({
+                "id": message_id,
+                "conversation_id": conversation_id,
+                "sender_id": sender,
+                "content": " ".join(rng.choices(WORDS, k=rng.randint(2, 14))),
+                "created_at": sent_at,
+            })
+            message_id += 1
+
+        conversations.append({
+            "id": conversation_id,
+            "name": f"Group {conversation_id}" if size > 2 else None,
+            "is_group": size > 2,
+            "created_at": created_at,
+            "last_message_id": message_id - 1 if message_count else None,
+            "last_message_at": timestamps[-1] if message_count else None,
+        })
+        for member in members:
+            # Members have read up to `read`; unread are later messages sent by others
+            read = message_count if rng.random() < CAUGHT_UP_SHARE else rng.randint(0, message_count)
+            participants.append({
+                "conversation_id": conversation_id,
+                "user_id": member,
+                "joined_at": created_at,
+                "last_read_at": timestamps[read - 1] if read else None,
+                "unread_count": (message_count - read) - senders[read:].count(member),
+            })
+        conversation_id += 1
+
+        if len(rows) >= batch_size or len(conversations) >= batch_size:
+            flush()
+    flush()
+
+def _sqlite_bulk_pragmas(dbapi_connection, connection_record) -> None:
+    # Trades crash safety for speed while seeding; the file is rebuilt on failure anyway
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA synchronous = OFF")
+    cursor.close()
+
+def seed_bulk(
+    engine: Engine,
+    users: int,
+    conversations: int,
+    messages: int,
+    seed: int = 1,
+    batch_size: int = 10_000,
+    reset: bool = False,
+) -> SeedReport:
+    """
+    Seed the database behind `engine` in one transaction and return row counts and
+    timings per table.
+    """
+    rng = random.Random(seed)
+    report = SeedReport()
+    Base.metadata.create_all(engine)
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        if reset:
+            conn.execute(delete(models.Message.__table__))
+            conn.execute(delete(conversation_participants))
+            conn.execute(delete(models.Conversation.__table__))
+            conn.execute(delete(models.User.__table__))
+        writer = BulkWriter(conn, report)
+        user_ids = seed_users(writer, rng, users, batch_size)
+        if user_ids:
+            seed_conversations(writer, rng, user_ids, conversations, messages, batch_size)
+        reset_sequences(conn)
+    report.seconds = time.perf_counter() - started
+    return report
+
+def print_report(report: SeedReport) -> None:
+    print(f"{'table':28} {'rows':>12} {'seconds':>9} {'rows/s':>12}")
+    for name, stats in report.tables.items():
+        rate = stats.rows / stats.seconds if stats.seconds else 0.0
+        print(f"{name:28} {stats.rows:12,d} {stats.seconds:9.2f} {rate:12,.0f}")
+    total = sum(stats.rows for stats in report.tables.values())
+    print(f"{'total':28} {total:12,d} {report.seconds:9.2f} {total / report.seconds:12,.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--conversations", type=int, default=50_000)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--database-url", default=None, help="Defaults to DATABASE_URL")
+    parser.add_argument("--reset", action="store_true", help="Delete existing users, conversations and messages first")
+    args = parser.parse_args()
+
+    url = args.database_url or settings.DATABASE_URL
+    engine = create_engine(url, **engine_options(url))
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _sqlite_bulk_pragmas)
+    report = seed_bulk(
+        engine, args.users, args.conversations, args.messages,
+        seed=args.seed, batch_size=args.batch_size, reset=args.reset,
+    )
+    engine.dispose()
+    print_report(report)
+    print(f"\n🎉 Seeded with seed={args.seed}; every user's password is {PASSWORD!r}")
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,14 @@
+import asyncio
+
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
+from app import models
 from app.main import app
 from app.db.base_class import Base
 from app.api import deps
+from app.core import auth, security
 from app.core.config import settings
 
 # Setup test DB
@@ -55,6 +59,81 @@ def test_read_users_me():
     data = response.json()
     assert data["email"] == "test@example.com"
 
+def test_principal_cache_invalidated_on_update():
+    token = test_login_access_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.get(f"{settings.API_V1_STR}/users/search?query=nobody", headers=headers)
+    assert response.status_code == 200
+    user_id = auth.token_user_id(token)
+    assert auth.principal_cache.get(user_id).email == "test@example.com"
+
+    response = client.put(f"{settings.API_V1_STR}/users/me", json={"full_name": "Renamed User"}, headers=headers)
+    assert response.status_code == 200
+    assert auth.principal_cache.get(user_id) is None
+
+def test_invalid_token_rejected():
+    headers = {"Authorization": "Bearer not-a-token"}
+    response = client.get(f"{settings.API_V1_STR}/users/search?query=test", headers=headers)
+    assert response.status_code == 403
+
+def test_login_rehashes_outdated_cost():
+    db = TestingSessionLocal()
+    try:
+        user = models.User(
+            email="legacy@example.com",
+            hashed_password=security.get_password_hash("password123", rounds=4),
+            full_name="Legacy Hash",
+        )
+        db.add(user)
+        db.commit()
+        assert security.needs_rehash(user.hashed_password)
+    finally:
+        db.close()
+
+    # Every query belongs in the threadpool, never on the event loop
+    on_event_loop = []
+    def record_loop_queries(conn, cursor, statement, parameters, context, executemany):
+        try:
+            asyncio.get_running_loop()
+            on_event_loop.append(statement)
+        except RuntimeError:
+            pass
+
+    event.listen(engine, "before_cursor_execute", record_loop_queries)
+    try:
+        response = client.post(
+            f"{settings.API_V1_STR}/login/access-token",
+            data={"username": "legacy@example.com", "password": "password123"},
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", record_loop_queries)
+    assert response.status_code == 200, response.text
+    assert on_event_loop == []
+
+    db = TestingSessionLocal()
+    try:
+        user = db.query(models.User).filter(models.User.email == "legacy@example.com").one()
+        assert not security.needs_rehash(user.hashed_password)
+        assert security.verify_password("password123", user.hashed_password)
+    finally:
+        db.close()
+
+def test_password_hasher_rejects_when_full():
+    hasher = security.PasswordHasher(executor="thread", max_workers=1, max_queue=1)
+
+    async def scenario():
+        return await asyncio.gather(
+            *(hasher.hash("password123") for _ in range(3)), return_exceptions=True
+        )
+
+    try:
+        results = asyncio.run(scenario())
+    finally:
+        hasher.shutdown()
+    assert sum(isinstance(r, security.HasherBusy) for r in results) == 1
+    assert hasher.stats()["completed"] == 2
+    assert hasher.stats()["rejected"] == 1
+
 if __name__ == "__main__":
     try:
         test_create_user()
@@ -63,6 +142,14 @@ if __name__ == "__main__":
         print("✅ Login passed")
         test_read_users_me()
         print("✅ Get Current User passed")
+        test_principal_cache_invalidated_on_update()
+        print("✅ Principal cache invalidation passed")
+        test_invalid_token_rejected()
+        print("✅ Invalid token rejection passed")
+        test_login_rehashes_outdated_cost()
+        print("✅ Rehash on login passed")
+        test_password_hasher_rejects_when_full()
+        print("✅ Hashing queue cap passed")
         print("🎉 ALL TESTS PASSED")
     except Exception as e:
         print(f"❌ TEST FAILED: {e}")
@@ -0,0 +1,226 @@
+import json
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.main import app
+from app.api import deps
+from app.core import security
+from app.core.config import settings
+from app.db.base_class import Base
+from app.models.conversation import Conversation
+from app.models.message import Message
+from app.models.user import User
+from app.services import ingestion, membership, message_batch
+from app.services.ingestion import StoredMessage
+
+# Setup test DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_batch.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine("sqlite+aiosqlite:///./test_batch.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+_previous_overrides = {}
+state = {}
+
+def setup_module():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    for dependency in (deps.get_db, deps.get_async_sessionmaker):
+        _previous_overrides[dependency] = app.dependency_overrides.get(dependency)
+    app.dependency_overrides[deps.get_async_sessionmaker] = lambda: TestingAsyncSessionLocal
+    ingestion.recent_messages.clear()
+    db = TestingSessionLocal()
+    try:
+        alice = User(email="alice-b@example.com", hashed_password="x")
+        bob = User(email="bob-b@example.com", hashed_password="x")
+        carol = User(email="carol-b@example.com", hashed_password="x")
+        with_bob = Conversation(name="Alice & Bob", is_group=False)
+        with_bob.participants.extend([alice, bob])
+        with_carol = Conversation(name="Alice & Carol", is_group=False)
+        with_carol.participants.extend([alice, carol])
+        without_alice = Conversation(name="Bob & Carol", is_group=False)
+        without_alice.participants.extend([bob, carol])
+        db.add_all([with_bob, with_carol, without_alice])
+        db.commit()
+        state.update(
+            alice=alice.id, bob=bob.id, carol=carol.id,
+            with_bob=with_bob.id, with_carol=with_carol.id, without_alice=without_alice.id,
+        )
+    finally:
+        db.close()
+
+def teardown_module():
+    for dependency, previous in _previous_overrides.items():
+        if previous is None:
+            app.dependency_overrides.pop(dependency, None)
+        else:
+            app.dependency_overrides[dependency] = previous
+
+client = TestClient(app)
+
+def connect(user: str):
+    token = security.create_access_token(state[user])
+    return client.websocket_connect(f"{settings.API_V1_STR}/ws?token={token}")
+
+def test_fanout_groups_recipients_by_visible_messages():
+    stored = [
+        StoredMessage(id=i, conversation_id=cid, sender_id=1, content=str(i), created_at=datetime(2026, 1, 1))
+        for i, cid in enumerate([10, 20, 10], start=1)
+    ]
+    frames = message_batch.fanout(stored, {10: frozenset({1, 2, 3}), 20: frozenset({1, 4})})
+    by_user = {user_id: frame for user_ids, frame in frames for user_id in user_ids}
+    assert sorted(by_user) == [1, 2, 3, 4]
+    # Users 2 and 3 see the same messages, so they share one frame
+    assert by_user[2] is by_user[3]
+    assert [m["id"] for m in json.loads(by_user[2].encode())["payload"]["messages"]] == [1, 3]
+    assert [m["id"] for m in json.loads(by_user[1].encode())["payload"]["messages"]] == [1, 2, 3]
+    single = json.loads(by_user[4].encode())
+    assert single["type"] == "message.new" and single["payload"]["id"] == 2
+
+def test_batch_is_persisted_fanned_out_and_acked():
+    # Entering the client runs every socket on one event loop, so they can deliver to each other
+    with client, connect("alice") as alice, connect("bob") as bob, connect("carol") as carol:
+        alice.send_text(json.dumps({"type": "message.batch", "payload": {"messages": [
+            {"conversation_id": state["with_bob"], "content": "one", "client_msg_id": "a"},
+            {"conversation_id": state["with_carol"], "content": "two", "client_msg_id": "b"},
+            {"conversation_id": state["with_bob"], "content": "three", "client_msg_id": "c"},
+            {"conversation_id": state["without_alice"], "content": "nope", "client_msg_id": "d"},
+            {"content": "no conversation", "client_msg_id": "e"},
+        ]}}))
+
+        to_alice = json.loads(alice.receive_text())
+        assert to_alice["type"] == "message.batch"
+        assert [m["content"] for m in to_alice["payload"]["messages"]] == ["one", "two", "three"]
+
+        ack = json.loads(alice.receive_text())
+        assert ack["type"] == "message.batch.ack"
+        items = ack["payload"]["items"]
+        assert [item["index"] for item in items] == [0, 1, 2, 3, 4]
+        assert [item["client_msg_id"] for item in items] == ["a", "b", "c", "d", "e"]
+        assert [item.get("error") for item in items] == [None, None, None, "Not a participant", "Invalid format"]
+        assert [item["id"] for item in items[:3]] == [m["id"] for m in to_alice["payload"]["messages"]]
+
+        to_bob = json.loads(bob.receive_text())
+        assert to_bob["type"] == "message.batch"
+        assert [m["content"] for m in to_bob["payload"]["messages"]] == ["one", "three"]
+
+        to_carol = json.loads(carol.receive_text())
+        assert to_carol["type"] == "message.new"
+        assert to_carol["payload"]["content"] == "two"
+
+    db = TestingSessionLocal()
+    try:
+        stored = db.query(Message).order_by(Message.id).all()
+        assert [m.content for m in stored] == ["one", "two", "three"]
+        assert [m.id for m in stored] == [item["id"] for item in items[:3]]
+    finally:
+        db.close()
+
+def test_array_of_events_in_one_frame():
+    with client, connect("alice") as alice, connect("bob") as bob:
+        alice.send_text(json.dumps([
+            {"type": "message.new", "payload": {"conversation_id": state["with_bob"], "content": "x", "client_msg_id": "x1"}},
+            {"type": "message.new", "payload": {"conversation_id": state["with_bob"], "content": "y"}},
+            {"type": "typing", "payload": {}},
+        ]))
+        to_bob = json.loads(bob.receive_text())
+        assert [m["content"] for m in to_bob["payload"]["messages"]] == ["x", "y"]
+
+        alice.receive_text()  # her own copy
+        items = json.loads(alice.receive_text())["payload"]["items"]
+        assert items[0]["client_msg_id"] == "x1" and "id" in items[0]
+        assert items[1]["client_msg_id"] is None and "id" in items[1]
+        assert items[2] == {"index": 2, "client_msg_id": None, "error": "Unsupported event"}
+
+def test_failed_batch_is_acked_as_not_saved():
+    async def locked(session_factory, items):
+        raise OperationalError("INSERT INTO message", {}, Exception("database is locked"))
+
+    with connect("alice") as alice:
+        original, message_batch.persist_messages = message_batch.persist_messages, locked
+        try:
+            alice.send_text(json.dumps({"type": "message.batch", "payload": {"messages": [
+                {"conversation_id": state["with_bob"], "content": "lost", "client_msg_id": "l1"},
+                {"conversation_id": state["without_alice"], "content": "nope"},
+            ]}}))
+            ack = json.loads(alice.receive_text())
+        finally:
+            message_batch.persist_messages = original
+        assert ack["type"] == "message.batch.ack"
+        assert [item["error"] for item in ack["payload"]["items"]] == ["Not saved", "Not a participant"]
+        assert ack["payload"]["items"][0]["client_msg_id"] == "l1"
+
+        # The socket is still usable
+        alice.send_text(json.dumps({"type": "message.batch", "payload": {"messages": [
+            {"conversation_id": state["with_bob"], "content": "saved"},
+        ]}}))
+        assert json.loads(alice.receive_text())["payload"]["content"] == "saved"
+
+def test_failed_membership_lookup_is_acked_as_not_saved():
+    lookup = membership.aget_member_ids
+
+    async def locked_for_carol(session_factory, conversation_id):
+        if conversation_id == state["with_carol"]:
+            raise OperationalError("SELECT user_id FROM conversation_participants", {}, Exception("database is locked"))
+        return await lookup(session_factory, conversation_id)
+
+    with connect("alice") as alice:
+        membership.aget_member_ids = locked_for_carol
+        try:
+            alice.send_text(json.dumps({"type": "message.batch", "payload": {"messages": [
+                {"conversation_id": state["with_carol"], "content": "lost", "client_msg_id": "k1"},
+                {"conversation_id": state["with_bob"], "content": "kept"},
+                {"conversation_id": state["with_carol"], "content": "lost too"},
+            ]}}))
+            assert json.loads(alice.receive_text())["payload"]["content"] == "kept"
+            ack = json.loads(alice.receive_text())
+        finally:
+            membership.aget_member_ids = lookup
+        assert ack["type"] == "message.batch.ack"
+        items = ack["payload"]["items"]
+        assert [item.get("error") for item in items] == ["Not saved", None, "Not saved"]
+        assert items[0]["client_msg_id"] == "k1"
+
+def test_oversized_batch_is_rejected():
+    previous = settings.WS_MAX_BATCH_SIZE
+    settings.WS_MAX_BATCH_SIZE = 2
+    try:
+        with connect("alice") as alice:
+            alice.send_text(json.dumps({"type": "message.batch", "payload": {"messages": [
+                {"conversation_id": state["with_bob"], "content": str(i)} for i in range(3)
+            ]}}))
+            assert alice.receive_text() == "Error: Batch too large"
+            alice.send_text(json.dumps({"type": "message.batch", "payload": {"messages": "nope"}}))
+            assert alice.receive_text() == "Error: Invalid format"
+    finally:
+        settings.WS_MAX_BATCH_SIZE = previous
+
+if __name__ == "__main__":
+    try:
+        setup_module()
+        test_fanout_groups_recipients_by_visible_messages()
+        print("✅ Fan-out grouping passed")
+        test_batch_is_persisted_fanned_out_and_acked()
+        print("✅ Batch persist, fan-out and ack passed")
+        test_array_of_events_in_one_frame()
+        print("✅ Array frame passed")
+        test_failed_batch_is_acked_as_not_saved()
+        print("✅ Failed batch passed")
+        test_failed_membership_lookup_is_acked_as_not_saved()
+        print("✅ Failed membership lookup passed")
+        test_oversized_batch_is_rejected()
+        print("✅ Oversized batch passed")
+        print("🎉 ALL TESTS PASSED")
+    except Exception as e:
+        print(f"❌ TEST FAILED: {e}")
+    finally:
+        teardown_module()
@@ -0,0 +1,159 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.main import app
+from app.db.base_class import Base
+from app.api import deps
+from app.core import security
+from app.core.config import settings
+from app.models.user import User
+from app.models.conversation import Conversation
+from app.models.message import Message
+from app.services import export
+
+# Setup test DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_export.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+MESSAGES = 2500
+START = datetime(2026, 1, 1)
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+_previous_override = None
+state = {}
+
+def setup_module():
+    global _previous_override
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    _previous_override = app.dependency_overrides.get(deps.get_db)
+    app.dependency_overrides[deps.get_db] = override_get_db
+
+    db = TestingSessionLocal()
+    try:
+        alice = User(email="alice-export@example.com", full_name="Alice", hashed_password="x")
+        bob = User(email="bob-export@example.com", full_name="Bob", hashed_password="x")
+        eve = User(email="eve-export@example.com", full_name="Eve", hashed_password="x")
+        conv = Conversation(name="Export", is_group=False)
+        conv.participants.extend([alice, bob])
+        other = Conversation(name="Other", is_group=False)
+        other.participants.extend([alice, eve])
+        db.add_all([alice, bob, eve, conv, other])
+        db.commit()
+        db.execute(insert(Message), [
+            {
+                "conversation_id": conv.id,
+                "sender_id": (alice, bob)[i % 2].id,
+                "content": f'line {i}, with "quotes"\nand a newline',
+                "created_at": START + timedelta(minutes=i),
+            }
+            for i in range(MESSAGES)
+        ])
+        db.add(Message(conversation_id=other.id, sender_id=eve.id, content="elsewhere", created_at=START))
+        db.commit()
+        state.update(
+            conversation_id=conv.id,
+            other_id=other.id,
+            alice=security.create_access_token(alice.id),
+            bob=security.create_access_token(bob.id),
+        )
+    finally:
+        db.close()
+
+def teardown_module():
+    if _previous_override is None:
+        app.dependency_overrides.pop(deps.get_db, None)
+    else:
+        app.dependency_overrides[deps.get_db] = _previous_override
+
+client = TestClient(app)
+
+def get_export(token, **params):
+    return client.get(
+        f"{settings.API_V1_STR}/messages/export",
+        params=params,
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+def test_ndjson_export_streams_whole_conversation_in_order():
+    response = get_export(state["bob"], conversation_id=state["conversation_id"])
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == MESSAGES
+    assert [r["id"] for r in rows] == sorted(r["id"] for r in rows)
+    assert rows[1]["content"] == 'line 1, with "quotes"\nand a newline'
+
+def test_resume_and_time_range():
+    full = get_export(state["bob"], conversation_id=state["conversation_id"]).text.splitlines()
+    resume_from = json.loads(full[999])["id"]
+    resumed = get_export(state["bob"], conversation_id=state["conversation_id"], after_id=resume_from)
+    assert resumed.text.splitlines() == full[1000:]
+
+    ranged = get_export(
+        state["bob"],
+        conversation_id=state["conversation_id"],
+        since=(START + timedelta(minutes=10)).isoformat(),
+        until=(START + timedelta(minutes=20)).isoformat(),
+    )
+    assert [json.loads(line)["content"].split(",")[0] for line in ranged.text.splitlines()] == [
+        f"line {i}" for i in range(10, 20)
+    ]
+
+def test_csv_export_and_all_conversations():
+    response = get_export(state["alice"], format="csv")
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == list(export.EXPORT_FIELDS)
+    assert len(rows) == MESSAGES + 2  # header, both conversations
+    assert rows[-1][3] == "elsewhere"
+
+    # Bob is only in the first conversation
+    bob_rows = get_export(state["bob"]).text.splitlines()
+    assert len(bob_rows) == MESSAGES
+
+def test_export_requires_membership():
+    response = get_export(state["bob"], conversation_id=state["other_id"])
+    assert response.status_code == 404
+    assert get_export(state["bob"], format="xml").status_code == 422
+
+def test_stream_is_chunked():
+    stmt = export.export_statement(0, conversation_id=state["conversation_id"])
+    chunks = list(export.stream_export(engine, stmt, "ndjson", chunk_rows=100))
+    assert len(chunks) == MESSAGES // 100
+    assert all(chunk.count(b"\n") == 100 for chunk in chunks)
+
+if __name__ == "__main__":
+    try:
+        setup_module()
+        test_ndjson_export_streams_whole_conversation_in_order()
+        print("✅ NDJSON export passed")
+        test_resume_and_time_range()
+        print("✅ Resume and time range passed")
+        test_csv_export_and_all_conversations()
+        print("✅ CSV export passed")
+        test_export_requires_membership()
+        print("✅ Membership check passed")
+        test_stream_is_chunked()
+        print("✅ Chunked stream passed")
+        print("🎉 ALL TESTS PASSED")
+    except Exception as e:
+        print(f"❌ TEST FAILED: {e}")
+    finally:
+        teardown_module()
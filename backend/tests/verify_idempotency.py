@@ -0,0 +1,157 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app import schemas
+from app.main import app
+from app.api import deps
+from app.core import security
+from app.core.config import settings
+from app.db.base_class import Base
+from app.models.conversation import Conversation
+from app.models.message import Message
+from app.models.user import User
+from app.services import ingestion
+
+# Setup test DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_idempotency.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine("sqlite+aiosqlite:///./test_idempotency.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+_previous_overrides = {}
+state = {}
+
+def setup_module():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    for dependency in (deps.get_db, deps.get_async_sessionmaker):
+        _previous_overrides[dependency] = app.dependency_overrides.get(dependency)
+    app.dependency_overrides[deps.get_async_sessionmaker] = lambda: TestingAsyncSessionLocal
+    ingestion.recent_messages.clear()
+    db = TestingSessionLocal()
+    try:
+        alice = User(email="alice-i@example.com", hashed_password="x")
+        bob = User(email="bob-i@example.com", hashed_password="x")
+        conv = Conversation(name="Alice & Bob", is_group=False)
+        conv.participants.extend([alice, bob])
+        db.add(conv)
+        db.commit()
+        state.update(alice=alice.id, bob=bob.id, conversation=conv.id)
+    finally:
+        db.close()
+
+def teardown_module():
+    for dependency, previous in _previous_overrides.items():
+        if previous is None:
+            app.dependency_overrides.pop(dependency, None)
+        else:
+            app.dependency_overrides[dependency] = previous
+
+client = TestClient(app)
+
+def connect(user: str):
+    token = security.create_access_token(state[user])
+    return client.websocket_connect(f"{settings.API_V1_STR}/ws?token={token}")
+
+def send(websocket, content: str, client_msg_id=None):
+    payload = {"conversation_id": state["conversation"], "content": content}
+    if client_msg_id is not None:
+        payload["client_msg_id"] = client_msg_id
+    websocket.send_text(json.dumps({"type": "message.new", "payload": payload}))
+
+def stored_contents():
+    db = TestingSessionLocal()
+    try:
+        return [m.content for m in db.query(Message).order_by(Message.id)]
+    finally:
+        db.close()
+
+def test_resend_is_acked_without_a_second_write_or_broadcast():
+    # Entering the client runs every socket on one event loop, so they can deliver to each other
+    with client, connect("alice") as alice, connect("bob") as bob:
+        send(alice, "hello", "m1")
+        assert json.loads(alice.receive_text())["type"] == "message.new"
+        ack = json.loads(alice.receive_text())
+        assert ack["type"] == "message.ack"
+        assert ack["payload"]["client_msg_id"] == "m1"
+        assert ack["payload"]["duplicate"] is False
+        first_id = ack["payload"]["id"]
+        assert json.loads(bob.receive_text())["payload"]["id"] == first_id
+
+        # Resent from the dedup window
+        send(alice, "hello", "m1")
+        resent = json.loads(alice.receive_text())
+        assert resent["type"] == "message.ack"
+        assert resent["payload"]["id"] == first_id and resent["payload"]["duplicate"] is True
+
+        # Resent after the window forgot it: the unique index catches it
+        ingestion.recent_messages.clear()
+        send(alice, "hello", "m1")
+        resent = json.loads(alice.receive_text())
+        assert resent["payload"]["id"] == first_id and resent["payload"]["duplicate"] is True
+
+        # Bob only ever saw the first copy; messages without an id are not acked
+        send(alice, "next")
+        assert json.loads(alice.receive_text())["payload"]["content"] == "next"
+        assert json.loads(bob.receive_text())["payload"]["content"] == "next"
+
+    assert stored_contents() == ["hello", "next"]
+
+def test_persist_messages_skips_stored_and_repeated_ids():
+    ingestion.recent_messages.clear()
+    conversation = state["conversation"]
+
+    def item(sender: str, content: str, client_msg_id=None):
+        return (state[sender], schemas.IncomingMessage(
+            conversation_id=conversation, content=content, client_msg_id=client_msg_id
+        ))
+
+    stored = asyncio.run(ingestion.persist_messages(TestingAsyncSessionLocal, [
+        item("alice", "again", "m1"),  # stored by the previous test
+        item("alice", "new", "m2"),
+        item("alice", "new, repeated", "m2"),
+        item("bob", "same id, other sender", "m2"),
+        item("bob", "no id"),
+    ]))
+    assert [m.duplicate for m in stored] == [True, False, True, False, False]
+    assert stored[0].content == "hello"
+    assert stored[2].id == stored[1].id
+    assert len({m.id for m in stored}) == 4
+    assert stored_contents() == ["hello", "next", "new", "same id, other sender", "no id"]
+
+def test_client_msg_id_is_unique_per_sender():
+    db = TestingSessionLocal()
+    try:
+        db.add(Message(conversation_id=state["conversation"], sender_id=state["alice"], content="x", client_msg_id="m2"))
+        try:
+            db.commit()
+            assert False, "duplicate client_msg_id was stored"
+        except IntegrityError:
+            db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    try:
+        setup_module()
+        test_resend_is_acked_without_a_second_write_or_broadcast()
+        print("✅ Resend ack passed")
+        test_persist_messages_skips_stored_and_repeated_ids()
+        print("✅ persist_messages dedup passed")
+        test_client_msg_id_is_unique_per_sender()
+        print("✅ Unique constraint passed")
+        print("🎉 ALL TESTS PASSED")
+    except Exception as e:
+        print(f"❌ TEST FAILED: {e}")
+    finally:
+        teardown_module()
@@ -0,0 +1,147 @@
+import asyncio
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import schemas
+from app.db.base import Base
+from app.models.user import User
+from app.models.conversation import Conversation, conversation_participants
+from app.models.message import Message
+from app.services.ingestion import MessageIngestor, persist_messages
+
+# Setup test DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_ingestion.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def async_session_factory():
+    async_engine = create_async_engine("sqlite+aiosqlite:///./test_ingestion.db")
+    return async_engine, async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+conversation_ids = []
+sender_ids = []
+
+def setup_module():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        users = [User(email=f"ingest-{i}@example.com", hashed_password="x") for i in range(3)]
+        conversations = [Conversation(name=f"Group {i}", is_group=True) for i in range(3)]
+        for conv in conversations:
+            conv.participants.extend(users)
+        db.add_all(users + conversations)
+        db.commit()
+        conversation_ids[:] = [conv.id for conv in conversations]
+        sender_ids[:] = [user.id for user in users]
+    finally:
+        db.close()
+
+def test_persist_messages_single_statement():
+    async def scenario():
+        async_engine, factory = async_session_factory()
+        try:
+            stored = await persist_messages(factory, [
+                (sender_ids[0], schemas.IncomingMessage(conversation_id=conversation_ids[0], content="one")),
+                (sender_ids[1], schemas.IncomingMessage(conversation_id=conversation_ids[0], content="two")),
+            ])
+        finally:
+            await async_engine.dispose()
+        assert [m.content for m in stored] == ["one", "two"]
+        assert stored[0].id < stored[1].id
+        assert all(m.created_at is not None for m in stored)
+
+    asyncio.run(scenario())
+
+def test_persist_messages_updates_conversation_summary():
+    db = TestingSessionLocal()
+    try:
+        users = [db.get(User, uid) for uid in sender_ids]
+        conv = Conversation(name="Summary", is_group=True)
+        conv.participants.extend(users)
+        db.add(conv)
+        db.commit()
+        conversation_id = conv.id
+    finally:
+        db.close()
+
+    async def scenario():
+        async_engine, factory = async_session_factory()
+        try:
+            return await persist_messages(factory, [
+                (sender_ids[0], schemas.IncomingMessage(conversation_id=conversation_id, content="a")),
+                (sender_ids[0], schemas.IncomingMessage(conversation_id=conversation_id, content="b")),
+                (sender_ids[1], schemas.IncomingMessage(conversation_id=conversation_id, content="c")),
+            ])
+        finally:
+            await async_engine.dispose()
+
+    stored = asyncio.run(scenario())
+    db = TestingSessionLocal()
+    try:
+        conv = db.get(Conversation, conversation_id)
+        assert conv.last_message_id == stored[-1].id
+        assert conv.last_message.content == "c"
+        unread = dict(
+            db.query(conversation_participants.c.user_id, conversation_participants.c.unread_count)
+            .filter(conversation_participants.c.conversation_id == conversation_id)
+            .all()
+        )
+    finally:
+        db.close()
+    assert unread == {sender_ids[0]: 1, sender_ids[1]: 2, sender_ids[2]: 3}
+
+def test_ingestor_batches_and_keeps_order_per_conversation():
+    async def scenario():
+        async_engine, factory = async_session_factory()
+        ingestor = MessageIngestor(factory, max_batch_size=50, max_delay=0.05)
+        try:
+            submissions = [
+                (sender_ids[i % 3], schemas.IncomingMessage(
+                    conversation_id=conversation_ids[i % 3], content=f"batched {i}"
+                ))
+                for i in range(120)
+            ]
+            # All tasks enqueue in creation order before the ingestor writes anything
+            stored = await asyncio.gather(*(ingestor.submit(s, p) for s, p in submissions))
+            batches = ingestor.batches_written
+            await ingestor.stop()
+        finally:
+            await async_engine.dispose()
+
+        assert batches < len(submissions)
+        for sent, message in zip(submissions, stored):
+            assert message.content == sent[1].content
+            assert message.sender_id == sent[0]
+        for conversation_id in conversation_ids:
+            ids = [m.id for m in stored if m.conversation_id == conversation_id]
+            assert ids == sorted(ids)
+        return stored
+
+    stored = asyncio.run(scenario())
+    db = TestingSessionLocal()
+    try:
+        saved = {
+            m.id: m.content
+            for m in db.query(Message).filter(Message.content.like("batched %"))
+        }
+    finally:
+        db.close()
+    assert saved == {m.id: m.content for m in stored}
+
+if __name__ == "__main__":
+    try:
+        setup_module()
+        test_persist_messages_single_statement()
+        print("✅ Multi-row insert passed")
+        test_persist_messages_updates_conversation_summary()
+        print("✅ Conversation summary passed")
+        test_ingestor_batches_and_keeps_order_per_conversation()
+        print("✅ Batched ingestion ordering passed")
+        print("🎉 ALL TESTS PASSED")
+    except Exception as e:
+        print(f"❌ TEST FAILED: {e}")
@@ -0,0 +1,186 @@
+import asyncio
+
+import msgpack
+
+from app.websockets.backplane import InMemoryBackplane, RedisBackplane
+from app.websockets.manager import ConnectionManager
+from app.websockets.protocol import MSGPACK, Frame
+
+class FakeWebSocket:
+    def __init__(self, delay: float = 0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.sent = []
+        self.close_code = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        if self.fail:
+            raise RuntimeError("connection reset")
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent.append(message)
+
+    async def send_bytes(self, message: bytes):
+        self.sent.append(msgpack.unpackb(message))
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+async def drain():
+    # Give the writer tasks a chance to run
+    for _ in range(5):
+        await asyncio.sleep(0.01)
+
+def test_slow_client_does_not_delay_others():
+    async def scenario():
+        manager = ConnectionManager(send_queue_size=16, send_timeout=5)
+        slow, fast = FakeWebSocket(delay=1), FakeWebSocket()
+        await manager.connect(slow, 1)
+        await manager.connect(fast, 2)
+
+        await manager.broadcast_to_users([1, 2], "hello")
+        await drain()
+        assert fast.sent == ["hello"]
+        assert slow.sent == []
+        manager.disconnect(slow, 1)
+        manager.disconnect(fast, 2)
+
+    asyncio.run(scenario())
+
+def test_dead_socket_is_removed():
+    async def scenario():
+        manager = ConnectionManager(send_queue_size=16, send_timeout=5)
+        dead, alive = FakeWebSocket(fail=True), FakeWebSocket()
+        await manager.connect(dead, 1)
+        await manager.connect(alive, 2)
+
+        await manager.broadcast("ping")
+        await drain()
+        assert 1 not in manager.active_connections
+        assert dead.close_code is not None
+        assert alive.sent == ["ping"]
+        manager.disconnect(alive, 2)
+
+    asyncio.run(scenario())
+
+def test_slow_consumer_disconnect_policy():
+    async def scenario():
+        manager = ConnectionManager(send_queue_size=2, send_timeout=5, slow_consumer_policy="disconnect")
+        stuck = FakeWebSocket(delay=10)
+        await manager.connect(stuck, 1)
+        for i in range(5):
+            await manager.broadcast_to_users([1], f"m{i}")
+        await drain()
+        assert 1 not in manager.active_connections
+        assert stuck.close_code == 1013
+
+    asyncio.run(scenario())
+
+def test_slow_consumer_drop_oldest_policy():
+    async def scenario():
+        manager = ConnectionManager(send_queue_size=2, send_timeout=5, slow_consumer_policy="drop_oldest")
+        ws = FakeWebSocket()
+        await manager.connect(ws, 1)
+        # Enqueue synchronously so the writer cannot drain in between
+        for i in range(5):
+            await manager.broadcast_to_users([1], f"m{i}")
+        await drain()
+        assert ws.sent == ["m3", "m4"]
+        assert manager.connections[ws].dropped == 3
+        manager.disconnect(ws, 1)
+
+    asyncio.run(scenario())
+
+def test_backplane_reaches_other_workers():
+    async def scenario():
+        backplane = InMemoryBackplane()
+        worker_a = ConnectionManager(backplane=backplane)
+        worker_b = ConnectionManager(backplane=backplane)
+        alice, bob, bob_tab = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        await worker_a.connect(alice, 1)
+        await worker_b.connect(bob, 2)
+        await worker_a.connect(bob_tab, 2)
+
+        await worker_a.broadcast_to_users([1, 2], "hello")
+        await drain()
+        assert alice.sent == ["hello"]
+        assert bob.sent == ["hello"]
+        assert bob_tab.sent == ["hello"]
+
+        worker_b.disconnect(bob, 2)
+        await worker_a.broadcast_to_users([2], "again")
+        await drain()
+        assert bob.sent == ["hello"]
+        assert bob_tab.sent == ["hello", "again"]
+
+    asyncio.run(scenario())
+
+def test_redis_backplane_reaches_other_workers():
+    try:
+        import fakeredis
+    except ImportError:
+        print("fakeredis not installed, skipping Redis backplane test")
+        return
+
+    async def scenario():
+        server = fakeredis.FakeServer()
+        worker_a = ConnectionManager(backplane=RedisBackplane(
+            client=fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+        ))
+        worker_b = ConnectionManager(backplane=RedisBackplane(
+            client=fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+        ))
+        await worker_a.start()
+        await worker_b.start()
+        try:
+            alice, bob = FakeWebSocket(), FakeWebSocket()
+            await worker_a.connect(alice, 1)
+            await worker_b.connect(bob, 2)
+            await asyncio.sleep(0.1)
+
+            await worker_a.broadcast_to_users([1, 2], "hello")
+            await worker_b.broadcast("everyone")
+            for _ in range(50):
+                if len(alice.sent) == 2 and len(bob.sent) == 2:
+                    break
+                await asyncio.sleep(0.02)
+            assert alice.sent == ["hello", "everyone"]
+            assert bob.sent == ["hello", "everyone"]
+
+            # Plain strings stay strings, even for a msgpack socket; frames are re-encoded
+            carol = FakeWebSocket()
+            await worker_b.connect(carol, 3, protocol=MSGPACK)
+            await asyncio.sleep(0.1)
+            await worker_a.broadcast_to_users([3], "not json")
+            await worker_a.broadcast_to_users([3], Frame.event("typing", {"user_id": 1}))
+            for _ in range(50):
+                if len(carol.sent) == 2:
+                    break
+                await asyncio.sleep(0.02)
+            assert carol.sent == ["not json", {"type": "typing", "payload": {"user_id": 1}}]
+        finally:
+            await worker_a.stop()
+            await worker_b.stop()
+
+    asyncio.run(scenario())
+
+if __name__ == "__main__":
+    try:
+        test_slow_client_does_not_delay_others()
+        print("✅ Slow client isolation passed")
+        test_dead_socket_is_removed()
+        print("✅ Dead socket cleanup passed")
+        test_slow_consumer_disconnect_policy()
+        print("✅ Disconnect policy passed")
+        test_slow_consumer_drop_oldest_policy()
+        print("✅ Drop-oldest policy passed")
+        test_backplane_reaches_other_workers()
+        print("✅ In-memory backplane fan-out passed")
+        test_redis_backplane_reaches_other_workers()
+        print("✅ Redis backplane fan-out passed")
+        print("🎉 ALL TESTS PASSED")
+    except Exception as e:
+        print(f"❌ TEST FAILED: {e}")
@@ -0,0 +1,70 @@
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.cache import TTLCache
+from app.db.base import Base
+from app.models.user import User
+from app.models.conversation import Conversation
+from app.services import membership
+
+# Setup test DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_membership.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def setup_module():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    membership.membership_cache.clear()
+
+def test_ttl_cache_lru_and_expiry():
+    cache = TTLCache(maxsize=2, ttl=0.05)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" is now most recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert len(cache) == 1
+
+def test_membership_cached_and_invalidated_on_change():
+    db = TestingSessionLocal()
+    try:
+        alice = User(email="alice-m@example.com", hashed_password="x", full_name="Alice")
+        bob = User(email="bob-m@example.com", hashed_password="x", full_name="Bob")
+        carol = User(email="carol-m@example.com", hashed_password="x", full_name="Carol")
+        conv = Conversation(name="Group", is_group=True)
+        conv.participants.extend([alice, bob])
+        db.add_all([alice, bob, carol, conv])
+        db.commit()
+
+        assert membership.get_member_ids(db, conv.id) == frozenset({alice.id, bob.id})
+        assert conv.id in membership.membership_cache
+
+        conv.participants.append(carol)
+        db.commit()
+        assert conv.id not in membership.membership_cache
+        assert membership.get_member_ids(db, conv.id) == frozenset({alice.id, bob.id, carol.id})
+
+        conv.participants.remove(bob)
+        db.rollback()
+        assert conv.id in membership.membership_cache
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    try:
+        setup_module()
+        test_ttl_cache_lru_and_expiry()
+        print("✅ TTL cache passed")
+        test_membership_cached_and_invalidated_on_change()
+        print("✅ Membership cache invalidation passed")
+        print("🎉 ALL TESTS PASSED")
+    except Exception as e:
+        print(f"❌ TEST FAILED: {e}")
@@ -0,0 +1,141 @@
+import asyncio
+import time
+
+from fastapi import BackgroundTasks, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.main import app
+from app.db.base_class import Base
+from app.api import deps
+from app.core import metrics, security
+from app.core.config import settings
+from app.models.user import User
+from app.websockets.manager import ConnectionManager
+
+# Setup test DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_metrics.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+_previous_override = None
+token = None
+
+def setup_module():
+    global _previous_override, token
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    _previous_override = app.dependency_overrides.get(deps.get_db)
+    app.dependency_overrides[deps.get_db] = override_get_db
+    db = TestingSessionLocal()
+    try:
+        user = User(email="metrics@example.com", full_name="Metrics", hashed_password="x")
+        db.add(user)
+        db.commit()
+        token = security.create_access_token(user.id)
+    finally:
+        db.close()
+
+def teardown_module():
+    if _previous_override is None:
+        app.dependency_overrides.pop(deps.get_db, None)
+    else:
+        app.dependency_overrides[deps.get_db] = _previous_override
+
+client = TestClient(app)
+
+def sample(name, **labels):
+    return metrics.registry.get_sample_value(name, labels) or 0.0
+
+def test_route_latency_and_db_queries_per_request():
+    route = f"{settings.API_V1_STR}/users/all"
+    before = sample("http_request_duration_seconds_count", method="GET", route=route, status="200")
+    queries_before = sample("http_request_db_queries_sum", route=route)
+
+    response = client.get(f"{route}?limit=5", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200, response.text
+
+    assert sample("http_request_duration_seconds_count", method="GET", route=route, status="200") == before + 1
+    assert sample("http_request_db_queries_sum", route=route) > queries_before
+    assert sample("http_request_db_seconds_count", route=route) >= 1
+
+    # Unknown paths share one label instead of growing the series count
+    client.get("/no/such/path/12345")
+    assert sample("http_request_duration_seconds_count", method="GET", route="unmatched", status="404") >= 1
+
+def test_route_template_keeps_cardinality_low():
+    response = client.get(
+        f"{settings.API_V1_STR}/messages/12345/messages",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 200, response.text
+    route = f"{settings.API_V1_STR}/messages/{{conversation_id}}/messages"
+    assert sample("http_request_duration_seconds_count", method="GET", route=route, status="200") >= 1
+
+def test_background_tasks_are_not_measured():
+    def slow_flush():
+        with engine.connect() as conn:
+            for _ in range(3):
+                conn.execute(text("SELECT 1"))
+        time.sleep(0.3)
+
+    background_app = FastAPI()
+    background_app.add_middleware(metrics.MetricsMiddleware)
+
+    @background_app.get("/with-background")
+    def with_background(background_tasks: BackgroundTasks):
+        background_tasks.add_task(slow_flush)
+        return {}
+
+    route = "/with-background"
+    count_before = sample("http_request_duration_seconds_count", method="GET", route=route, status="200")
+    duration_before = sample("http_request_duration_seconds_sum", method="GET", route=route, status="200")
+    queries_before = sample("http_request_db_queries_sum", route=route)
+    with TestClient(background_app) as background_client:
+        assert background_client.get(route).status_code == 200
+
+    assert sample("http_request_duration_seconds_count", method="GET", route=route, status="200") == count_before + 1
+    assert sample("http_request_duration_seconds_sum", method="GET", route=route, status="200") - duration_before < 0.3
+    assert sample("http_request_db_queries_sum", route=route) == queries_before
+
+def test_broadcast_fanout_and_state_gauges():
+    manager = ConnectionManager()
+    count_before = sample("ws_broadcast_recipients_count")
+    sum_before = sample("ws_broadcast_recipients_sum")
+    asyncio.run(manager.broadcast_to_users([1, 2, 3], "hello"))
+    assert sample("ws_broadcast_recipients_count") == count_before + 1
+    assert sample("ws_broadcast_recipients_sum") == sum_before + 3
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    body = response.text
+    assert "ws_active_connections" in body
+    assert 'background_queue_depth{queue="ingest"}' in body
+    assert 'db_pool_checked_out{engine="sync"}' in body
+
+if __name__ == "__main__":
+    try:
+        setup_module()
+        test_route_latency_and_db_queries_per_request()
+        print("✅ Route metrics passed")
+        test_route_template_keeps_cardinality_low()
+        print("✅ Route templates passed")
+        test_background_tasks_are_not_measured()
+        print("✅ Background tasks excluded passed")
+        test_broadcast_fanout_and_state_gauges()
+        print("✅ Fan-out and state gauges passed")
+        print("🎉 ALL TESTS PASSED")
+    except Exception as e:
+        print(f"❌ TEST FAILED: {e}")
+    finally:
+        teardown_module()
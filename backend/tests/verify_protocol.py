@@ -0,0 +1,133 @@
+import json
+from datetime import datetime, timezone
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.main import app
+from app.api import deps
+from app.core import security
+from app.core.config import settings
+from app.db.base_class import Base
+from app.models.conversation import Conversation
+from app.models.user import User
+from app.websockets import protocol
+
+# Setup test DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_protocol.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine("sqlite+aiosqlite:///./test_protocol.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+_previous_overrides = {}
+state = {}
+
+def setup_module():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    for dependency in (deps.get_db, deps.get_async_sessionmaker):
+        _previous_overrides[dependency] = app.dependency_overrides.get(dependency)
+    app.dependency_overrides[deps.get_async_sessionmaker] = lambda: TestingAsyncSessionLocal
+    db = TestingSessionLocal()
+    try:
+        alice = User(email="alice-p@example.com", hashed_password="x")
+        bob = User(email="bob-p@example.com", hashed_password="x")
+        conv = Conversation(name="Alice & Bob", is_group=False)
+        conv.participants.extend([alice, bob])
+        db.add(conv)
+        db.commit()
+        state.update(alice=alice.id, bob=bob.id, conversation=conv.id)
+    finally:
+        db.close()
+
+def teardown_module():
+    for dependency, previous in _previous_overrides.items():
+        if previous is None:
+            app.dependency_overrides.pop(dependency, None)
+        else:
+            app.dependency_overrides[dependency] = previous
+
+client = TestClient(app)
+
+def test_negotiation_follows_client_preference():
+    if protocol.msgpack is None:
+        print("msgpack not installed, skipping negotiation test")
+        return
+    assert protocol.negotiate(["chat.msgpack", "chat.json"]) == "chat.msgpack"
+    assert protocol.negotiate(["chat.json", "chat.msgpack"]) == "chat.json"
+    assert protocol.negotiate(["graphql-ws"]) is None
+    assert protocol.negotiate([]) is None
+    assert protocol.protocol_for(None) == protocol.JSON
+
+def test_frame_encodes_once_per_protocol():
+    if protocol.msgpack is None:
+        print("msgpack not installed, skipping frame test")
+        return
+    created_at = datetime(2026, 1, 1, 12, 0, 0, 5, tzinfo=timezone.utc)
+    frame = protocol.Frame.event("message.new", {"id": 1, "content": "héllo", "created_at": created_at})
+    as_json = frame.encode(protocol.JSON)
+    as_msgpack = frame.encode(protocol.MSGPACK)
+    assert frame.encode(protocol.JSON) is as_json
+    assert frame.encode(protocol.MSGPACK) is as_msgpack
+    assert isinstance(as_msgpack, bytes)
+    assert protocol.msgpack.unpackb(as_msgpack) == json.loads(as_json)
+    assert json.loads(as_json)["payload"]["created_at"] == "2026-01-01T12:00:00.000005Z"
+
+    # Frames from the backplane arrive as JSON and can still be re-encoded
+    relayed = protocol.Frame.from_json(as_json)
+    assert relayed.encode(protocol.JSON) is as_json
+    assert relayed.encode(protocol.MSGPACK) == as_msgpack
+
+def test_msgpack_and_json_clients_share_a_conversation():
+    if protocol.msgpack is None:
+        print("msgpack not installed, skipping socket test")
+        return
+    alice_token = security.create_access_token(state["alice"])
+    bob_token = security.create_access_token(state["bob"])
+    url = f"{settings.API_V1_STR}/ws?token="
+    with client.websocket_connect(url + alice_token, subprotocols=["chat.msgpack"]) as alice, \
+            client.websocket_connect(url + bob_token) as bob:
+        assert alice.accepted_subprotocol == "chat.msgpack"
+        assert bob.accepted_subprotocol is None
+        alice.send_bytes(protocol.msgpack.packb({
+            "type": "message.new",
+            "payload": {"conversation_id": state["conversation"], "content": "packed"},
+        }))
+        received_by_alice = protocol.msgpack.unpackb(alice.receive_bytes())
+        received_by_bob = json.loads(bob.receive_text())
+        assert received_by_alice == received_by_bob
+        assert received_by_bob["type"] == "message.new"
+        assert received_by_bob["payload"]["content"] == "packed"
+        assert received_by_bob["payload"]["sender_id"] == state["alice"]
+
+        # JSON text frames are still understood on a MessagePack connection
+        alice.send_text(json.dumps({
+            "type": "message.new",
+            "payload": {"conversation_id": state["conversation"], "content": "text"},
+        }))
+        assert protocol.msgpack.unpackb(alice.receive_bytes())["payload"]["content"] == "text"
+        assert json.loads(bob.receive_text())["payload"]["content"] == "text"
+
+        alice.send_bytes(b"\xc1")
+        assert alice.receive_text() == "Error: Invalid format"
+
+if __name__ == "__main__":
+    try:
+        setup_module()
+        test_negotiation_follows_client_preference()
+        print("✅ Negotiation passed")
+        test_frame_encodes_once_per_protocol()
+        print("✅ Frame encoding passed")
+        test_msgpack_and_json_clients_share_a_conversation()
+        print("✅ Mixed protocol conversation passed")
+        print("🎉 ALL TESTS PASSED")
+    except Exception as e:
+        print(f"❌ TEST FAILED: {e}")
+    finally:
+        teardown_module()
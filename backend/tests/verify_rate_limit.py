@@ -0,0 +1,230 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.main import app
+from app.api import deps
+from app.core import rate_limit, security
+from app.core.config import settings
+from app.db.base_class import Base
+from app.models.conversation import Conversation
+from app.models.user import User
+
+# Setup test DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_rate_limit.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine("sqlite+aiosqlite:///./test_rate_limit.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+_previous_overrides = {}
+_previous_limiters = {}
+state = {}
+
+def setup_module():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    for dependency in (deps.get_db, deps.get_async_sessionmaker):
+        _previous_overrides[dependency] = app.dependency_overrides.get(dependency)
+    app.dependency_overrides[deps.get_db] = override_get_db
+    app.dependency_overrides[deps.get_async_sessionmaker] = lambda: TestingAsyncSessionLocal
+    for name in ("ws_user_limiter", "search_limiter", "login_limiter"):
+        _previous_limiters[name] = getattr(rate_limit, name)
+    db = TestingSessionLocal()
+    try:
+        alice = User(email="alice-r@example.com", hashed_password=security.get_password_hash("secret"))
+        bob = User(email="bob-r@example.com", hashed_password="x")
+        conv = Conversation(name="Alice & Bob", is_group=False)
+        conv.participants.extend([alice, bob])
+        db.add(conv)
+        db.commit()
+        state.update(alice=alice.id, bob=bob.id, conversation=conv.id)
+    finally:
+        db.close()
+
+def teardown_module():
+    for dependency, previous in _previous_overrides.items():
+        if previous is None:
+            app.dependency_overrides.pop(dependency, None)
+        else:
+            app.dependency_overrides[dependency] = previous
+    for name, limiter in _previous_limiters.items():
+        setattr(rate_limit, name, limiter)
+
+client = TestClient(app)
+
+def connect(user: str):
+    token = security.create_access_token(state[user])
+    return client.websocket_connect(f"{settings.API_V1_STR}/ws?token={token}")
+
+def send(websocket, content: str, client_msg_id=None):
+    websocket.send_text(json.dumps({"type": "message.new", "payload": {
+        "conversation_id": state["conversation"], "content": content, "client_msg_id": client_msg_id,
+    }}))
+
+def test_token_bucket():
+    bucket = rate_limit.TokenBucket(rate=2, burst=3, now=0)
+    assert [bucket.take(now=0) for _ in range(3)] == [0, 0, 0]
+    assert bucket.take(now=0) == 0.5
+    assert bucket.take(now=0.5) == 0
+    # Refills up to the burst only
+    assert bucket.take(3, now=100) == 0
+    assert bucket.take(1, now=100) == 0.5
+    # A cost above the burst is charged as a full bucket
+    assert bucket.take(10, now=200) == 0
+    # Refunds never overfill it
+    bucket.refund(2)
+    assert bucket.tokens == 2
+    bucket.refund(10)
+    assert bucket.tokens == 3
+
+def test_in_memory_limiter_keys_are_independent_and_bounded():
+    limiter = rate_limit.InMemoryRateLimiter(rate=1, burst=1, maxsize=2)
+    assert asyncio.run(limiter.acquire("a")) == 0
+    assert asyncio.run(limiter.acquire("a")) > 0
+    assert asyncio.run(limiter.acquire("b")) == 0
+    assert asyncio.run(limiter.acquire("c")) == 0
+    assert len(limiter._buckets) == 2
+
+def test_redis_limiter_falls_back_to_local_buckets():
+    class BrokenRedis:
+        def register_script(self, script):
+            async def run(keys, args):
+                raise ConnectionError("redis is down")
+            return run
+
+    limiter = rate_limit.RedisRateLimiter(rate=1, burst=1, client=BrokenRedis())
+    assert asyncio.run(limiter.acquire("a")) == 0
+    assert asyncio.run(limiter.acquire("a")) > 0
+
+def test_socket_sends_are_rate_limited_per_connection():
+    previous = settings.WS_CONNECTION_RATE, settings.WS_CONNECTION_BURST
+    settings.WS_CONNECTION_RATE, settings.WS_CONNECTION_BURST = 0.001, 2
+    rate_limit.ws_user_limiter = rate_limit.InMemoryRateLimiter(rate=1000, burst=1000)
+    try:
+        with connect("alice") as alice:
+            send(alice, "one")
+            send(alice, "two")
+            send(alice, "three", "c3")
+            assert json.loads(alice.receive_text())["payload"]["content"] == "one"
+            assert json.loads(alice.receive_text())["payload"]["content"] == "two"
+            error = json.loads(alice.receive_text())
+            assert error["type"] == "error.rate_limited"
+            assert error["payload"]["event"] == "message.new"
+            assert error["payload"]["scope"] == "connection"
+            assert error["payload"]["client_msg_id"] == "c3"
+            assert error["payload"]["retry_after"] > 0
+
+        # A new connection gets its own bucket
+        with connect("alice") as alice:
+            send(alice, "four")
+            assert json.loads(alice.receive_text())["payload"]["content"] == "four"
+    finally:
+        settings.WS_CONNECTION_RATE, settings.WS_CONNECTION_BURST = previous
+
+def test_socket_sends_are_rate_limited_per_user():
+    rate_limit.ws_user_limiter = rate_limit.InMemoryRateLimiter(rate=0.001, burst=3)
+    # Entering the client runs every socket on one event loop, so they can deliver to each other
+    with client, connect("bob") as first, connect("bob") as second:
+        first.send_text(json.dumps({"type": "message.batch", "payload": {"messages": [
+            {"conversation_id": state["conversation"], "content": "a"},
+            {"conversation_id": state["conversation"], "content": "b"},
+        ]}}))
+        assert json.loads(first.receive_text())["type"] == "message.batch"
+        assert json.loads(first.receive_text())["type"] == "message.batch.ack"
+        assert json.loads(second.receive_text())["type"] == "message.batch"
+
+        # The user has one token left; a two-message batch does not fit
+        second.send_text(json.dumps([
+            {"type": "message.new", "payload": {"conversation_id": state["conversation"], "content": "c"}},
+            {"type": "message.new", "payload": {"conversation_id": state["conversation"], "content": "d"}},
+        ]))
+        error = json.loads(second.receive_text())
+        assert error["type"] == "error.rate_limited"
+        assert error["payload"]["scope"] == "user"
+        assert error["payload"]["event"] == "message.batch"
+
+def test_user_limit_does_not_drain_the_connection_bucket():
+    previous = settings.WS_CONNECTION_RATE, settings.WS_CONNECTION_BURST
+    settings.WS_CONNECTION_RATE, settings.WS_CONNECTION_BURST = 0.001, 3
+    rate_limit.ws_user_limiter = rate_limit.InMemoryRateLimiter(rate=0.001, burst=1)
+    try:
+        with connect("alice") as alice:
+            send(alice, "one")
+            assert json.loads(alice.receive_text())["payload"]["content"] == "one"
+            for _ in range(5):
+                send(alice, "over the user limit")
+                assert json.loads(alice.receive_text())["payload"]["scope"] == "user"
+
+            # Only the accepted send was charged to the connection
+            rate_limit.ws_user_limiter = rate_limit.InMemoryRateLimiter(rate=1000, burst=1000)
+            send(alice, "two")
+            send(alice, "three")
+            assert json.loads(alice.receive_text())["payload"]["content"] == "two"
+            assert json.loads(alice.receive_text())["payload"]["content"] == "three"
+    finally:
+        settings.WS_CONNECTION_RATE, settings.WS_CONNECTION_BURST = previous
+
+def test_search_is_rate_limited():
+    rate_limit.search_limiter = rate_limit.InMemoryRateLimiter(rate=0.001, burst=2)
+    headers = {"Authorization": f"Bearer {security.create_access_token(state['alice'])}"}
+    url = f"{settings.API_V1_STR}/users/search?query=bob"
+    assert client.get(url, headers=headers).status_code == 200
+    assert client.get(url, headers=headers).status_code == 200
+    response = client.get(url, headers=headers)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+    # Buckets are per user
+    other = {"Authorization": f"Bearer {security.create_access_token(state['bob'])}"}
+    assert client.get(url, headers=other).status_code == 200
+
+def test_login_is_rate_limited():
+    rate_limit.login_limiter = rate_limit.InMemoryRateLimiter(rate=0.001, burst=2)
+    url = f"{settings.API_V1_STR}/login/access-token"
+    wrong = {"username": "alice-r@example.com", "password": "wrong"}
+    right = {"username": "alice-r@example.com", "password": "secret"}
+    assert client.post(url, data=wrong).status_code == 400
+    assert client.post(url, data=right).status_code == 200
+    response = client.post(url, data=right)
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+
+if __name__ == "__main__":
+    try:
+        setup_module()
+        test_token_bucket()
+        print("✅ Token bucket passed")
+        test_in_memory_limiter_keys_are_independent_and_bounded()
+        print("✅ In-memory limiter passed")
+        test_redis_limiter_falls_back_to_local_buckets()
+        print("✅ Redis fallback passed")
+        test_socket_sends_are_rate_limited_per_connection()
+        print("✅ Per-connection socket limit passed")
+        test_socket_sends_are_rate_limited_per_user()
+        print("✅ Per-user socket limit passed")
+        test_user_limit_does_not_drain_the_connection_bucket()
+        print("✅ Connection bucket refund passed")
+        test_search_is_rate_limited()
+        print("✅ Search limit passed")
+        test_login_is_rate_limited()
+        print("✅ Login limit passed")
+        print("🎉 ALL TESTS PASSED")
+    except Exception as e:
+        print(f"❌ TEST FAILED: {e}")
+    finally:
+        teardown_module()
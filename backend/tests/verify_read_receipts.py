@@ -0,0 +1,196 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.models.user import User
+from app.models.conversation import Conversation, conversation_participants
+from app.models.message import Message
+from app.services.read_receipts import ReadMarkerBuffer, ReadWatermarks
+from app.websockets.manager import manager
+
+# Setup test DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_read_receipts.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+ids = {}
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        self.sent.append(json.loads(message))
+
+def setup_module():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        alice = User(email="alice-r@example.com", hashed_password="x")
+        bob = User(email="bob-r@example.com", hashed_password="x")
+        conv = Conversation(name="Alice & Bob", is_group=False)
+        conv.participants.extend([alice, bob])
+        db.add(conv)
+        db.commit()
+        ids.update(alice=alice.id, bob=bob.id, conversation=conv.id)
+    finally:
+        db.close()
+
+def stored_participant(user_id):
+    db = TestingSessionLocal()
+    try:
+        return db.execute(
+            conversation_participants.select()
+            .where(conversation_participants.c.conversation_id == ids["conversation"])
+            .where(conversation_participants.c.user_id == user_id)
+        ).one()
+    finally:
+        db.close()
+
+def stored_last_read(user_id):
+    return stored_participant(user_id).last_read_at
+
+def test_marks_coalesce_with_max_wins():
+    buffer = ReadMarkerBuffer(flush_interval=0)
+    t0 = datetime(2026, 1, 1, 12, 0, 0)
+    assert buffer.mark(ids["conversation"], ids["bob"], t0 + timedelta(seconds=5)) is True
+    # Later marks join the already scheduled flush; an older timestamp never wins
+    assert buffer.mark(ids["conversation"], ids["bob"], t0) is False
+    assert buffer.mark(ids["conversation"], ids["bob"], t0 + timedelta(seconds=3)) is False
+    assert buffer.pending_for_conversation(ids["conversation"]) == {ids["bob"]: t0 + timedelta(seconds=5)}
+    assert buffer.pending_for_user(ids["bob"]) == {ids["conversation"]: t0 + timedelta(seconds=5)}
+
+def test_flush_writes_once_and_broadcasts_once():
+    async def scenario():
+        async_engine = create_async_engine("sqlite+aiosqlite:///./test_read_receipts.db")
+        factory = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+        alice_socket = FakeWebSocket()
+        await manager.connect(alice_socket, ids["alice"])
+        try:
+            buffer = ReadMarkerBuffer(flush_interval=0)
+            t0 = datetime(2026, 1, 1, 12, 0, 0)
+            for seconds in (1, 7, 4):
+                buffer.mark(ids["conversation"], ids["bob"], t0 + timedelta(seconds=seconds))
+            await buffer.flush_soon(factory)
+            await asyncio.sleep(0.05)
+            assert buffer.pending_for_user(ids["bob"]) == {}
+
+            # A stale marker (e.g. from another worker) does not move last_read_at back
+            buffer.mark(ids["conversation"], ids["bob"], t0)
+            await buffer.flush(factory)
+            await asyncio.sleep(0.05)
+        finally:
+            manager.disconnect(alice_socket, ids["alice"])
+            await async_engine.dispose()
+        return alice_socket.sent
+
+    sent = asyncio.run(scenario())
+    assert stored_last_read(ids["bob"]) == datetime(2026, 1, 1, 12, 0, 7)
+    assert [event["type"] for event in sent] == ["conversation.read", "conversation.read"]
+    assert sent[0]["payload"]["user_id"] == ids["bob"]
+    assert sent[0]["payload"]["last_read_at"] == "2026-01-01T12:00:07"
+
+def test_failed_flush_is_retried():
+    class FailingOnce:
+        def __init__(self, factory):
+            self.factory = factory
+            self.calls = 0
+
+        def __call__(self):
+            self.calls += 1
+            if self.calls == 1:
+                raise ConnectionError("database is down")
+            return self.factory()
+
+    async def scenario():
+        async_engine = create_async_engine("sqlite+aiosqlite:///./test_read_receipts.db")
+        factory = FailingOnce(async_sessionmaker(bind=async_engine, expire_on_commit=False))
+        try:
+            buffer = ReadMarkerBuffer(flush_interval=0.01)
+            read_at = datetime(2026, 1, 2, 9, 0, 0)
+            assert buffer.mark(ids["conversation"], ids["alice"], read_at)
+            await buffer.flush(factory)
+            assert buffer.pending_for_user(ids["alice"]) == {ids["conversation"]: read_at}
+            # The retry is already scheduled, so a new mark does not schedule another
+            assert not buffer.mark(ids["conversation"], ids["alice"], read_at)
+            await buffer._retry
+            assert buffer.pending_count() == 0
+            assert factory.calls == 2
+        finally:
+            await async_engine.dispose()
+
+    asyncio.run(scenario())
+    assert stored_last_read(ids["alice"]) == datetime(2026, 1, 2, 9, 0, 0)
+
+def test_flush_resets_unread_count_to_newer_messages():
+    t0 = datetime(2026, 1, 2, 12, 0, 0)
+    db = TestingSessionLocal()
+    try:
+        for minutes in (1, 2, 3):
+            db.add(Message(
+                conversation_id=ids["conversation"],
+                sender_id=ids["alice"],
+                content=f"at {minutes}",
+                created_at=t0 + timedelta(minutes=minutes),
+            ))
+        db.commit()
+        assert stored_participant(ids["bob"]).unread_count == 3
+    finally:
+        db.close()
+
+    async def scenario():
+        async_engine = create_async_engine("sqlite+aiosqlite:///./test_read_receipts.db")
+        factory = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+        try:
+            buffer = ReadMarkerBuffer(flush_interval=0)
+            # Read just after the first message; the other two arrived later and stay unread
+            buffer.mark(ids["conversation"], ids["bob"], t0 + timedelta(minutes=1, seconds=30))
+            await buffer.flush(factory)
+        finally:
+            await async_engine.dispose()
+
+    asyncio.run(scenario())
+    assert stored_participant(ids["bob"]).unread_count == 2
+    assert stored_participant(ids["alice"]).unread_count == 0
+
+def test_read_watermarks_match_per_participant_check():
+    t0 = datetime(2026, 1, 1, 12, 0, 0)
+    last_reads = {1: t0 + timedelta(minutes=1), 2: t0 + timedelta(minutes=5), 3: t0 + timedelta(minutes=9)}
+    watermarks = ReadWatermarks({1, 2, 3}, last_reads)
+    # User 1 is the slowest reader, except for their own messages
+    assert watermarks.seen(2, t0) is True
+    assert watermarks.seen(2, t0 + timedelta(minutes=2)) is False
+    assert watermarks.seen(1, t0 + timedelta(minutes=5)) is True
+    assert watermarks.seen(1, t0 + timedelta(minutes=6)) is False
+    # Someone who never read blocks "seen"; a conversation with only the sender is never seen
+    assert ReadWatermarks({1, 2}, {1: t0}).seen(1, t0) is False
+    assert ReadWatermarks({1, 2}, {1: t0}).seen(2, t0) is True
+    assert ReadWatermarks({1}, {1: t0}).seen(1, t0) is False
+
+if __name__ == "__main__":
+    try:
+        setup_module()
+        test_marks_coalesce_with_max_wins()
+        print("✅ Read marker coalescing passed")
+        test_flush_writes_once_and_broadcasts_once()
+        print("✅ Read marker flush passed")
+        test_failed_flush_is_retried()
+        print("✅ Failed flush retry passed")
+        test_flush_resets_unread_count_to_newer_messages()
+        print("✅ Unread count reset passed")
+        test_read_watermarks_match_per_participant_check()
+        print("✅ Read watermarks passed")
+        print("🎉 ALL TESTS PASSED")
+    except Exception as e:
+        print(f"❌ TEST FAILED: {e}")
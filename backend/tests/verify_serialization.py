@@ -0,0 +1,133 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import schemas
+from app.main import app
+from app.api import deps
+from app.core import security, serialization
+from app.core.config import settings
+from app.db.base_class import Base
+from app.models.conversation import Conversation
+from app.models.message import Message
+from app.models.user import User
+from app.services.ingestion import StoredMessage
+from app.websockets.manager import ConnectionManager
+
+# Setup test DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_serialization.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+_previous_override = None
+state = {}
+
+class FakeWebSocket:
+    async def accept(self):
+        pass
+
+def setup_module():
+    global _previous_override
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    _previous_override = app.dependency_overrides.get(deps.get_db)
+    app.dependency_overrides[deps.get_db] = override_get_db
+    db = TestingSessionLocal()
+    try:
+        alice = User(email="alice-s@example.com", full_name="Alice", hashed_password="x")
+        bob = User(email="bob-s@example.com", full_name="Bob", hashed_password="x")
+        conv = Conversation(name="Alice & Bob", is_group=False)
+        conv.participants.extend([alice, bob])
+        db.add(conv)
+        db.flush()
+        db.add(Message(conversation_id=conv.id, sender_id=bob.id, content="héllo \"there\" 😀"))
+        db.commit()
+        state.update(alice=alice.id, bob=bob.id, conversation=conv.id)
+    finally:
+        db.close()
+
+def teardown_module():
+    if _previous_override is None:
+        app.dependency_overrides.pop(deps.get_db, None)
+    else:
+        app.dependency_overrides[deps.get_db] = _previous_override
+
+client = TestClient(app)
+
+def test_event_encoding_matches_schema():
+    timestamps = [
+        datetime(2026, 1, 1, 12, 0, 0),
+        datetime(2026, 1, 1, 12, 0, 0, 123456),
+        datetime(2026, 1, 1, 12, 0, 0, tzinfo=timezone.utc),
+        datetime(2026, 1, 1, 12, 0, 0, tzinfo=timezone(timedelta(hours=2))),
+    ]
+    for created_at in timestamps:
+        msg = StoredMessage(id=1, conversation_id=2, sender_id=3, content="héllo \"x\" 😀", created_at=created_at)
+        expected = schemas.SocketEvent(
+            type="message.new",
+            payload=schemas.OutgoingMessage.model_validate(msg).model_dump(mode="json"),
+        ).model_dump_json()
+        assert serialization.encode_event("message.new", serialization.message_payload(msg)) == expected
+
+def test_broadcast_frame_is_shared_by_recipients():
+    async def scenario():
+        manager = ConnectionManager()
+        sockets = [FakeWebSocket(), FakeWebSocket(), FakeWebSocket()]
+        await manager.connect(sockets[0], state["alice"])
+        await manager.connect(sockets[1], state["alice"])
+        await manager.connect(sockets[2], state["bob"])
+        frame = serialization.encode_event("message.new", {"id": 1})
+        await manager.broadcast_to_users([state["alice"], state["bob"]], frame)
+        queued = [manager.connections[ws].queue.get_nowait() for ws in sockets]
+        for ws in sockets:
+            manager.disconnect(ws, 0)
+        return frame, queued
+
+    frame, queued = asyncio.run(scenario())
+    assert all(item is frame for item in queued)
+
+def test_rest_responses_are_json():
+    token = security.create_access_token(state["alice"])
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.get(
+        f"{settings.API_V1_STR}/messages/{state['conversation']}/messages", headers=headers
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    messages = json.loads(response.content)
+    assert [m["content"] for m in messages] == ["héllo \"there\" 😀"]
+    assert messages[0]["seen"] is False
+
+    response = client.get(f"{settings.API_V1_STR}/conversations/", headers=headers)
+    assert response.headers["content-type"] == "application/json"
+    conversations = response.json()
+    assert conversations[0]["last_message"]["content"] == "héllo \"there\" 😀"
+    assert sorted(p["full_name"] for p in conversations[0]["participants"]) == ["Alice", "Bob"]
+
+if __name__ == "__main__":
+    try:
+        setup_module()
+        test_event_encoding_matches_schema()
+        print("✅ Event encoding passed")
+        test_broadcast_frame_is_shared_by_recipients()
+        print("✅ Shared broadcast frame passed")
+        test_rest_responses_are_json()
+        print("✅ REST responses passed")
+        print("🎉 ALL TESTS PASSED")
+    except Exception as e:
+        print(f"❌ TEST FAILED: {e}")
+    finally:
+        teardown_module()
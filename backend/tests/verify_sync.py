@@ -0,0 +1,175 @@
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert, update
+from sqlalchemy.orm import sessionmaker
+
+from app.main import app
+from app.db.base_class import Base
+from app.api import deps
+from app.core import security
+from app.core.config import settings
+from app.models.user import User
+from app.models.conversation import Conversation, conversation_participants
+from app.models.message import Message
+
+# Setup test DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_sync.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+START = datetime(2026, 1, 1)
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+_previous_override = None
+state = {}
+
+def setup_module():
+    global _previous_override
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    _previous_override = app.dependency_overrides.get(deps.get_db)
+    app.dependency_overrides[deps.get_db] = override_get_db
+
+    db = TestingSessionLocal()
+    try:
+        alice = User(email="alice-sync@example.com", full_name="Alice", hashed_password="x")
+        bob = User(email="bob-sync@example.com", full_name="Bob", hashed_password="x")
+        eve = User(email="eve-sync@example.com", full_name="Eve", hashed_password="x")
+        conv = Conversation(name="Sync", is_group=False)
+        conv.participants.extend([alice, bob])
+        private = Conversation(name="Private", is_group=False)
+        private.participants.extend([bob, eve])
+        db.add_all([alice, bob, eve, conv, private])
+        db.commit()
+        db.execute(update(conversation_participants).values(joined_at=START))
+        db.execute(insert(Message), [
+            {
+                "conversation_id": conv.id,
+                "sender_id": bob.id,
+                "content": f"hello {i}",
+                "created_at": START + timedelta(minutes=i),
+            }
+            for i in range(10)
+        ])
+        db.add(Message(conversation_id=private.id, sender_id=eve.id, content="secret", created_at=START))
+        db.commit()
+        state.update(alice_id=alice.id, bob_id=bob.id, eve_id=eve.id, conversation_id=conv.id,
+                     token=security.create_access_token(alice.id))
+    finally:
+        db.close()
+
+def teardown_module():
+    if _previous_override is None:
+        app.dependency_overrides.pop(deps.get_db, None)
+    else:
+        app.dependency_overrides[deps.get_db] = _previous_override
+
+client = TestClient(app)
+
+def sync(**params):
+    response = client.get(
+        f"{settings.API_V1_STR}/sync",
+        params=params,
+        headers={"Authorization": f"Bearer {state['token']}"},
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_sync_pages_messages_by_id():
+    contents, since = [], "0"
+    while True:
+        data = sync(since=since, limit=4)
+        contents.extend(m["content"] for m in data["messages"])
+        since = data["next_since"]
+        if not data["has_more"]:
+            break
+    # Eve's private conversation never leaks
+    assert contents == [f"hello {i}" for i in range(10)]
+    assert sync(since=since)["messages"] == []
+    assert sync(since=since)["next_since"] == since
+
+def test_sync_from_timestamp():
+    data = sync(since=(START + timedelta(minutes=7, seconds=30)).isoformat())
+    assert [m["content"] for m in data["messages"]] == ["hello 8", "hello 9"]
+    later = sync(since=(START + timedelta(days=1)).isoformat())
+    assert later["messages"] == []
+    assert later["next_since"] == data["next_since"]  # an id watermark to continue from
+
+def test_sync_read_markers_and_new_conversations():
+    first = sync(since="0")
+    watermark = START + timedelta(hours=1)
+    db = TestingSessionLocal()
+    try:
+        db.execute(
+            update(conversation_participants)
+            .where(conversation_participants.c.user_id == state["bob_id"])
+            .values(last_read_at=watermark + timedelta(minutes=1))
+        )
+        eve = db.get(User, state["eve_id"])
+        alice = db.get(User, state["alice_id"])
+        group = Conversation(name="New group", is_group=True)
+        group.participants.extend([alice, eve])
+        db.add(group)
+        db.commit()
+    finally:
+        db.close()
+
+    data = sync(since=watermark.isoformat())
+    assert data["read_markers"] == [{
+        "conversation_id": state["conversation_id"],
+        "user_id": state["bob_id"],
+        "last_read_at": (watermark + timedelta(minutes=1)).isoformat(),
+    }]
+    assert [c["name"] for c in data["conversations"]] == ["New group"]
+    assert first["conversations"] and not data["messages"]
+
+def test_continued_pages_carry_only_messages():
+    # Runs after test_sync_read_markers_and_new_conversations: Bob has read, and Alice
+    # joined a new group, since START
+    first = sync(since=START.isoformat(), limit=4)
+    assert first["has_more"] and len(first["messages"]) == 4
+    assert [m["user_id"] for m in first["read_markers"]] == [state["bob_id"]]
+    assert [c["name"] for c in first["conversations"]] == ["New group"]
+
+    contents, page = [m["content"] for m in first["messages"]], first
+    while page["has_more"]:
+        page = sync(since=page["next_since"], limit=4, continued="true")
+        assert page["read_markers"] == [] and page["conversations"] == []
+        contents.extend(m["content"] for m in page["messages"])
+    assert contents == [f"hello {i}" for i in range(1, 10)]
+
+def test_sync_rejects_bad_watermark():
+    response = client.get(
+        f"{settings.API_V1_STR}/sync",
+        params={"since": "yesterday"},
+        headers={"Authorization": f"Bearer {state['token']}"},
+    )
+    assert response.status_code == 400
+
+if __name__ == "__main__":
+    try:
+        setup_module()
+        test_sync_pages_messages_by_id()
+        print("✅ Paged sync passed")
+        test_sync_from_timestamp()
+        print("✅ Timestamp sync passed")
+        test_sync_read_markers_and_new_conversations()
+        print("✅ Read markers and new conversations passed")
+        test_continued_pages_carry_only_messages()
+        print("✅ Continued pages passed")
+        test_sync_rejects_bad_watermark()
+        print("✅ Bad watermark passed")
+        print("🎉 ALL TESTS PASSED")
+    except Exception as e:
+        print(f"❌ TEST FAILED: {e}")
+    finally:
+        teardown_module()
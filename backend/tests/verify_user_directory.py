@@ -0,0 +1,135 @@
+import base64
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.main import app
+from app.db.base_class import Base
+from app.api import deps
+from app.core import security
+from app.core.config import settings
+from app.models.user import User
+from app.services import user_directory
+
+# Setup test DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_user_directory.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+_previous_override = None
+token = None
+
+def setup_module():
+    global _previous_override, token
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    _previous_override = app.dependency_overrides.get(deps.get_db)
+    app.dependency_overrides[deps.get_db] = override_get_db
+
+    db = TestingSessionLocal()
+    try:
+        me = User(email="me-dir@example.com", full_name="Me", hashed_password="x")
+        db.add(me)
+        # Duplicate names and missing names exercise every part of the sort key
+        db.add_all([
+            User(email=f"dir-{i:02d}@example.com", full_name=[None, "Ann", "Bob"][i % 3], hashed_password="x")
+            for i in range(25)
+        ])
+        db.commit()
+        token = security.create_access_token(me.id)
+    finally:
+        db.close()
+
+def teardown_module():
+    if _previous_override is None:
+        app.dependency_overrides.pop(deps.get_db, None)
+    else:
+        app.dependency_overrides[deps.get_db] = _previous_override
+
+client = TestClient(app)
+
+def get_users(**params):
+    headers = {"Authorization": f"Bearer {token}"}
+    headers.update(params.pop("headers", {}))
+    return client.get(f"{settings.API_V1_STR}/users/all", params=params, headers=headers)
+
+def test_full_listing_is_unchanged():
+    response = get_users()
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert len(data) == 25
+    assert "me-dir@example.com" not in [u["email"] for u in data]
+    assert set(data[0]) == {"email", "is_active", "full_name", "id"}
+    assert "X-Next-Cursor" not in response.headers
+
+def test_cursor_pages_cover_directory_in_order():
+    everything = get_users().json()
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 4}
+        if cursor:
+            params["cursor"] = cursor
+        response = get_users(**params)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        assert len(page) <= 4
+        seen.extend(page)
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert seen == everything
+
+def test_etag_returns_not_modified():
+    response = get_users(limit=5)
+    etag = response.headers["ETag"]
+    again = get_users(limit=5, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["X-Next-Cursor"] == response.headers["X-Next-Cursor"]
+
+def test_invalid_cursor_is_rejected():
+    assert get_users(limit=5, cursor="not-a-cursor").status_code == 400
+    bad_shape = base64.urlsafe_b64encode(b'["a", 1]').decode()
+    assert get_users(limit=5, cursor=bad_shape).status_code == 400
+
+def query_plan(stmt):
+    # Explained with its bound parameters, as it is actually executed
+    compiled = stmt.compile(engine)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    with engine.connect() as conn:
+        return [row[3] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), params)]
+
+def test_page_query_seeks_covering_index():
+    first = query_plan(user_directory.page_statement(1, limit=5))
+    assert first == ["SCAN user USING COVERING INDEX ix_user_directory"], first
+    after = query_plan(user_directory.page_statement(1, limit=5, after=("Ann", "dir-10@example.com", 12)))
+    assert after == ["SEARCH user USING COVERING INDEX ix_user_directory (<expr>>?)"], after
+
+if __name__ == "__main__":
+    try:
+        setup_module()
+        test_full_listing_is_unchanged()
+        print("✅ Full listing passed")
+        test_cursor_pages_cover_directory_in_order()
+        print("✅ Cursor pagination passed")
+        test_etag_returns_not_modified()
+        print("✅ ETag passed")
+        test_invalid_cursor_is_rejected()
+        print("✅ Invalid cursor passed")
+        test_page_query_seeks_covering_index()
+        print("✅ Covering index plan passed")
+        print("🎉 ALL TESTS PASSED")
+    except Exception as e:
+        print(f"❌ TEST FAILED: {e}")
+    finally:
+        teardown_module()
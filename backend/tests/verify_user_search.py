@@ -0,0 +1,101 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.models.user import User
+from app.services import user_search
+
+# Setup test DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_user_search.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def setup_module():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        db.add_all([
+            User(email="me@example.com", full_name="Searcher", hashed_password="x"),
+            User(email="zoe@example.com", full_name="Zoe Anderson", hashed_password="x"),
+            User(email="sanders@example.com", full_name="Sam Sanders", hashed_password="x"),
+            User(email="andy@example.com", full_name="Andy Wu", hashed_password="x"),
+            User(email="rand_100%@example.com", full_name="Rand", hashed_password="x"),
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+def search(term, limit=10):
+    db = TestingSessionLocal()
+    try:
+        me = db.query(User).filter(User.email == "me@example.com").one()
+        return [u.email for u in user_search.search_users(db, term, exclude_user_id=me.id, limit=limit)]
+    finally:
+        db.close()
+
+def test_substring_match_ranks_prefixes_first():
+    # email prefix, then word prefix in the name, then other substrings
+    assert search("and") == [
+        "andy@example.com",
+        "zoe@example.com",
+        "rand_100%@example.com",
+        "sanders@example.com",
+    ]
+
+def test_short_terms_and_wildcards_are_literal():
+    assert search("wu") == ["andy@example.com"]
+    assert search("_1") == ["rand_100%@example.com"]
+    assert search("0%@") == ["rand_100%@example.com"]
+    assert search("me@") == []  # the searching user is excluded
+
+def test_index_follows_updates_and_deletes():
+    db = TestingSessionLocal()
+    try:
+        andy = db.query(User).filter(User.email == "andy@example.com").one()
+        andy.full_name = "Andrew Quimby"
+        db.commit()
+        assert search("quimby") == ["andy@example.com"]
+        assert search("andy wu") == []
+
+        db.delete(andy)
+        db.commit()
+        assert "andy@example.com" not in search("and")
+    finally:
+        db.close()
+
+def test_prefix_matches_are_not_crowded_out():
+    db = TestingSessionLocal()
+    try:
+        db.add_all([
+            User(email=f"zed{i}@x.io", full_name="Zed Mann", hashed_password="x")
+            for i in range(user_search.SEARCH_CANDIDATES + 500)
+        ])
+        db.add(User(email="ann@x.io", full_name="Ann Lee", hashed_password="x"))
+        db.add(User(email="joanne@x.io", full_name=None, hashed_password="x"))
+        db.commit()
+    finally:
+        db.close()
+    for term in ("ann", "an"):  # FTS candidates, and the short-term scan
+        results = search(term)
+        assert results[0] == "ann@x.io"
+        assert len(results) == 10
+    # Users without a name are still found by other substring matches
+    assert search("oann") == ["joanne@x.io"]
+
+if __name__ == "__main__":
+    try:
+        setup_module()
+        test_substring_match_ranks_prefixes_first()
+        print("✅ Prefix ranking passed")
+        test_short_terms_and_wildcards_are_literal()
+        print("✅ Short terms and wildcards passed")
+        test_index_follows_updates_and_deletes()
+        print("✅ Index sync passed")
+        test_prefix_matches_are_not_crowded_out()
+        print("✅ Prefix probe passed")
+        print("🎉 ALL TESTS PASSED")
+    except Exception as e:
+        print(f"❌ TEST FAILED: {e}")
@@ -0,0 +1,133 @@
+import json
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.main import app
+from app.api import deps
+from app.api.v1.endpoints import ws
+from app.core import security
+from app.core.config import settings
+from app.db.base_class import Base
+from app.models.conversation import Conversation
+from app.models.user import User
+from app.services import ingestion, membership
+
+# Setup test DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_ws_errors.db"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine("sqlite+aiosqlite:///./test_ws_errors.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+_previous_overrides = {}
+state = {}
+
+def setup_module():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    for dependency in (deps.get_db, deps.get_async_sessionmaker):
+        _previous_overrides[dependency] = app.dependency_overrides.get(dependency)
+    app.dependency_overrides[deps.get_async_sessionmaker] = lambda: TestingAsyncSessionLocal
+    ingestion.recent_messages.clear()
+    db = TestingSessionLocal()
+    try:
+        alice = User(email="alice-e@example.com", hashed_password="x")
+        bob = User(email="bob-e@example.com", hashed_password="x")
+        conv = Conversation(name="Alice & Bob", is_group=False)
+        conv.participants.extend([alice, bob])
+        db.add(conv)
+        db.commit()
+        state.update(alice=alice.id, conversation=conv.id)
+    finally:
+        db.close()
+
+def teardown_module():
+    for dependency, previous in _previous_overrides.items():
+        if previous is None:
+            app.dependency_overrides.pop(dependency, None)
+        else:
+            app.dependency_overrides[dependency] = previous
+
+client = TestClient(app)
+
+def send(websocket, content: str, client_msg_id=None):
+    websocket.send_text(json.dumps({"type": "message.new", "payload": {
+        "conversation_id": state["conversation"], "content": content, "client_msg_id": client_msg_id,
+    }}))
+
+def test_failed_insert_keeps_the_socket_open():
+    async def locked(session_factory, items):
+        raise OperationalError("INSERT INTO message", {}, Exception("database is locked"))
+
+    token = security.create_access_token(state["alice"])
+    with client.websocket_connect(f"{settings.API_V1_STR}/ws?token={token}") as alice:
+        original, ws.persist_messages = ws.persist_messages, locked
+        try:
+            send(alice, "lost", "m1")
+            error = json.loads(alice.receive_text())
+        finally:
+            ws.persist_messages = original
+        assert error == {"type": "error.not_saved", "payload": {"event": "message.new", "client_msg_id": "m1"}}
+
+        # The same socket can retry
+        send(alice, "retried", "m1")
+        assert json.loads(alice.receive_text())["payload"]["content"] == "retried"
+        assert json.loads(alice.receive_text())["type"] == "message.ack"
+
+def test_failed_ingestor_batch_keeps_the_socket_open():
+    async def locked(session_factory, items):
+        raise OperationalError("INSERT INTO message", {}, Exception("database is locked"))
+
+    token = security.create_access_token(state["alice"])
+    with client.websocket_connect(f"{settings.API_V1_STR}/ws?token={token}") as alice:
+        original, ingestion.persist_messages = ingestion.persist_messages, locked
+        settings.INGEST_BATCHING = True
+        try:
+            send(alice, "lost", "b1")
+            error = json.loads(alice.receive_text())
+        finally:
+            settings.INGEST_BATCHING = False
+            ingestion.persist_messages = original
+        assert error == {"type": "error.not_saved", "payload": {"event": "message.new", "client_msg_id": "b1"}}
+
+        send(alice, "retried", "b1")
+        assert json.loads(alice.receive_text())["payload"]["content"] == "retried"
+
+def test_failed_membership_lookup_keeps_the_socket_open():
+    async def locked(session_factory, conversation_id):
+        raise OperationalError("SELECT user_id FROM conversation_participants", {}, Exception("database is locked"))
+
+    token = security.create_access_token(state["alice"])
+    with client.websocket_connect(f"{settings.API_V1_STR}/ws?token={token}") as alice:
+        original, membership.aget_member_ids = membership.aget_member_ids, locked
+        try:
+            send(alice, "lost", "g1")
+            error = json.loads(alice.receive_text())
+        finally:
+            membership.aget_member_ids = original
+        assert error == {"type": "error.not_saved", "payload": {"event": "message.new", "client_msg_id": "g1"}}
+
+        send(alice, "retried", "g1")
+        assert json.loads(alice.receive_text())["payload"]["content"] == "retried"
+
+if __name__ == "__main__":
+    try:
+        setup_module()
+        test_failed_insert_keeps_the_socket_open()
+        print("✅ Failed insert passed")
+        test_failed_ingestor_batch_keeps_the_socket_open()
+        print("✅ Failed ingestor batch passed")
+        test_failed_membership_lookup_keeps_the_socket_open()
+        print("✅ Failed membership lookup passed")
+        print("🎉 ALL TESTS PASSED")
+    except Exception as e:
+        print(f"❌ TEST FAILED: {e}")
+    finally:
+        teardown_module()
@@ -26,6 +26,10 @@ export class WebSocketManager {
                 if (socketEvent.type === 'message.new') {
                     const message: Message = socketEvent.payload;
                     this.messageHandlers.forEach(handler => handler(message));
+                } else if (socketEvent.type === 'message.batch') {
+                    // Several messages sent together, delivered in one frame
+                    const messages: Message[] = socketEvent.payload.messages;
+                    messages.forEach(message => this.messageHandlers.forEach(handler => handler(message)));
                 } else if (socketEvent.type === 'conversation.read') {
                     this.readHandlers.forEach(handler => handler(socketEvent.payload));
                 }
@@ -12,6 +12,8 @@ export interface Conversation {
     created_at: string;
     message_count?: number;
     participants?: User[];
+    last_message_at?: string | null;
+    last_message?: Pick<Message, 'id' | 'sender_id' | 'content' | 'created_at'> | null;
 }
 
 export interface Message {